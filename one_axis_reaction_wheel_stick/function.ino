@@ -10,40 +10,179 @@ void receiveUDP() {
     String msg = String(incoming);
 
     if (msg.startsWith("K1")) {
-      int k1Start = msg.indexOf('=') + 1;
-      int k2Start = msg.indexOf("K2=") + 3;
-      int k3Start = msg.indexOf("K3=") + 3;
-
-      X1 = msg.substring(k1Start, msg.indexOf(',', k1Start)).toFloat();
-      X2 = msg.substring(k2Start, msg.indexOf(',', k2Start)).toFloat();
-
-      // K4 tùy chọn (nếu có)
-      int k4Idx = msg.indexOf("K4=");
-      if (k4Idx >= 0) {
-        X3 = msg.substring(k3Start, msg.indexOf(',', k3Start)).toFloat();
-        X4 = msg.substring(k4Idx + 3).toFloat();
-      } else {
-        X3 = msg.substring(k3Start).toFloat();
-      }
+      // ",S=<seq>" (tùy chọn, luôn ở cuối): số thứ tự lệnh, ACK gửi lại để PC biết lệnh nào đã tới
+      int sIdx = msg.indexOf(",S=");
+      bool tagged = sIdx >= 0;
+      uint32_t seq = tagged ? strtoul(msg.c_str() + sIdx + 3, NULL, 10) : 0;
+
+      // Lệnh gửi lại tới muộn, cũ hơn lệnh đã áp dụng → bỏ qua (không quay lại bộ K cũ)
+      // Cách xa hơn CMD_SEQ_WINDOW = PC vừa khởi động lại → nhận như lệnh mới
+      bool stale = tagged && has_cmd_seq && (uint32_t)(last_cmd_seq - seq) < CMD_SEQ_WINDOW;
+
+      if (!stale) {
+        // Đang ramp: K4 thiếu → giữ đích của ramp, không phải giá trị trung gian
+        float k[4] = {X1, X2, X3, X4};
+        if (ramp_ms)
+          memcpy(k, ramp_to, sizeof(k));
+
+        int k1Start = msg.indexOf('=') + 1;
+        int k2Start = msg.indexOf("K2=") + 3;
+        int k3Start = msg.indexOf("K3=") + 3;
+
+        k[0] = msg.substring(k1Start, msg.indexOf(',', k1Start)).toFloat();
+        k[1] = msg.substring(k2Start, msg.indexOf(',', k2Start)).toFloat();
 
-      Serial.printf("📩 K1=%.2f K2=%.2f K3=%.2f K4=%.2f\n", X1, X2, X3, X4);
+        // K4 tùy chọn (nếu có)
+        int k4Idx = msg.indexOf("K4=");
+        if (k4Idx >= 0) {
+          k[2] = msg.substring(k3Start, msg.indexOf(',', k3Start)).toFloat();
+          k[3] = msg.substring(k4Idx + 3).toFloat();
+        } else {
+          k[2] = msg.substring(k3Start).toFloat();
+        }
+
+        // ",R=<ms>" (tùy chọn): chuyển dần từ bộ K hiện tại sang bộ K mới trong R ms
+        int rIdx = msg.indexOf(",R=");
+        unsigned long ramp = rIdx >= 0 ? strtoul(msg.c_str() + rIdx + 3, NULL, 10) : 0;
+        startGainRamp(k, min(ramp, (unsigned long)RAMP_MS_MAX));
+
+        if (tagged) {
+          last_cmd_seq = seq;
+          has_cmd_seq = true;
+        }
+
+        Serial.printf("📩 K1=%.2f K2=%.2f K3=%.2f K4=%.2f R=%lums\n", k[0], k[1], k[2], k[3], ramp_ms);
+      }
 
+      // Gửi lại bộ K đã nhận (đích của ramp nếu đang ramp) để PC biết lệnh nào đã tới
+      float acked[4] = {X1, X2, X3, X4};
+      if (ramp_ms)
+        memcpy(acked, ramp_to, sizeof(acked));
       udp.beginPacket(udp.remoteIP(), udp.remotePort());
-      udp.print("KACK");
+      if (tagged)
+        udp.printf("KACK S=%lu,K1=%.2f,K2=%.2f,K3=%.2f,K4=%.2f,B=%lu", (unsigned long)last_cmd_seq,
+                   acked[0], acked[1], acked[2], acked[3], (unsigned long)firmware_build);
+      else
+        udp.printf("KACK K1=%.2f,K2=%.2f,K3=%.2f,K4=%.2f,B=%lu", acked[0], acked[1], acked[2], acked[3],
+                   (unsigned long)firmware_build);
       udp.endPacket();
     }
   }
 }
 
+// ===== MÃ BẢN BUILD =====
+// FNV-1a 32 bit của chuỗi (ngày giờ biên dịch) → số báo trong KACK ",B="
+uint32_t buildHash(const char *s) {
+  uint32_t h = 2166136261UL;
+  while (*s) {
+    h ^= (uint8_t)*s++;
+    h *= 16777619UL;
+  }
+  return h;
+}
+
+// ===== RAMP HỆ SỐ (bumpless) =====
+// ms = 0: áp dụng ngay như cũ
+void startGainRamp(const float *k, unsigned long ms) {
+  ramp_from[0] = X1; ramp_from[1] = X2; ramp_from[2] = X3; ramp_from[3] = X4;
+  memcpy(ramp_to, k, sizeof(ramp_to));
+  ramp_start = millis();
+  ramp_ms = ms;
+  if (ms == 0) {
+    X1 = k[0]; X2 = k[1]; X3 = k[2]; X4 = k[3];
+  }
+}
+
+// Gọi mỗi vòng điều khiển: nội suy smoothstep X1..X4 từ ramp_from tới ramp_to
+void updateGainRamp() {
+  if (ramp_ms == 0)
+    return;
+  unsigned long elapsed = millis() - ramp_start;
+  float a = elapsed >= ramp_ms ? 1.0f : (float)elapsed / ramp_ms;
+  a = a * a * (3.0f - 2.0f * a);
+  X1 = ramp_from[0] + (ramp_to[0] - ramp_from[0]) * a;
+  X2 = ramp_from[1] + (ramp_to[1] - ramp_from[1]) * a;
+  X3 = ramp_from[2] + (ramp_to[2] - ramp_from[2]) * a;
+  X4 = ramp_from[3] + (ramp_to[3] - ramp_from[3]) * a;
+  if (elapsed >= ramp_ms)
+    ramp_ms = 0;
+}
+
+// ===== FRAME TELEMETRY BINARY (little-endian, khớp telemetry_codec.py) =====
+#define TELEMETRY_MAGIC0 'R'
+#define TELEMETRY_MAGIC1 'W'
+#define TELEMETRY_VERSION 1
+
+struct __attribute__((packed)) TelemetrySample {
+  uint32_t seq;         // Số thứ tự sample
+  uint32_t t_us;        // micros() lúc lấy mẫu
+  float angle_err;      // robot_angle - angle_offset
+  float robot_angle;
+  int32_t motor_speed;
+  int16_t pwm;
+  uint16_t reserved;
+};
+
+struct __attribute__((packed)) TelemetryFrame {
+  char magic[2];
+  uint8_t version;
+  uint8_t count;
+  TelemetrySample samples[TELEMETRY_BATCH_MAX];
+};
+
+TelemetryFrame telemetry_frame;
+
+// Ghi trạng thái hiện tại vào ô idx của frame đang gom
+// (tham số là index, không phải struct, để prototype tự sinh của Arduino không lỗi)
+void fillTelemetrySample(uint8_t idx) {
+  TelemetrySample &s = telemetry_frame.samples[idx];
+  s.seq = telemetry_seq++;
+  s.t_us = micros();
+  s.angle_err = robot_angle - angle_offset;
+  s.robot_angle = robot_angle;
+  s.motor_speed = motor_speed;
+  s.pwm = (int16_t)pwm_s;
+  s.reserved = 0;
+}
+
+// Gửi frame đang gom (header + count sample) rồi bắt đầu frame mới
+void sendTelemetryFrame() {
+  if (telemetry_frame.count == 0)
+    return;
+  telemetry_frame.magic[0] = TELEMETRY_MAGIC0;
+  telemetry_frame.magic[1] = TELEMETRY_MAGIC1;
+  telemetry_frame.version = TELEMETRY_VERSION;
+
+  size_t len = 4 + telemetry_frame.count * sizeof(TelemetrySample); // 4 = header
+  udp.beginPacket(udpAddress, udpPort);
+  udp.write((const uint8_t *)&telemetry_frame, len);
+  udp.endPacket();
+  telemetry_frame.count = 0;
+}
+
+// Gọi mỗi vòng điều khiển (200Hz) khi TELEMETRY_BATCH = 1
+void recordTelemetrySample() {
+  fillTelemetrySample(telemetry_frame.count++);
+  if (telemetry_frame.count >= TELEMETRY_BATCH_MAX)
+    sendTelemetryFrame(); // Đầy trước hạn loop_time_py → gửi luôn, không mất sample
+}
+
 // ===== HÀM CẬP NHẬT GIÁ TRỊ ĐẾN PYTHON =====
 void updateToUDP() {
-  char buffer[64];
+#if TELEMETRY_BINARY
+#if !TELEMETRY_BATCH
+  fillTelemetrySample(telemetry_frame.count++);
+#endif
+  sendTelemetryFrame();
+#else
   float ae = robot_angle - angle_offset;
+  char buffer[64];
   sprintf(buffer, "%.2f,%.2f,%.2f", ae, (float)pwm_s, robot_angle);
 
   udp.beginPacket(udpAddress, udpPort);
   udp.print(buffer);
   udp.endPacket();
+#endif
 }
 
 void writeTo(byte device, byte address, byte value) {
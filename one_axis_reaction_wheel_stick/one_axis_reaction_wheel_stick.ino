@@ -46,6 +46,36 @@ float X4 = 1.0;      // I  (tắt trước)
 float loop_time = 5; // 200Hz — nhanh gấp đôi!
 float loop_time_py = 50;
 
+// ===== LỆNH K CÓ SỐ THỨ TỰ =====
+// PC gắn ",S=<seq>" vào lệnh K; ACK gửi lại S của lệnh mới nhất đã áp dụng
+#define CMD_SEQ_WINDOW 64   // lệnh cũ hơn tối đa bấy nhiêu số → coi là gửi lại tới muộn
+uint32_t last_cmd_seq = 0;
+bool has_cmd_seq = false;
+
+// ===== MÃ BẢN BUILD =====
+// Mọi KACK kèm ",B=<số>" → PC tách cache kết quả tune theo bản firmware đang chạy.
+// 0 = tự sinh từ ngày giờ biên dịch (mỗi lần nạp = bản mới); đặt số cố định để giữ cache
+// qua các lần nạp lại mà luật điều khiển không đổi
+#define FIRMWARE_BUILD 0
+uint32_t firmware_build = 0;
+
+// ===== RAMP HỆ SỐ =====
+// Lệnh K có ",R=<ms>" → X1..X4 chuyển dần sang bộ K mới thay vì nhảy bậc (giảm xóc khi đổi K)
+#define RAMP_MS_MAX 5000
+float ramp_from[4], ramp_to[4];
+unsigned long ramp_start = 0;
+unsigned long ramp_ms = 0; // 0 = không đang ramp
+
+// ===== TELEMETRY CONFIG =====
+// 1 = frame binary "RW" v1 (seq, timestamp µs, float đầy đủ) — xem telemetry_codec.py
+// 0 = chuỗi CSV cũ "ae,pwm,robot_angle" (Python vẫn nhận được cả hai)
+#define TELEMETRY_BINARY 1
+// 1 = ghi lại MỌI vòng điều khiển 200Hz, mỗi datagram chở các sample từ lần gửi trước
+// 0 = chỉ gửi 1 sample mỗi loop_time_py (PC thấy 1/10 số sample)
+#define TELEMETRY_BATCH 1
+#define TELEMETRY_BATCH_MAX 16 // >= loop_time_py / loop_time, đầy thì gửi ngay
+uint32_t telemetry_seq = 0; // Số thứ tự sample, tăng mỗi lần lấy mẫu
+
 // ===== MOTOR CONTROL CONFIG =====
 const int PWM_CMD_MAX = 255;
 const int PWM_CMD_STEP = 10; // Slew-rate limiter
@@ -85,6 +115,8 @@ float angle_offset = 2.5; // Serial đo khi thẳng đứng = -2.22°
 
 void setup() {
   Serial.begin(115200); // ESP32 nên dùng tốc độ cao
+  firmware_build = FIRMWARE_BUILD ? FIRMWARE_BUILD : buildHash(__DATE__ " " __TIME__);
+  Serial.printf("🏷️ Firmware build B=%lu\n", (unsigned long)firmware_build);
 
   // ===== Cấu hình wifi =====
   Wire.begin();
@@ -134,6 +166,7 @@ void loop() {
   if (currentT - previousT_1 >= loop_time) {
 
     angle_calc();
+    updateGainRamp();
 
     if (vertical) {
       digitalWrite(BRAKE_PIN, HIGH); // HIGH = thả phanh (enable motor)
@@ -161,6 +194,10 @@ void loop() {
       error_sum = 0; // Reset integral khi ngã
     }
 
+#if TELEMETRY_BINARY && TELEMETRY_BATCH
+    recordTelemetrySample();
+#endif
+
     previousT_1 = currentT;
   }
 
@@ -1,7 +1,8 @@
 """
 🤖 AUTO-TUNE PID cho Reaction Wheel Balance Robot
 ==================================================
-Script tự động dò tìm bộ K1, K2, K3 tối ưu bằng Hill Climbing.
+Script tự động dò tìm bộ K1, K2, K3 tối ưu. Thuật toán chọn được (optimizers.py):
+Bayesian optimization (mặc định), CMA-ES, Nelder–Mead, hoặc Hill Climbing cũ.
 
 Cách dùng:
 1. Upload code FIXED lên ESP32, đợi bíp calibrate xong
@@ -10,16 +11,74 @@ Cách dùng:
 4. Nhấn nút "▶ BẮT ĐẦU AUTO-TUNE"
 5. Robot sẽ tự thử các bộ K → bạn chỉ cần ĐỠ khi ngã
 6. Kết thúc: bộ K tốt nhất tự động gửi xuống ESP32
+
+Chạy với robot ảo (esp32_sim.py), không cần phần cứng:
+    python esp32_sim.py --speed 20
+    python AutoTune_PID.py --sim-speed 20 [--headless]
+--sim-speed N chia mọi thời gian chờ cho N (phải khớp --speed của sim),
+--headless chạy không cửa sổ, tự bắt đầu và in kết quả khi xong.
+
+Auto-tune offline (nút "🧮 OFFLINE", hoặc --headless --offline): chấm cả lưới
+K1/K2/K3 trên robot ảo bằng mọi nhân CPU (offline_tune.py), DỪNG hủy giữa chừng,
+bộ K tốt nhất gửi xuống robot bằng "💾 ÁP DỤNG BEST".
+
+Kết quả mỗi lần thử được lưu vào trial_cache.json (trial_cache.py), theo robot
+(--robot-id, mặc định IP) và firmware (--firmware, mặc định mã build "B=" trong KACK):
+bộ K đã đo gần đây → lấy điểm cũ ngay, phiên mới bắt đầu từ lịch sử (--no-cache để tắt).
+
+Sau mỗi lần thử, phiên được lưu vào autotune_checkpoint.json (checkpoint.py);
+robot ngã / hết pin / đóng cửa sổ → chạy lại với --resume để đi tiếp đúng chỗ cũ.
+
+Đổi sang bộ K của lần thử không giật (--ramp pc | firmware | off, --ramp-time):
+bộ K chuyển dần từ bộ K đang chạy trong RAMP_TIME giây thay vì nhảy bậc.
 """
 
+import argparse
 import socket
 import time
 import threading
-import random
+import numpy as np
+import matplotlib
+from optimizers import OPTIMIZERS, make_optimizer
+from trial_runner import RAMP_MODES
+
+_parser = argparse.ArgumentParser(description="Auto-tune K1, K2, K3")
+_parser.add_argument('--sim-speed', type=float, default=0,
+                     help='Đang chạy với esp32_sim.py --speed N: rút ngắn thời gian chờ N lần')
+_parser.add_argument('--headless', action='store_true', help='Không mở cửa sổ, tự bắt đầu')
+_parser.add_argument('--optimizer', choices=tuple(OPTIMIZERS), default=None,
+                     help='Thuật toán dò K (mặc định: OPTIMIZER trong phần cấu hình)')
+_parser.add_argument('--offline', action='store_true',
+                     help='Cùng --headless: chạy auto-tune offline trên robot ảo thay vì robot thật')
+_parser.add_argument('--no-cache', action='store_true', help='Không dùng / không ghi trial_cache.json')
+_parser.add_argument('--robot-id', default=None, help='Tên robot trong cache (mặc định: IP ESP32)')
+_parser.add_argument('--firmware', default=None, help='Phiên bản firmware trong cache (mặc định: mã build trong KACK)')
+_parser.add_argument('--robot', default=None,
+                     help='IP (hoặc IP:cổng) robot cần tune khi nhiều robot cùng gửi về (mặc định: robot đầu tiên)')
+_parser.add_argument('--relay', action='store_true',
+                     help='Nhận qua telemetry_relay.py thay vì tự bind cổng 4210 (chạy cùng GUI / bộ ghi log)')
+_parser.add_argument('--resume', action='store_true', help='Tiếp tục phiên auto-tune dở từ autotune_checkpoint.json')
+_parser.add_argument('--ramp', choices=RAMP_MODES, default=None,
+                     help='Cách đổi sang bộ K mới (mặc định: GAIN_RAMP trong phần cấu hình)')
+_parser.add_argument('--ramp-time', type=float, default=None, help='Giây chuyển từ bộ K cũ sang bộ K mới')
+ARGS, _ = _parser.parse_known_args()
+if ARGS.headless:
+    matplotlib.use('Agg')
+
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from matplotlib.widgets import Button, TextBox
-from collections import deque
+from telemetry import SampleRing
+from rolling_stats import WINDOWS, RollingStats
+from blit_render import BlitManager
+from score_chart import ScoreChart
+from telemetry_hub import TelemetryHub
+from telemetry_relay import RelaySocket
+from trial_runner import TrialRunner
+from batch_sim import FIRMWARE_K4, grid_candidates
+from offline_tune import OfflineTuner
+from trial_cache import TrialCache
+import checkpoint
 
 # ========== CẤU HÌNH ==========
 UDP_IP_PC = "0.0.0.0"
@@ -36,25 +95,79 @@ K1_MIN, K1_MAX = 20.0, 120.0
 K2_MIN, K2_MAX = 2.0, 50.0
 K3_MIN, K3_MAX = 0.0, 0.50
 
-# Bước nhảy mỗi lần thử
+# Bước nhảy mỗi lần thử (chỉ dùng cho optimizer 'hill')
 K1_STEP = 5.0
 K2_STEP = 2.0
 K3_STEP = 0.02
 
+K_BOUNDS = [(K1_MIN, K1_MAX), (K2_MIN, K2_MAX), (K3_MIN, K3_MAX)]
+K_STEPS = [K1_STEP, K2_STEP, K3_STEP]
+
+# Thuật toán dò K: 'bayes' (GP, ít lần thử nhất), 'cmaes', 'nelder-mead', 'hill' (cũ)
+OPTIMIZER = ARGS.optimizer or 'bayes'
+OPTIMIZER_SEED = None  # đặt số nguyên để lặp lại đúng chuỗi thử
+
 # Thời gian đo mỗi bộ K (giây)
 TRIAL_DURATION = 4.0
 
+# Chờ KACK của đúng bộ K vừa gửi (giây thật), gửi lại tối đa ACK_RETRIES lần
+ACK_TIMEOUT = 0.5
+ACK_RETRIES = 3
+
+# Đổi bộ K: 'pc' = chuỗi bộ K trung gian từ PC (mọi firmware), 'firmware' = firmware tự
+# nội suy (cần firmware có ",R="), 'off' = nhảy bậc như cũ.
+# Robot ảo (pendulum_model) gần như không giật khi nhảy bậc nên ramp không giúp gì ở đó;
+# bật khi robot thật hay ngã ngay lúc đổi sang bộ K xa.
+GAIN_RAMP = ARGS.ramp or 'off'
+RAMP_TIME = ARGS.ramp_time if ARGS.ramp_time is not None else 0.5  # giây (giờ robot)
+
+# Dừng lần thử sớm khi robot ngã / chắc chắn không vượt được best_score
+EARLY_ABORT = True
+TRIAL_POLL = 0.05  # giây, chu kỳ chấm điểm trong lúc đo
+
+# Ring buffer sample: 2^15 sample ≈ 160 s ở 200 Hz, dư xa 1 chu kỳ TRIAL_POLL
+# → lần thử dài bao nhiêu cũng đọc đủ từng sample, thread nhận không bao giờ phải chờ
+RING_CAPACITY = 1 << 15
+
+# Cache kết quả các lần thử (trial_cache.json)
+CACHE_ENABLED = not ARGS.no_cache
+CACHE_MAX_AGE = 3 * 24 * 3600   # giây; kết quả cũ hơn → đo lại
+WARM_START = True               # optimizer bắt đầu từ lịch sử của robot này
+
+# Vẽ (blit_render.py): 'blit' = chỉ vẽ lại đường góc + ô chữ vừa đổi trên nền đã cache,
+# biểu đồ điểm thêm từng cột thẳng lên nền (score_chart.py);
+# 'full' = FuncAnimation vẽ lại cả figure mỗi frame như bản cũ (backend không hỗ trợ blit)
+RENDER_MODE = 'blit'
+FRAME_INTERVAL_MS = 50
+TEXT_INTERVAL = 0.25   # giây giữa 2 lần cập nhật dòng thống kê góc (vẽ chữ đắt)
+
 # Số vòng tối đa auto-tune
 MAX_ROUNDS = 30
 
 # Ngã = angle > bao nhiêu độ
 FALL_THRESHOLD = 12.0
 
+# Offline auto-tune (robot ảo, chạy song song mọi nhân CPU)
+OFFLINE_GRID = (21, 25, 11)   # số điểm lưới K1, K2, K3
+OFFLINE_REPEATS = 2           # số lần thử (nhiễu khác nhau) mỗi bộ K
+OFFLINE_SEED = 0
+OFFLINE_TOP = 20              # số bộ K tốt nhất hiện trên biểu đồ
+
+# Robot ảo: thời gian robot chạy nhanh gấp SIM_SPEED lần thời gian thực
+SIMULATED = ARGS.sim_speed > 0
+SIM_SPEED = ARGS.sim_speed if SIMULATED else 1.0
+
 # ========== GLOBAL STATE ==========
 ESP32_IP = None
-angles_buffer = deque(maxlen=500)
-angles_display = deque(maxlen=200)
+ring = SampleRing(RING_CAPACITY)   # thay bằng ring của robot được chọn khi phát hiện
+hub = None
 current_K = [START_K1, START_K2, START_K3]
+# Thống kê góc 1s / 10s / 'all' = từ lúc áp dụng current_K; cửa sổ tính theo giờ robot
+# ('t' là giờ PC → robot ảo chạy nhanh SIM_SPEED lần thì cửa sổ ngắn lại tương ứng)
+perf = RollingStats({name: None if sec is None else sec / SIM_SPEED for name, sec in WINDOWS.items()},
+                    field='angle')
+perf_K = None
+last_text_time = 0.0
 best_K = [START_K1, START_K2, START_K3]
 best_score = -1.0
 tuning_active = False
@@ -64,271 +177,303 @@ total_trials = 0
 status_text = "⏸️ Chờ bấm nút để bắt đầu..."
 results_log = []
 
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-sock.bind((UDP_IP_PC, UDP_PORT_PC))
-sock.settimeout(0.05)
+runner = None              # TrialRunner của robot đang tune (tạo khi phát hiện robot)
+offline_tuner = None
+offline_ranking = None
+trial_cache = None
 
 # ========== SOCKET FUNCTIONS ==========
-def send_gains(k1, k2, k3):
-    global ESP32_IP
-    if ESP32_IP is None:
-        print("⚠️ Chưa biết IP ESP32, đợi nhận data...")
-        return
-    msg = f"K1={k1:.2f},K2={k2:.2f},K3={k3:.2f}"
-    sock.sendto(msg.encode(), (ESP32_IP, ESP32_PORT))
-    print(f"📤 Gửi: {msg}")
-
+def robot_sleep(seconds):
+    """time.sleep() theo thời gian robot (robot ảo chạy nhanh hơn SIM_SPEED lần)"""
+    time.sleep(seconds / SIM_SPEED)
 
-def receive_loop():
-    """Thread liên tục nhận data từ ESP32"""
-    global ESP32_IP
-    while True:
-        try:
-            data, addr = sock.recvfrom(1024)
-            decoded = data.decode().strip()
-
-            # Auto-detect ESP32 IP
-            if ESP32_IP is None and addr[0] != "127.0.0.1":
-                ESP32_IP = addr[0]
-                print(f"🔗 Phát hiện ESP32: {ESP32_IP}")
-
-            if decoded.startswith("KACK"):
-                continue
-
-            values = decoded.split(',')
-            if len(values) == 3:
-                _, _, z = map(float, values)
-            elif len(values) == 1:
-                z = float(values[0])
-            else:
-                continue
 
-            angles_buffer.append(z)
-            angles_display.append(z)
-
-        except socket.timeout:
-            pass
-        except Exception:
-            pass
+def send_gains(k1, k2, k3):
+    """Gửi qua kênh lệnh của runner (seq + gửi lại khi update() / lần thử gọi poll) → seq"""
+    if runner is None:
+        print("⚠️ Chưa biết IP ESP32, đợi nhận data...")
+        return None
+    return runner.send_gains([k1, k2, k3])
 
 
-# ========== SCORING FUNCTION ==========
-def evaluate_trial(trial_angles):
+# ========== AUTO-TUNE ==========
+def run_trial(k):
     """
-    Tính điểm cho 1 bộ K dựa trên:
-    - Góc trung bình nhỏ → tốt
-    - Thời gian đứng dài → tốt
-    - Không ngã → bonus
+    TrialRunner.run() với bộ K này trên robot đang tune (KACK → ổn định → chấm điểm).
+    → (TrialScorer, SettleDetector, acked); scorer = None nếu bị DỪNG / robot rớt mạng.
     """
-    if len(trial_angles) < 10:
-        return 0.0
+    global current_K
+    current_K = [float(v) for v in k]
+    return runner.run(current_K, best_score)
 
-    abs_angles = [abs(a) for a in trial_angles]
-    avg_angle = sum(abs_angles) / len(abs_angles)
-    max_angle = max(abs_angles)
 
-    # Đếm bao nhiêu sample đứng được (|angle| < FALL_THRESHOLD)
-    standing = sum(1 for a in abs_angles if a < FALL_THRESHOLD)
-    standing_ratio = standing / len(trial_angles)
+ABORT_REASONS = {'fall': 'ngã', 'worse': 'không thể vượt best', 'trend': 'xu hướng kém hơn'}
 
-    # Nếu ngã (>50% thời gian angle lớn) → điểm rất thấp
-    if standing_ratio < 0.5:
-        return standing_ratio * 10
 
-    # Score = (thời gian đứng) / (góc trung bình + 1)
-    # Angle nhỏ + đứng lâu = score cao
-    score = (standing_ratio * 100) / (avg_angle + 0.5)
+def cache_identity():
+    """(robot, firmware) cho trial_cache; firmware = mã build trong KACK ("B=..") nếu firmware có báo"""
+    robot = ARGS.robot_id or ('sim' if SIMULATED else ESP32_IP)
+    if ARGS.firmware:
+        return robot, ARGS.firmware
+    if runner.firmware_build is not None:
+        return robot, f"build-{runner.firmware_build:08x}"
+    # Firmware cũ không báo build: chỉ phân biệt được kiểu KACK (kèm bộ K hay chỉ "KACK")
+    if isinstance(runner.last_ack, tuple):
+        firmware = 'kack-gains'
+    else:
+        firmware = 'legacy' if runner.last_ack == 'legacy' else 'unknown'
+    if CACHE_ENABLED and firmware != 'unknown':
+        print(f"⚠️ Firmware không báo mã build (B=) → khóa cache chỉ theo kiểu KACK ('{firmware}'); "
+              "nạp firmware khác thì chạy với --firmware <phiên bản> hoặc --no-cache")
+    return robot, firmware
 
-    # Bonus nếu max_angle nhỏ (dao động ít)
-    if max_angle < 5:
-        score *= 1.5
-    elif max_angle < 8:
-        score *= 1.2
 
-    return round(score, 2)
+def cache_key(k):
+    """K1..K3 đang thử + K4 thật trên robot (KACK báo lại) nếu biết"""
+    acked = runner.last_ack
+    return list(k) + [acked[3]] if isinstance(acked, tuple) else list(k)
 
 
-# ========== HILL CLIMBING AUTO-TUNE ==========
 def auto_tune_thread():
     global tuning_active, tuning_done, best_K, best_score
-    global current_K, trial_number, total_trials, status_text, results_log
-
-    # Bước 1: Đo điểm của bộ K ban đầu
-    status_text = f"📊 Đo bộ K ban đầu: K1={current_K[0]:.0f} K2={current_K[1]:.1f} K3={current_K[2]:.2f}"
-    send_gains(*current_K)
-    time.sleep(1.0)  # Đợi ổn định
-
-    angles_buffer.clear()
-    time.sleep(TRIAL_DURATION)
-    trial_angles = list(angles_buffer)
-    best_score = evaluate_trial(trial_angles)
-    best_K = current_K.copy()
-    results_log.append({
-        'k': current_K.copy(),
-        'score': best_score,
-        'trial': 0
-    })
-
-    print(f"🏁 Bắt đầu: K=({best_K[0]:.0f}, {best_K[1]:.1f}, {best_K[2]:.2f}) → Score={best_score}")
-
-    # Bước 2: Hill Climbing
+    global current_K, trial_number, total_trials, status_text, results_log, trial_cache
+
+    resumed = checkpoint.load() if ARGS.resume else None
+    if resumed is not None and resumed['finished']:
+        print("ℹ️ Checkpoint là phiên đã xong → bắt đầu phiên mới")
+        resumed = None
+
+    if resumed is not None:
+        # Dựng lại đúng optimizer cũ (cùng seed, start, prior) rồi replay các lần thử đã đo
+        session = resumed['session']
+        robot, firmware = resumed['robot'], resumed['firmware']
+        cache_path = resumed['cache_path']
+        use_cache = CACHE_ENABLED and cache_path is not None
+    else:
+        # Firmware (khóa cache) lấy từ KACK: chưa có KACK nào → gửi bộ K hiện tại, chờ xác nhận
+        if CACHE_ENABLED and not ARGS.firmware and runner.last_ack is None:
+            status_text = "⏳ Chờ robot xác nhận (KACK) để nhận diện firmware..."
+            runner.channel.wait(send_gains(*current_K), active=lambda: tuning_active)
+        robot, firmware = cache_identity()
+        use_cache = CACHE_ENABLED and firmware != 'unknown'
+        if CACHE_ENABLED and not use_cache:
+            print("⚠️ Không có KACK → không biết firmware, phiên này không dùng cache (hoặc chạy với --firmware)")
+        cache_path = None
+        prior = []
+        if use_cache:
+            trial_cache = trial_cache or TrialCache(max_age=CACHE_MAX_AGE)
+            cache_path = trial_cache.path
+            if WARM_START:
+                prior = [(e['k'][:3], e['score']) for e in trial_cache.history(robot, firmware)]
+                if prior:
+                    print(f"💾 Warm-start từ {len(prior)} lần thử đã lưu ({robot}, {firmware})")
+        # Warm-start: bắt đầu từ bộ K tốt nhất trong lịch sử (nếu có) thay cho bộ K hiện tại
+        # Seed luôn cố định trong phiên (tự sinh nếu OPTIMIZER_SEED = None) để resume được
+        session = {
+            'optimizer': OPTIMIZER,
+            'start': None if prior else current_K,
+            'seed': OPTIMIZER_SEED if OPTIMIZER_SEED is not None else np.random.SeedSequence().entropy,
+            'prior': prior,
+            'kwargs': {'steps': K_STEPS} if OPTIMIZER == 'hill' else {},
+        }
+    if cache_path and (trial_cache is None or trial_cache.path != cache_path):
+        trial_cache = TrialCache(cache_path, max_age=CACHE_MAX_AGE)
+
+    optimizer = make_optimizer(session['optimizer'], K_BOUNDS, start=session['start'], seed=session['seed'],
+                               prior=session['prior'], **session['kwargs'])
+    best_score = -1.0
     trial_number = 0
-    no_improve_count = 0
-    step_sizes = [K1_STEP, K2_STEP, K3_STEP]
-    k_mins = [K1_MIN, K2_MIN, K3_MIN]
-    k_maxs = [K1_MAX, K2_MAX, K3_MAX]
-
-    while tuning_active and trial_number < MAX_ROUNDS and no_improve_count < 9:
-        # Chọn 1 trong 3 K để thay đổi
-        k_index = trial_number % 3  # Luân phiên K1, K2, K3
-        direction = random.choice([-1, 1])  # Tăng hoặc giảm
-
-        # Tạo bộ K thử
-        test_K = best_K.copy()
-        test_K[k_index] += direction * step_sizes[k_index]
-        test_K[k_index] = max(k_mins[k_index], min(k_maxs[k_index], test_K[k_index]))
-
-        # Bỏ qua nếu giống bộ best
-        if test_K == best_K:
-            trial_number += 1
-            continue
 
-        trial_number += 1
-        total_trials = trial_number
-        k_names = ['K1', 'K2', 'K3']
-        status_text = (f"🔄 Thử #{trial_number}/{MAX_ROUNDS}: "
-                      f"{k_names[k_index]}={test_K[k_index]:.2f} "
-                      f"(best={best_score:.1f})")
-
-        # Gửi bộ K thử
-        current_K = test_K.copy()
-        send_gains(*current_K)
-        time.sleep(1.5)  # Đợi robot ổn định với K mới
-
-        # Thu thập angle data
-        angles_buffer.clear()
-        time.sleep(TRIAL_DURATION)
-        trial_angles = list(angles_buffer)
-
-        if not tuning_active:
-            break
-
-        score = evaluate_trial(trial_angles)
-        results_log.append({
-            'k': test_K.copy(),
-            'score': score,
-            'trial': trial_number
+    if resumed is not None:
+        results_log = resumed['results_log']
+        matched = checkpoint.replay(optimizer, results_log)
+        best_K, best_score = resumed['best_K'], resumed['best_score']
+        current_K = best_K.copy()
+        trial_number = total_trials = resumed['trial_number'] + 1
+        print(f"♻️ Tiếp tục phiên {optimizer.name}: {len(results_log)} lần thử đã có "
+              f"(khớp {matched}), best={best_score:.1f} → thử #{trial_number}")
+        if matched < len(results_log):
+            print("⚠️ Optimizer hỏi bộ K khác lúc trước (đã đổi code / cấu hình?) — vẫn dùng điểm đã đo")
+
+    def save_checkpoint(finished=False):
+        checkpoint.save({
+            'session': session,
+            'robot': robot,
+            'firmware': firmware,
+            'cache_path': cache_path,
+            'best_K': best_K,
+            'best_score': best_score,
+            'trial_number': total_trials,
+            'results_log': results_log,
+            'finished': finished,
+            'time': time.time(),
         })
 
-        print(f"  #{trial_number}: K=({test_K[0]:.0f}, {test_K[1]:.1f}, {test_K[2]:.2f}) "
-              f"→ Score={score:.1f} {'✅ TỐT HƠN!' if score > best_score else '❌'}")
-
-        if score > best_score:
-            best_score = score
-            best_K = test_K.copy()
-            no_improve_count = 0
-            status_text = f"✅ Tốt hơn! Score={score:.1f} | K=({best_K[0]:.0f}, {best_K[1]:.1f}, {best_K[2]:.2f})"
+    # Lần thử #0 luôn là bộ K hiện tại (đo điểm ban đầu), sau đó optimizer đề xuất
+    while tuning_active and trial_number <= MAX_ROUNDS and not optimizer.done:
+        test_K = [float(v) for v in optimizer.ask()]
+        if trial_number == 0:
+            status_text = f"📊 Đo bộ K ban đầu: K1={test_K[0]:.0f} K2={test_K[1]:.1f} K3={test_K[2]:.2f}"
         else:
-            no_improve_count += 1
-
-            # Thử hướng ngược lại
-            test_K2 = best_K.copy()
-            test_K2[k_index] -= direction * step_sizes[k_index]
-            test_K2[k_index] = max(k_mins[k_index], min(k_maxs[k_index], test_K2[k_index]))
-
-            if test_K2 != best_K:
-                trial_number += 1
-                total_trials = trial_number
-                status_text = (f"🔄 Thử ngược #{trial_number}: "
-                              f"{k_names[k_index]}={test_K2[k_index]:.2f}")
-
-                current_K = test_K2.copy()
-                send_gains(*current_K)
-                time.sleep(1.5)
-                angles_buffer.clear()
-                time.sleep(TRIAL_DURATION)
-                trial_angles = list(angles_buffer)
-
-                if not tuning_active:
-                    break
-
-                score2 = evaluate_trial(trial_angles)
-                results_log.append({
-                    'k': test_K2.copy(),
-                    'score': score2,
-                    'trial': trial_number
+            status_text = (f"🔄 [{optimizer.name}] Thử #{trial_number}/{MAX_ROUNDS}: "
+                           f"K1={test_K[0]:.1f} K2={test_K[1]:.1f} K3={test_K[2]:.2f} "
+                           f"(best={best_score:.1f})")
+
+        # Bộ K đã đo gần đây (cùng robot, firmware) → dùng lại điểm, không tốn thời gian robot
+        hit = trial_cache.get(cache_key(test_K), robot, firmware) if use_cache else None
+        if hit is not None:
+            score = hit['score']
+            optimizer.tell(test_K, score)
+            total_trials = trial_number
+            results_log.append({'k': test_K.copy(), 'score': score, 'trial': trial_number, 'cached': True})
+            age = (time.time() - hit['time']) / 3600
+            detail = f"💾 từ cache ({age:.1f} giờ trước)"
+        else:
+            scorer, settle, acked = run_trial(test_K)
+            if scorer is None:
+                if runner.dropped:
+                    # Robot rớt mạng: dừng phiên, checkpoint vẫn còn → --resume khi robot quay lại
+                    status_text = "📴 Mất kết nối robot — bật lại rồi chạy với --resume"
+                break
+            score = scorer.score()
+            optimizer.tell(test_K, score)
+            total_trials = trial_number
+            results_log.append({
+                'k': test_K.copy(),
+                'score': score,
+                'trial': trial_number,
+                'stopped': scorer.stopped,
+                'duration': scorer.fraction * TRIAL_DURATION,
+                'window': scorer.window,
+                'settle': settle.elapsed,
+                'settled': settle.settled,
+                'fallen': settle.fallen,
+                'acked': acked
+            })
+            # Chỉ lưu lần thử sạch: có KACK, robot đã ổn định trước khi đo (ngã / chưa ổn định
+            # khi chờ → điểm không đại diện cho bộ K này) và đo đủ TRIAL_DURATION — dừng sớm
+            # ('worse' / 'trend' / 'fall') thì score là ngoại suy theo best_score của phiên này
+            if use_cache and acked and settle.settled and scorer.stopped is None:
+                trial_cache.put(cache_key(test_K), robot, firmware, score, stats={
+                    'samples': scorer.count,
+                    'mean_abs': scorer.sum_abs / max(scorer.count, 1),
+                    'max_abs': scorer.max_abs,
+                    'standing': scorer.standing / max(scorer.count, 1),
+                    'stopped': scorer.stopped,
+                    'settle': settle.elapsed,
                 })
 
-                print(f"  #{trial_number}: K=({test_K2[0]:.0f}, {test_K2[1]:.1f}, {test_K2[2]:.2f}) "
-                      f"→ Score={score2:.1f} {'✅' if score2 > best_score else '❌'}")
+            early = (f" (dừng sớm: {ABORT_REASONS[scorer.stopped]} sau {scorer.fraction * TRIAL_DURATION:.1f}s)"
+                     if scorer.stopped else "")
+            if settle.settled:
+                detail = f"ổn định {settle.elapsed:.2f}s"
+            else:
+                detail = "⚠️ ngã khi chờ" if settle.fallen else f"⚠️ chưa ổn định sau {settle.elapsed:.1f}s"
+            detail += f"{'' if acked else ' | ⚠️ không có KACK'}{early}"
 
-                if score2 > best_score:
-                    best_score = score2
-                    best_K = test_K2.copy()
-                    no_improve_count = 0
+        better = score > best_score
+        mark = '🏁' if trial_number == 0 else ('✅ TỐT HƠN!' if better else '❌')
+        print(f"  #{trial_number}: K=({test_K[0]:.0f}, {test_K[1]:.1f}, {test_K[2]:.2f}) "
+              f"→ Score={score:.1f} {mark} | {detail}")
+        if better:
+            best_score = score
+            best_K = test_K.copy()
+            if trial_number:
+                status_text = (f"✅ Tốt hơn! Score={score:.1f} | "
+                               f"K=({best_K[0]:.0f}, {best_K[1]:.1f}, {best_K[2]:.2f})")
+        save_checkpoint()
+        trial_number += 1
+    trial_number = total_trials
+    # Bị DỪNG giữa chừng / robot rớt mạng → checkpoint vẫn dở, --resume đi tiếp được
+    if tuning_active and not runner.dropped:
+        save_checkpoint(finished=True)
 
-    # Kết thúc: gửi bộ K tốt nhất
+    # Kết thúc: gửi bộ K tốt nhất (chờ robot xác nhận — headless thoát ngay sau đó)
     current_K = best_K.copy()
-    send_gains(*best_K)
+    if not runner.dropped and not runner.channel.wait(send_gains(*best_K)):
+        print("⚠️ Robot chưa xác nhận bộ K tốt nhất — bấm 💾 Áp dụng để gửi lại")
     tuning_active = False
     tuning_done = True
-    status_text = (f"🏆 XONG! Best: K1={best_K[0]:.1f} K2={best_K[1]:.1f} K3={best_K[2]:.2f} "
-                  f"Score={best_score:.1f} ({trial_number} trials)")
+    if not runner.dropped:
+        status_text = (f"🏆 XONG! Best: K1={best_K[0]:.1f} K2={best_K[1]:.1f} K3={best_K[2]:.2f} "
+                       f"Score={best_score:.1f} ({trial_number} trials, {optimizer.name})")
 
     print(f"\n{'='*50}")
-    print(f"🏆 KẾT QUẢ AUTO-TUNE:")
+    print(f"🏆 KẾT QUẢ AUTO-TUNE ({optimizer.name}):")
     print(f"   K1 = {best_K[0]:.1f}")
     print(f"   K2 = {best_K[1]:.1f}")
     print(f"   K3 = {best_K[2]:.2f}")
     print(f"   Score = {best_score:.1f}")
     print(f"   Trials = {trial_number}")
+    settles = [r['settle'] for r in results_log if 'settle' in r]
+    if settles:
+        print(f"   Ổn định TB = {np.mean(settles):.2f}s (tổng {sum(settles):.1f}s, "
+              f"trước đây {1.5 * len(settles):.0f}s với sleep(1.5))")
+    falls = sum(1 for r in results_log if r.get('fallen'))
+    trial_falls = sum(1 for r in results_log if r.get('stopped') == 'fall')
+    ramp = f"{GAIN_RAMP} {RAMP_TIME:.2f}s" if GAIN_RAMP != 'off' else 'tắt'
+    print(f"   Ramp K = {ramp} | ngã khi chờ ổn định = {falls}, ngã khi đo = {trial_falls}, "
+          f"chờ dựng lại = {runner.pickups}")
+    early = [r for r in results_log if r.get('stopped')]
+    print(f"   Dừng sớm = {len(early)} lần (tiết kiệm "
+          f"{sum(TRIAL_DURATION - r['duration'] for r in early):.1f}s đo)")
+    print(f"   Sample mất = {runner.lost_samples}")
+    stats = runner.channel.snapshot()
+    print(f"   Lệnh K = {stats['acked']}/{stats['sent']} có ACK (gửi lại {stats['retransmits']}, "
+          f"mất {stats['failed']}) | RTT p50 {stats['rtt_p50_ms']:.1f}ms p95 {stats['rtt_p95_ms']:.1f}ms")
+    cached = sum(1 for r in results_log if r.get('cached'))
+    if use_cache:
+        print(f"   Cache = {cached} lần thử dùng lại ({len(trial_cache)} mục trong {trial_cache.path})")
     print(f"{'='*50}")
 
 
-# ========== GUI ==========
-plt.style.use('seaborn-v0_8-darkgrid')
-fig, (ax_angle, ax_score) = plt.subplots(2, 1, figsize=(10, 7),
-                                          gridspec_kw={'height_ratios': [2, 1]})
-plt.subplots_adjust(bottom=0.18, hspace=0.35)
-
-# --- Angle plot ---
-line_angle, = ax_angle.plot([], [], color='dodgerblue', linewidth=1.5, label='Robot Angle')
-ax_angle.axhline(y=0, color='green', linestyle='--', alpha=0.5, linewidth=0.8)
-ax_angle.axhline(y=FALL_THRESHOLD, color='red', linestyle=':', alpha=0.4, label=f'Ngã ({FALL_THRESHOLD}°)')
-ax_angle.axhline(y=-FALL_THRESHOLD, color='red', linestyle=':', alpha=0.4)
-ax_angle.set_ylim(-20, 20)
-ax_angle.set_xlim(0, 200)
-ax_angle.set_xlabel("Samples")
-ax_angle.set_ylabel("Angle (°)")
-ax_angle.set_title("🤖 AUTO-TUNE PID — Reaction Wheel Balance")
-ax_angle.legend(loc='upper right', fontsize=8)
-
-# --- Score plot ---
-ax_score.set_ylabel("Score")
-ax_score.set_xlabel("Trial #")
-ax_score.set_title("📊 Điểm mỗi lần thử (cao = tốt)")
-
-# --- Status text ---
-status_display = fig.text(0.5, 0.10, status_text, ha='center', fontsize=11,
-                          fontweight='bold', color='navy',
-                          bbox=dict(boxstyle='round,pad=0.5', facecolor='lightyellow'))
-
-# --- Current K display ---
-k_display = fig.text(0.5, 0.05, f"K1={current_K[0]:.1f}  K2={current_K[1]:.1f}  K3={current_K[2]:.2f}",
-                     ha='center', fontsize=10, color='darkgreen',
-                     bbox=dict(boxstyle='round,pad=0.3', facecolor='honeydew'))
-
-# --- Buttons ---
-ax_start = plt.axes([0.15, 0.01, 0.25, 0.04])
-ax_stop = plt.axes([0.45, 0.01, 0.15, 0.04])
-ax_apply = plt.axes([0.65, 0.01, 0.20, 0.04])
-
-btn_start = Button(ax_start, '▶ BẮT ĐẦU AUTO-TUNE', color='lightgreen', hovercolor='lime')
-btn_stop = Button(ax_stop, '⏹ DỪNG', color='lightyellow', hovercolor='orange')
-btn_apply = Button(ax_apply, '💾 ÁP DỤNG BEST', color='lightcyan', hovercolor='cyan')
+# ========== OFFLINE AUTO-TUNE (ROBOT ẢO) ==========
+def offline_tune_thread():
+    """Chấm cả lưới K1/K2/K3 trên robot ảo; kết quả xếp hạng, bấm ÁP DỤNG BEST để gửi"""
+    global tuning_active, tuning_done, best_K, best_score
+    global current_K, trial_number, total_trials, status_text, results_log
+    global offline_tuner, offline_ranking
+
+    # Bộ K gửi xuống chỉ có K1..K3 → chấm với X4 robot đang chạy (KACK báo lại), chưa biết → mặc định firmware
+    acked = runner.last_ack if runner is not None else None
+    k4 = acked[3] if isinstance(acked, tuple) else FIRMWARE_K4
+    candidates = grid_candidates(OFFLINE_GRID, ranges=K_BOUNDS, k4=k4)
+    offline_tuner = OfflineTuner(candidates, repeats=OFFLINE_REPEATS, seed=OFFLINE_SEED)
+    status_text = f"🧮 Offline: {len(candidates)} bộ K trên {offline_tuner.workers} tiến trình..."
+
+    def progress(done, total, best):
+        global status_text, trial_number, total_trials
+        trial_number = total_trials = done
+        status_text = f"🧮 Offline: {done}/{total} bộ K | best={best:.1f}"
+
+    ranking = offline_tuner.run(on_progress=progress)
+    offline_ranking = ranking
+    stopped = offline_tuner.cancelled
+    offline_tuner = None
+
+    if len(ranking) > 0:
+        best = ranking[0]
+        best_K = [float(best['k1']), float(best['k2']), float(best['k3'])]
+        best_score = float(best['score'])
+        current_K = best_K.copy()
+        results_log = [{'k': [float(r['k1']), float(r['k2']), float(r['k3'])],
+                        'score': float(r['score']), 'trial': i}
+                       for i, r in enumerate(ranking[:OFFLINE_TOP], 1)]
+
+    tuning_active = False
+    tuning_done = True
+    status_text = (f"{'⏹ Đã dừng' if stopped else '🏆 XONG'} offline: {len(ranking)} bộ K | "
+                   f"Best: K1={best_K[0]:.1f} K2={best_K[1]:.1f} K3={best_K[2]:.2f} "
+                   f"Score={best_score:.1f} → bấm ÁP DỤNG BEST")
+
+    print(f"\n{'='*50}")
+    print(f"🧮 OFFLINE AUTO-TUNE ({len(ranking)} bộ K{', đã dừng' if stopped else ''}):")
+    for i, r in enumerate(ranking[:10], 1):
+        print(f"   #{i}: K1={r['k1']:.1f} K2={r['k2']:.1f} K3={r['k3']:.2f} → Score={r['score']:.1f}")
+    print(f"{'='*50}")
 
 
+# ========== BUTTON CALLBACKS ==========
 def on_start(event):
     global tuning_active, tuning_done, trial_number, results_log
     if tuning_active:
@@ -340,14 +485,29 @@ def on_start(event):
     tuning_done = False
     trial_number = 0
     results_log = []
+    runner.dropped = False
     t = threading.Thread(target=auto_tune_thread, daemon=True)
     t.start()
     print("🚀 Bắt đầu Auto-Tune!")
 
 
+def on_offline(event):
+    global tuning_active, tuning_done, trial_number, results_log
+    if tuning_active:
+        return
+    tuning_active = True
+    tuning_done = False
+    trial_number = 0
+    results_log = []
+    threading.Thread(target=offline_tune_thread, daemon=True).start()
+    print("🧮 Bắt đầu Auto-Tune offline trên robot ảo!")
+
+
 def on_stop(event):
     global tuning_active, status_text
     tuning_active = False
+    if offline_tuner is not None:
+        offline_tuner.cancel()
     status_text = "⏹ Đã dừng. Bộ K tốt nhất đã được gửi."
     send_gains(*best_K)
 
@@ -356,31 +516,66 @@ def on_apply(event):
     print(f"💾 Áp dụng: K1={best_K[0]:.1f} K2={best_K[1]:.1f} K3={best_K[2]:.2f}")
 
 
-btn_start.on_clicked(on_start)
-btn_stop.on_clicked(on_stop)
-btn_apply.on_clicked(on_apply)
+def select_robot():
+    """RobotLink cần tune: đúng --robot, hoặc robot đầu tiên (robot ảo chạy trên chính máy này)"""
+    if ARGS.robot:
+        ip, _, port = ARGS.robot.partition(':')
+        return hub.robot((ip, int(port)) if port else ip)
+    for robot in list(hub.robots.values()):
+        if SIMULATED or robot.addr[0] != "127.0.0.1":
+            return robot
+    return None
+
+
+# Phát hiện ESP32 (hub tách các robot theo địa chỉ nguồn), rồi gửi K ban đầu
+def wait_and_send():
+    global ESP32_IP, ESP32_PORT, ring, runner
+    while ESP32_IP is None:
+        robot = select_robot()
+        if robot is None:
+            time.sleep(0.1)
+            continue
+        # KACK / sample của robot khác trên cùng cổng không lẫn vào
+        runner = TrialRunner(robot, speed=SIM_SPEED, trial_duration=TRIAL_DURATION,
+                             fall_threshold=FALL_THRESHOLD, early_abort=EARLY_ABORT, poll=TRIAL_POLL,
+                             ack_timeout=ACK_TIMEOUT, ack_retries=ACK_RETRIES,
+                             ramp=GAIN_RAMP, ramp_time=RAMP_TIME,
+                             active=lambda: tuning_active)
+        ring = robot.ring
+        ESP32_IP, ESP32_PORT = robot.addr
+        others = len(hub) - 1
+        print(f"🔗 Phát hiện ESP32: {ESP32_IP}:{ESP32_PORT}" + (f" (+{others} robot khác)" if others else ""))
+    robot_sleep(1)
+    send_gains(START_K1, START_K2, START_K3)
 
 
 # ========== ANIMATION UPDATE ==========
 def update(frame):
+    global perf_K, last_text_time
+    # Gửi lại lệnh K chưa có KACK (nút Dừng / Áp dụng không chờ ACK)
+    if runner is not None:
+        runner.channel.poll()
+
     # Update angle chart
-    if len(angles_display) > 0:
-        line_angle.set_data(range(len(angles_display)), list(angles_display))
-
-    # Update score chart
-    if len(results_log) > 0:
-        ax_score.clear()
-        trials = [r['trial'] for r in results_log]
-        scores = [r['score'] for r in results_log]
-        colors = ['green' if s == best_score else 'steelblue' for s in scores]
-        ax_score.bar(trials, scores, color=colors, alpha=0.7)
-        ax_score.set_ylabel("Score")
-        ax_score.set_xlabel("Trial #")
-        ax_score.set_title(f"📊 Scores — Best: {best_score:.1f}")
-        if best_score > 0:
-            ax_score.axhline(y=best_score, color='green', linestyle='--', alpha=0.5, linewidth=1)
-
-    # Update status
+    angles = ring.latest(200)['angle']
+    if len(angles) > 0:
+        line_angle.set_data(np.arange(len(angles)), angles)
+
+    # Thống kê trượt chỉ nhận sample mới; đổi bộ K → bắt đầu lại cửa sổ 'all'
+    if perf_K != current_K:
+        perf_K = list(current_K)
+        perf.reset()
+    perf.update_from(ring)
+    now = time.perf_counter()
+    if perf['1s'].n > 0 and now - last_text_time >= TEXT_INTERVAL:
+        last_text_time = now
+        perf_display.set_text(f"RMS 1s: {perf['1s'].rms:.2f}°  10s: {perf['10s'].rms:.2f}°  |  "
+                              f"Max 10s: {perf['10s'].max:.1f}°  |  ±{perf.band:g}°: {perf['all'].in_band:.0f}%")
+
+    # Biểu đồ điểm: chỉ vẽ các lần thử mới (không có lần thử mới → không đụng tới)
+    score_chart.sync(results_log)
+
+    # Update status (set_text cùng nội dung không làm ô chữ phải vẽ lại)
     status_display.set_text(status_text)
     k_display.set_text(f"K1={current_K[0]:.1f}  K2={current_K[1]:.1f}  K3={current_K[2]:.2f}  |  "
                        f"Best: K1={best_K[0]:.1f}  K2={best_K[1]:.1f}  K3={best_K[2]:.2f}")
@@ -388,28 +583,110 @@ def update(frame):
     return line_angle,
 
 
-# ========== START ==========
-# Khởi động thread nhận data
-recv_thread = threading.Thread(target=receive_loop, daemon=True)
-recv_thread.start()
-
-print("=" * 50)
-print("🤖 AUTO-TUNE PID — Reaction Wheel Balance")
-print("=" * 50)
-print(f"📍 Bắt đầu từ: K1={START_K1}, K2={START_K2}, K3={START_K3}")
-print(f"📍 Phạm vi: K1=[{K1_MIN}-{K1_MAX}] K2=[{K2_MIN}-{K2_MAX}] K3=[{K3_MIN}-{K3_MAX}]")
-print(f"📍 Thời gian đo: {TRIAL_DURATION}s/trial | Tối đa: {MAX_ROUNDS} trials")
-print("📍 Đợi kết nối ESP32...")
-print()
-
-# Gửi K ban đầu khi có IP
-def wait_and_send():
-    while ESP32_IP is None:
-        time.sleep(0.5)
-    time.sleep(1)
-    send_gains(START_K1, START_K2, START_K3)
-
-threading.Thread(target=wait_and_send, daemon=True).start()
-
-ani = animation.FuncAnimation(fig, update, interval=50, blit=False, cache_frame_data=False)
-plt.show()
+# ProcessPoolExecutor (offline) trên Windows chạy lại file này trong tiến trình con
+# → chỉ mở socket / GUI ở tiến trình chính
+if __name__ == "__main__":
+    # ========== GUI ==========
+    plt.style.use('seaborn-v0_8-darkgrid')
+    fig, (ax_angle, ax_score) = plt.subplots(2, 1, figsize=(10, 7),
+                                              gridspec_kw={'height_ratios': [2, 1]})
+    plt.subplots_adjust(bottom=0.18, hspace=0.35)
+
+    # --- Angle plot ---
+    line_angle, = ax_angle.plot([], [], color='dodgerblue', linewidth=1.5, label='Robot Angle')
+    ax_angle.axhline(y=0, color='green', linestyle='--', alpha=0.5, linewidth=0.8)
+    ax_angle.axhline(y=FALL_THRESHOLD, color='red', linestyle=':', alpha=0.4, label=f'Ngã ({FALL_THRESHOLD}°)')
+    ax_angle.axhline(y=-FALL_THRESHOLD, color='red', linestyle=':', alpha=0.4)
+    ax_angle.set_ylim(-20, 20)
+    ax_angle.set_xlim(0, 200)
+    ax_angle.set_xlabel("Samples")
+    ax_angle.set_ylabel("Angle (°)")
+    ax_angle.set_title("🤖 AUTO-TUNE PID — Reaction Wheel Balance")
+    ax_angle.legend(loc='upper right', fontsize=8)
+
+    # --- Thống kê góc (ô riêng trên tiêu đề: cập nhật không phải vẽ lại trục góc) ---
+    perf_ax = fig.add_axes([0.1, 0.93, 0.8, 0.05])
+    perf_ax.axis('off')
+    perf_display = perf_ax.text(0.5, 0.5, '', ha='center', va='center', fontsize=10, color='dimgray')
+
+    # --- Score plot (nhãn / tiêu đề / legend do ScoreChart quản lý) ---
+    score_chart = ScoreChart(ax_score)
+
+    # --- Status + current K (chung 1 ô, không đè lên nút bấm: blit dán lại nền cả ô) ---
+    info_ax = fig.add_axes([0.0, 0.052, 1.0, 0.09])
+    info_ax.axis('off')
+    status_display = info_ax.text(0.5, 0.62, status_text, ha='center', va='center', fontsize=11,
+                                  fontweight='bold', color='navy',
+                                  bbox=dict(boxstyle='round,pad=0.5', facecolor='lightyellow'))
+
+    # --- Current K display ---
+    k_display = info_ax.text(0.5, 0.17, f"K1={current_K[0]:.1f}  K2={current_K[1]:.1f}  K3={current_K[2]:.2f}",
+                             ha='center', va='center', fontsize=10, color='darkgreen',
+                             bbox=dict(boxstyle='round,pad=0.3', facecolor='honeydew'))
+
+    # --- Buttons ---
+    ax_start = plt.axes([0.05, 0.01, 0.25, 0.04])
+    ax_offline = plt.axes([0.32, 0.01, 0.20, 0.04])
+    ax_stop = plt.axes([0.54, 0.01, 0.15, 0.04])
+    ax_apply = plt.axes([0.71, 0.01, 0.20, 0.04])
+
+    btn_start = Button(ax_start, '▶ BẮT ĐẦU AUTO-TUNE', color='lightgreen', hovercolor='lime')
+    btn_offline = Button(ax_offline, '🧮 OFFLINE (SIM)', color='lavender', hovercolor='violet')
+    btn_stop = Button(ax_stop, '⏹ DỪNG', color='lightyellow', hovercolor='orange')
+    btn_apply = Button(ax_apply, '💾 ÁP DỤNG BEST', color='lightcyan', hovercolor='cyan')
+
+    btn_start.on_clicked(on_start)
+    btn_offline.on_clicked(on_offline)
+    btn_stop.on_clicked(on_stop)
+    btn_apply.on_clicked(on_apply)
+
+    # ========== START ==========
+    if ARGS.relay:
+        sock = RelaySocket()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((UDP_IP_PC, UDP_PORT_PC))
+
+    # Khởi động thread nhận data (mỗi robot 1 ring; gói CSV cũ chỉ có góc)
+    hub = TelemetryHub(sock, ring_capacity=RING_CAPACITY, single_field='angle').start()
+
+    print("=" * 50)
+    print("🤖 AUTO-TUNE PID — Reaction Wheel Balance")
+    print("=" * 50)
+    print(f"📍 Bắt đầu từ: K1={START_K1}, K2={START_K2}, K3={START_K3}")
+    print(f"📍 Phạm vi: K1=[{K1_MIN}-{K1_MAX}] K2=[{K2_MIN}-{K2_MAX}] K3=[{K3_MIN}-{K3_MAX}]")
+    print(f"📍 Thời gian đo: {TRIAL_DURATION}s/trial | Tối đa: {MAX_ROUNDS} trials")
+    print("📍 Đợi kết nối ESP32...")
+    print()
+
+    threading.Thread(target=wait_and_send, daemon=True).start()
+
+    if ARGS.headless:
+        if ARGS.offline:
+            on_offline(None)
+        else:
+            while ESP32_IP is None:
+                time.sleep(0.1)
+            robot_sleep(1.5)  # sau wait_and_send
+            on_start(None)
+        try:
+            while not tuning_done:
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            on_stop(None)
+    elif RENDER_MODE == 'blit' and fig.canvas.supports_blit:
+        blit = BlitManager(fig.canvas, [line_angle, perf_display, status_display, k_display])
+        score_chart.blit = blit
+
+        def render():
+            update(None)
+            blit.update()
+
+        ani = fig.canvas.new_timer(interval=FRAME_INTERVAL_MS)
+        ani.add_callback(render)
+        ani.start()
+        plt.show()
+    else:
+        ani = animation.FuncAnimation(fig, update, interval=FRAME_INTERVAL_MS, blit=False, cache_frame_data=False)
+        plt.show()
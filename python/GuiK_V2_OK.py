@@ -1,10 +1,18 @@
 import socket
+import time
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from matplotlib.widgets import Slider, Button, TextBox
-from collections import deque
 import numpy as np
 import matplotlib
+from telemetry import SampleRing, TelemetryReceiver
+from smoothing import Smoother, make_filter
+from rolling_stats import RollingStats, format_rolling
+from blit_render import BlitManager, StageTimer, format_timing
+from lod_history import LodHistory
+from link_stats import format_stats
+from gain_channel import GainChannel, format_channel_stats
+from telemetry_relay import RelaySocket
 matplotlib.rcParams['font.size'] = 9
 
 # --- Cấu hình UDP (TỐI ƯU HÓA) ---
@@ -12,61 +20,74 @@ UDP_IP_PC = "0.0.0.0"
 UDP_PORT_PC = 4210
 ESP32_IP = "192.168.1.7"
 ESP32_PORT = 4210
+# True: nhận qua telemetry_relay.py (chạy cùng lúc với AutoTune / bộ ghi log)
+USE_RELAY = False
 
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # Tăng buffer
-sock.bind((UDP_IP_PC, UDP_PORT_PC))
-sock.settimeout(0.01)  # Giảm timeout để responsive hơn
-
-# --- Dữ liệu biểu đồ ---
-MAX_POINTS = 300
-angle_data = deque(maxlen=MAX_POINTS)
-pwm_data = deque(maxlen=MAX_POINTS)
-time_data = deque(maxlen=MAX_POINTS)
+if USE_RELAY:
+    sock = RelaySocket()
+else:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # Tăng buffer
+    sock.bind((UDP_IP_PC, UDP_PORT_PC))
+sock.settimeout(0.1)  # Thread nhận chạy nền nên timeout chỉ để kiểm tra cờ dừng
 
 # --- SMOOTHING DATA ---
-# Thêm moving average để làm mượt đường line
-angle_smooth = deque(maxlen=MAX_POINTS)
-pwm_smooth = deque(maxlen=MAX_POINTS)
-SMOOTH_WINDOW = 5  # Số điểm để tính trung bình
-
-def moving_average(data, window=SMOOTH_WINDOW):
-    """Tính moving average để làm mượt dữ liệu"""
-    if len(data) < window:
-        return list(data)
-    result = []
-    for i in range(len(data)):
-        start = max(0, i - window + 1)
-        result.append(np.mean(list(data)[start:i+1]))
-    return result
+# Làm mượt theo luồng trong thread nhận (smoothing.py): mỗi sample chỉ lọc 1 lần,
+# kết quả nằm ngay trong ring (angle_err_smooth, pwm_smooth) → SMOOTH_WINDOW lớn
+# bao nhiêu cũng không làm chậm frame
+SMOOTH_FILTER = 'sma'  # 'sma' | 'ema' | 'savgol' | 'euro'
+SMOOTH_WINDOW = 5      # Số điểm để tính trung bình
+smoother = Smoother({name: make_filter(SMOOTH_FILTER, SMOOTH_WINDOW) for name in ('angle_err', 'pwm')})
+
+# --- Dữ liệu biểu đồ ---
+# Ring buffer NumPy cấp phát sẵn, thread nền ghi liên tục, GUI chỉ đọc view
+MAX_POINTS = 300       # số sample trên trục x lúc mở (zoom bằng lăn chuột)
+RING_CAPACITY = 4096
+ring = SampleRing(RING_CAPACITY, smoother.ring_dtype())
+
+# --- Lịch sử dài + zoom (lod_history.py) ---
+# Đồ thị vẽ đường bao min/max ~1 cặp điểm / pixel từ kim tự tháp nhiều mức → xem lại
+# cả phiên mà số vertex mỗi frame không đổi.
+# Lăn chuột trên đồ thị: zoom  |  Shift + lăn chuột hoặc ← →: cuộn lại  |  End: về LIVE
+MIN_SPAN = 20
+history = LodHistory(('angle_err', 'pwm', 'angle_err_smooth', 'pwm_smooth'))
+view_span = MAX_POINTS   # số sample trên trục x
+view_end = None          # None = LIVE (mép phải = sample mới nhất); số = chỉ số sample ở mép phải
+
+# --- Vẽ (blit_render.py) ---
+# 'blit': chỉ vẽ lại 4 đường + 2 ô chữ trên nền đã cache (nền chụp lại khi resize / kéo slider)
+# 'full': FuncAnimation vẽ lại cả figure mỗi frame như bản cũ (backend không hỗ trợ blit)
+RENDER_MODE = 'blit'
+FRAME_INTERVAL_MS = 16   # ~60 FPS
+# Vẽ chữ đắt hơn vẽ cả nghìn điểm của 1 đường → status / performance thay phiên cập nhật,
+# mỗi ô 4 lần/giây, không bao giờ cùng 1 frame
+TEXT_INTERVAL = 0.25
+frame_timer = StageTimer()
+
+# --- Thống kê chất lượng (rolling_stats.py) ---
+# Cập nhật theo từng sample mới (O(1)) trên 3 cửa sổ: 1 giây, 10 giây, cả phiên
+perf = RollingStats(field='angle_err')
 
 # --- HỆ SỐ PID TỐI ƯU (ĐỀ XUẤT) ---
 # Bạn có thể thử các giá trị này để cân bằng tốt hơn
 K1, K2, K3, K4 = 85.0, 15.0, 0.08, 0.5  # Tăng P, D, Brake và thêm I
 
 # --- Hàm gửi hệ số ---
-last_sent_time = 0
-SEND_INTERVAL = 0.1  # Chỉ gửi sau 100ms để tránh spam
-
-def send_gains(k1, k2, k3, k4, force=False):
-    global last_sent_time
-    import time
-    current_time = time.time()
-    
-    if not force and (current_time - last_sent_time) < SEND_INTERVAL:
-        return False  # Không gửi nếu quá gần lần gửi trước
-    
-    msg = f"K1={k1:.2f},K2={k2:.2f},K3={k3:.2f},K4={k4:.2f}"
+# Lệnh mang số thứ tự, gửi lại tới khi có KACK đúng lệnh đó (gain_channel.py).
+# Kéo slider: chỉ 1 lệnh trên đường truyền, giá trị mới nhất thay giá trị đang chờ
+def send_raw(msg):
     try:
         sock.sendto(msg.encode(), (ESP32_IP, ESP32_PORT))
         print(f"📤 {msg}")
-        last_sent_time = current_time
-        return True
     except Exception as e:
         print(f"❌ Error sending: {e}")
-        return False
 
-send_gains(K1, K2, K3, K4, force=True)
+channel = GainChannel(send_raw)
+
+def send_gains(k1, k2, k3, k4):
+    return channel.send((k1, k2, k3, k4))
+
+send_gains(K1, K2, K3, K4)
 
 # --- Giao diện ---
 fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(11, 7))
@@ -78,7 +99,7 @@ fig.canvas.manager.set_window_title('🤖 Self-Balancing Robot - PID Tuner')
 ax1.set_facecolor('#16213e')
 ax1.set_title('🎯 Angle Error (°) - Real-time & Smoothed', color='white', fontweight='bold')
 ax1.set_ylim(-15, 15)
-ax1.set_xlim(0, MAX_POINTS)
+ax1.set_xlim(-MAX_POINTS, 0)
 ax1.grid(True, alpha=0.2, color='#444', linestyle='--', linewidth=0.5)
 ax1.axhline(y=0, color='#00ff88', linewidth=1.5, linestyle='--', alpha=0.7, label='Target')
 ax1.axhline(y=2, color='#ff6b6b', linewidth=0.5, linestyle=':', alpha=0.4)
@@ -98,7 +119,7 @@ ax1.legend(loc='upper right', facecolor='#16213e', edgecolor='#444', labelcolor=
 ax2.set_facecolor('#16213e')
 ax2.set_title('⚡ Motor PWM Output', color='white', fontweight='bold')
 ax2.set_ylim(-280, 280)
-ax2.set_xlim(0, MAX_POINTS)
+ax2.set_xlim(-MAX_POINTS, 0)
 ax2.grid(True, alpha=0.2, color='#444', linestyle='--', linewidth=0.5)
 ax2.axhline(y=0, color='#00ff88', linewidth=1.5, linestyle='--', alpha=0.7)
 ax2.axhline(y=255, color='#ff6b6b', linewidth=0.5, linestyle=':', alpha=0.3, label='Max PWM')
@@ -112,7 +133,8 @@ ax2.spines['top'].set_color('#444')
 line_pwm_raw, = ax2.plot([], [], color='#ffd93d', linewidth=0.8, alpha=0.5, label='Raw PWM')
 line_pwm, = ax2.plot([], [], color='#ffaa00', linewidth=2, label='Smoothed PWM')
 ax2.legend(loc='upper right', facecolor='#16213e', edgecolor='#444', labelcolor='white')
-ax2.set_xlabel('Samples', color='white', fontweight='bold')
+ax2.set_xlabel('Samples (0 = mép phải)', color='white', fontweight='bold')
+view_info = ax1.text(0.01, 0.95, '', transform=ax1.transAxes, va='top', color='white', fontsize=7, alpha=0.8)
 
 # --- Sliders với ranges được tối ưu ---
 slider_color = '#0f3460'
@@ -143,14 +165,14 @@ bm3 = Button(make_btn([0.05, 0.15, 0.04, 0.025]), '–'); bp3 = Button(make_btn(
 bm4 = Button(make_btn([0.05, 0.10, 0.04, 0.025]), '–'); bp4 = Button(make_btn([0.82, 0.10, 0.04, 0.025]), '+')
 
 # --- Status text với nhiều thông tin hơn ---
-status_ax = plt.axes([0.15, 0.03, 0.70, 0.04])
+status_ax = plt.axes([0.15, 0.005, 0.70, 0.085])  # 4 dòng: telemetry, đường truyền, kênh lệnh, thời gian vẽ
 status_ax.set_facecolor('#0f3460')
 status_ax.set_xticks([]); status_ax.set_yticks([])
 status_text = status_ax.text(0.5, 0.5, 'Waiting for data...', transform=status_ax.transAxes,
-                              ha='center', va='center', color='#4ecdc4', fontsize=10, fontweight='bold')
+                              ha='center', va='center', color='#4ecdc4', fontsize=7.5, fontweight='bold')
 
 # --- Performance metrics ---
-perf_ax = plt.axes([0.87, 0.25, 0.12, 0.15])
+perf_ax = plt.axes([0.87, 0.09, 0.12, 0.26])  # bảng 1s / 10s / phiên
 perf_ax.set_facecolor('#0f3460')
 perf_ax.set_xticks([]); perf_ax.set_yticks([])
 perf_ax.spines['bottom'].set_color('#444')
@@ -160,7 +182,7 @@ perf_ax.spines['top'].set_color('#444')
 perf_text = perf_ax.text(0.5, 0.5, '📊 Stats\n---\nRMS: --\nMax: --', 
                          transform=perf_ax.transAxes,
                          ha='center', va='center', color='#ffd93d', 
-                         fontsize=8, fontweight='bold')
+                         fontsize=6.5, fontweight='bold', family='monospace')
 
 # --- Callbacks ---
 update_pending = False
@@ -193,96 +215,126 @@ bm2.on_clicked(make_adj(sliderK2, -0.25)); bp2.on_clicked(make_adj(sliderK2, 0.2
 bm3.on_clicked(make_adj(sliderK3, -0.01)); bp3.on_clicked(make_adj(sliderK3, 0.01))
 bm4.on_clicked(make_adj(sliderK4, -0.1));  bp4.on_clicked(make_adj(sliderK4, 0.1))
 
+# --- Thread nhận dữ liệu (chạy nền, không phụ thuộc FPS) ---
+def on_ack(msg, addr):
+    channel.on_ack(msg)
+
+receiver = TelemetryReceiver(sock, ring, on_ack=on_ack, smoother=smoother).start()
+
 # --- Animation với xử lý tốt hơn ---
-packet_count = 0
-dropped_packets = 0
-last_update_time = 0
+dynamic_lines = (line_angle_raw, line_angle, line_pwm_raw, line_pwm)
+line_fields = ((line_angle_raw, 'angle_err'), (line_angle, 'angle_err_smooth'),
+               (line_pwm_raw, 'pwm'), (line_pwm, 'pwm_smooth'))
+last_text_time = 0.0
+text_turn = 0        # 1: status, 0: performance
+
+# --- Zoom / cuộn lịch sử ---
+def show_view_info():
+    if view_end is None:
+        view_info.set_text(f'🔴 LIVE  |  {view_span} sample  |  lăn chuột: zoom, Shift+lăn / ← →: cuộn')
+    else:
+        view_info.set_text(f'⏸ sample {view_end - view_span}–{view_end}  |  {view_span} sample  |  End: về LIVE')
+
+def set_view(span, end):
+    """Đổi cửa sổ xem; end >= sample mới nhất → LIVE. Đổi trục x → vẽ lại nền (blit chụp lại)"""
+    global view_span, view_end
+    count = history.count
+    span = int(min(max(span, MIN_SPAN), max(count - history.oldest(), MIN_SPAN)))
+    end = int(min(max(end, history.oldest() + span), count))
+    view_end = None if end >= count else end
+    if span != view_span:
+        view_span = span
+        for ax in (ax1, ax2):
+            ax.set_xlim(-span, 0)
+    show_view_info()
+    fig.canvas.draw_idle()
+
+def on_scroll(event):
+    if event.inaxes not in (ax1, ax2) or history.count == 0:
+        return
+    end = history.count if view_end is None else view_end
+    if event.key == 'shift':
+        set_view(view_span, end - event.step * view_span / 4)   # lăn lên = lùi về quá khứ
+    else:
+        set_view(view_span / 1.5 if event.step > 0 else view_span * 1.5, end)
+
+def on_key(event):
+    end = history.count if view_end is None else view_end
+    if event.key == 'left':
+        set_view(view_span, end - view_span / 4)
+    elif event.key == 'right':
+        set_view(view_span, end + view_span / 4)
+    elif event.key == 'end':
+        set_view(view_span, history.count)
+
+fig.canvas.mpl_connect('scroll_event', on_scroll)
+fig.canvas.mpl_connect('key_press_event', on_key)
+show_view_info()
 
 def update(frame):
-    global packet_count, dropped_packets, update_pending, last_update_time
-    import time
-    
-    current_time = time.time()
+    global update_pending, last_text_time, text_turn
+    frame_timer.start()
     
-    # Gửi gains nếu có thay đổi pending
+    # Giao giá trị slider mới nhất cho kênh lệnh (gộp nếu lệnh trước chưa có ACK)
     if update_pending:
-        if send_gains(sliderK1.val, sliderK2.val, sliderK3.val, sliderK4.val):
-            update_pending = False
-    
-    # Đọc nhiều packets để tránh bị tụt hậu
-    packets_read = 0
-    try:
-        for _ in range(10):  # Tăng lên 10 để đọc nhanh hơn
-            data, addr = sock.recvfrom(1024)
-            decoded = data.decode().strip()
-            
-            if decoded.startswith("KACK"):
-                status_text.set_text('✅ ESP32 confirmed gains')
-                continue
-                
-            values = decoded.split(',')
-            if len(values) >= 2:
-                angle_err = float(values[0])
-                pwm = float(values[1])
-                angle_data.append(angle_err)
-                pwm_data.append(pwm)
-                time_data.append(current_time)
-                packet_count += 1
-                packets_read += 1
-                
-    except socket.timeout:
-        if packets_read == 0:
-            dropped_packets += 1
-    except Exception as e:
-        status_text.set_text(f'⚠️ {e}')
-
-    # Cập nhật đồ thị với smoothing
-    if len(angle_data) > 0:
-        x = range(len(angle_data))
-        
-        # Raw data
-        line_angle_raw.set_data(x, list(angle_data))
-        line_pwm_raw.set_data(x, list(pwm_data))
-        
-        # Smoothed data
-        angle_smoothed = moving_average(angle_data, SMOOTH_WINDOW)
-        pwm_smoothed = moving_average(pwm_data, SMOOTH_WINDOW)
-        line_angle.set_data(x, angle_smoothed)
-        line_pwm.set_data(x, pwm_smoothed)
-
-        # Status với FPS
-        last_angle = angle_data[-1]
-        last_pwm = pwm_data[-1] if pwm_data else 0
-        
-        # Tính FPS
-        if last_update_time > 0:
-            fps = 1.0 / (current_time - last_update_time) if current_time > last_update_time else 0
-        else:
-            fps = 0
-        last_update_time = current_time
-        
-        status_text.set_text(
-            f'📊 Angle: {last_angle:+.2f}°  |  PWM: {last_pwm:+.0f}  |  '
-            f'Packets: {packet_count}  |  Drop: {dropped_packets}  |  FPS: {fps:.1f}'
-        )
-        
-        # Tính performance metrics
-        if len(angle_data) >= 10:
-            recent_angles = list(angle_data)[-100:]  # 100 điểm gần nhất
-            rms_error = np.sqrt(np.mean(np.square(recent_angles)))
-            max_error = np.max(np.abs(recent_angles))
+        send_gains(sliderK1.val, sliderK2.val, sliderK3.val, sliderK4.val)
+        update_pending = False
+    channel.poll()  # gửi lại lệnh quá hạn chưa có KACK
+
+    if receiver.last_error is not None:
+        status_text.set_text(f'⚠️ {receiver.last_error}')
+        receiver.last_error = None
+
+    # Sample mới vào kim tự tháp min/max; mỗi đường lấy ~1 cặp điểm / pixel của cửa sổ xem
+    history.update_from(ring)
+    view = ring.latest(1)
+    n = len(view)
+    if n > 0:
+        end = history.count if view_end is None else view_end
+        pixels = int(ax1.bbox.width)
+        for line, field in line_fields:
+            line.set_data(*history[field].envelope(end - view_span, end, pixels, origin=end))
+    frame_timer.mark('data')
+
+    # Performance: chỉ đưa các sample mới vào thống kê trượt
+    perf.update_from(ring)
+    frame_timer.mark('stats')
+
+    # Ô chữ: status và performance thay phiên nhau, mỗi lượt TEXT_INTERVAL / 2
+    now = time.perf_counter()
+    if n > 0 and now - last_text_time >= TEXT_INTERVAL / 2:
+        last_text_time = now
+        text_turn ^= 1
+        if text_turn:
+            status_text.set_text(
+                f'📊 Angle: {view["angle_err"][-1]:+.2f}°  |  PWM: {view["pwm"][-1]:+.0f}  |  '
+                f'Samples: {receiver.packet_count}\n'
+                f'{format_stats(receiver.stats.snapshot())}\n'
+                f'{format_channel_stats(channel.snapshot())}\n'
+                f'{format_timing(frame_timer.snapshot())}'
+            )
+        elif perf['1s'].n >= 10:
             perf_text.set_text(
-                f'📊 Performance\n'
-                f'───────\n'
-                f'RMS: {rms_error:.2f}°\n'
-                f'Max: {max_error:.2f}°\n'
-                f'Stable: {"✓" if rms_error < 2.0 else "✗"}'
+                f'📊 Performance\nStable: {"✓" if perf["1s"].rms < 2.0 else "✗"}\n\n'
+                f'{format_rolling(perf.snapshot())}'
             )
+    frame_timer.mark('text')
 
     return line_angle, line_pwm, line_angle_raw, line_pwm_raw
 
-# Tăng tốc độ update lên 20ms (50 FPS)
-ani = animation.FuncAnimation(fig, update, interval=20, blit=False, cache_frame_data=False)
+if RENDER_MODE == 'blit' and fig.canvas.supports_blit:
+    blit = BlitManager(fig.canvas, dynamic_lines + (status_text, perf_text))
+
+    def render():
+        update(None)
+        blit.update(frame_timer)
+
+    ani = fig.canvas.new_timer(interval=FRAME_INTERVAL_MS)
+    ani.add_callback(render)
+    ani.start()
+else:
+    # Vẽ lại cả figure mỗi frame (đo được data / stats / text, phần vẽ nằm trong FuncAnimation)
+    ani = animation.FuncAnimation(fig, update, interval=20, blit=False, cache_frame_data=False)
 
 print("=" * 60)
 print("🚀 SELF-BALANCING ROBOT - PID TUNER (OPTIMIZED)")
@@ -297,10 +349,12 @@ print("=" * 60)
 print("✨ CẢI TIẾN:")
 print("   ✓ Smoothing filter (moving average) cho đường line mượt hơn")
 print("   ✓ Tăng UDP buffer và tối ưu timeout")
-print("   ✓ Đọc nhiều packets mỗi frame để tránh lag")
-print("   ✓ Hiển thị metrics: RMS error, Max error, Stability")
+print("   ✓ Thread nền nhận UDP + ring buffer NumPy (không lag khi GUI chậm)")
+print("   ✓ Hiển thị metrics: RMS / Max / σ / % trong ±2° (1s, 10s, cả phiên), Stability")
 print("   ✓ Rate limiting cho gain updates")
-print("   ✓ FPS counter và packet drop tracking")
+print("   ✓ FPS counter, đo mất gói / đảo thứ tự / jitter theo seq")
+print("   ✓ Blit: chỉ vẽ lại đường + ô chữ, đo thời gian từng giai đoạn của frame")
 print("=" * 60)
 
 plt.show()
+receiver.stop()
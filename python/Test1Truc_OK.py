@@ -2,6 +2,8 @@ import socket
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from collections import deque
+from telemetry import drain
+from telemetry_codec import decode_csv_batch, XYZ_DTYPE
 
 # --- Cấu hình UDP ---
 UDP_IP = "0.0.0.0"
@@ -27,18 +29,17 @@ ax.set_title("Real-time Z-axis Angle from ESP32 (MPU6050)")
 # --- Hàm cập nhật khung hình ---
 def update(frame):
     try:
-        data, addr = sock.recvfrom(1024)
-        decoded = data.decode().strip()
-        values = decoded.split(',')
+        batch, addr = drain(sock, first=sock.recvfrom(1024))
 
         # Hỗ trợ cả chuỗi "x,y,z" hoặc chỉ "z"
-        if len(values) == 3:
-            _, _, z = map(float, values)
-        else:
-            z = float(values[0])
-
-        print(f"Z = {z:.2f}")
-        angles_z.append(z)
+        records, n_bad = decode_csv_batch(batch, dtype=XYZ_DTYPE, single_field='z')
+        if n_bad:
+            print(f"⚠️ Bỏ qua {n_bad} gói lỗi")
+        if len(records) == 0:
+            return line,
+
+        print(f"Z = {records['z'][-1]:.2f}")
+        angles_z.extend(records['z'].tolist())
 
         line.set_data(range(len(angles_z)), list(angles_z))
 
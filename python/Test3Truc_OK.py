@@ -2,6 +2,8 @@ import socket
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from collections import deque
+from telemetry import drain
+from telemetry_codec import decode_csv_batch, XYZ_DTYPE
 
 UDP_IP = "0.0.0.0"
 UDP_PORT = 4210
@@ -25,14 +27,17 @@ ax.set_xlim(0, 100)
 
 def update(frame):
     try:
-        data, addr = sock.recvfrom(1024)
-        decoded = data.decode().strip()
-        x, y, z = map(float, decoded.split(','))
-        print(decoded)
-
-        angles_x.append(x)
-        angles_y.append(y)
-        angles_z.append(z)
+        batch, addr = drain(sock, first=sock.recvfrom(1024))
+        records, n_bad = decode_csv_batch(batch, dtype=XYZ_DTYPE)
+        if n_bad:
+            print(f"⚠️ Bỏ qua {n_bad} gói lỗi")
+        if len(records) == 0:
+            return line1, line2, line3
+        print(batch[-1].decode().strip())
+
+        angles_x.extend(records['x'].tolist())
+        angles_y.extend(records['y'].tolist())
+        angles_z.extend(records['z'].tolist())
 
         line1.set_data(range(len(angles_x)), list(angles_x))
         line2.set_data(range(len(angles_y)), list(angles_y))
@@ -0,0 +1,141 @@
+"""
+🧮 BATCH SIM — Chấm điểm hàng nghìn bộ K cùng lúc bằng mô phỏng
+=================================================================
+Mỗi bộ (K1, K2, K3, K4) là 1 làn của ReactionWheelSim; cả mảng được bước
+cùng lúc bằng NumPy. Mỗi làn đi đúng kịch bản 1 lần thử của AutoTune_PID.py:
+đặt K → chờ SETTLE_TIME → ghi góc TRIAL_DURATION giây → evaluate_trial().
+
+Góc được chấm là ae = robot_angle - angle_offset (độ nghiêng so với thẳng đứng).
+AutoTune chấm robot_angle thô, vốn lệch thêm angle_offset tự đo lúc khởi động
+(khác nhau giữa các robot); trong mô phỏng điều đó sẽ thưởng cho bộ K làm robot
+đứng nghiêng, nên ở đây bỏ offset đi.
+
+Cách dùng:
+    python batch_sim.py                       # lưới 11 x 13 x 6 trên phạm vi của AutoTune
+    python batch_sim.py --grid 21 25 11 --repeats 3 --top 20
+"""
+
+import argparse
+import time
+import numpy as np
+from pendulum_model import ReactionWheelSim, LOOP_TIME
+from esp32_sim import DEFAULT_GAINS
+from trial_scoring import FALL_THRESHOLD, TrialStats
+
+# Kịch bản 1 lần thử (giống auto_tune_thread)
+SETTLE_TIME = 1.5
+TRIAL_DURATION = 4.0
+
+# Phạm vi K1, K2, K3 giống K*_MIN / K*_MAX trong AutoTune_PID.py
+K_RANGES = ((20.0, 120.0), (2.0, 50.0), (0.0, 0.50))
+
+# Lệnh K thiếu K4 (AutoTune chỉ gửi K1..K3) → firmware giữ X4 đang chạy,
+# mặc định X4 của firmware; chấm với K4 = 0 là chấm 1 luật điều khiển khác
+FIRMWARE_K4 = DEFAULT_GAINS[3]
+
+# Số làn mô phỏng mỗi lượt (giới hạn bộ nhớ, vừa cache CPU)
+CHUNK_LANES = 4096
+
+RESULT_DTYPE = np.dtype([
+    ('k1', 'f8'),
+    ('k2', 'f8'),
+    ('k3', 'f8'),
+    ('k4', 'f8'),
+    ('score', 'f8'),
+    ('mean_abs', 'f8'),
+    ('max_abs', 'f8'),
+    ('standing', 'f8'),
+])
+
+
+def as_gains(gains, k4=FIRMWARE_K4):
+    """Mảng (n, 3) hoặc (n, 4) → (n, 4); thiếu K4 thì dùng `k4` (X4 robot đang chạy, mặc định của firmware)"""
+    gains = np.atleast_2d(np.asarray(gains, dtype=np.float64))
+    if gains.shape[1] == 3:
+        gains = np.column_stack([gains, np.full(len(gains), k4)])
+    return gains
+
+
+def grid_candidates(steps=(11, 13, 6), ranges=K_RANGES, k4=FIRMWARE_K4):
+    """Lưới đều trên phạm vi K1, K2, K3 → mảng (n, 4)"""
+    axes = [np.linspace(lo, hi, n) for (lo, hi), n in zip(ranges, steps)]
+    k1, k2, k3 = np.meshgrid(*axes, indexing='ij')
+    return np.column_stack([k1.ravel(), k2.ravel(), k3.ravel(), np.full(k1.size, k4)])
+
+
+def simulate_trials(gains, repeats=1, settle=SETTLE_TIME, duration=TRIAL_DURATION,
+                    seed=None, fall_threshold=FALL_THRESHOLD, chunk=CHUNK_LANES):
+    """
+    Chạy 1 lần thử cho mỗi bộ K → mảng RESULT_DTYPE, cùng thứ tự với `gains`.
+    repeats > 1: mỗi bộ K chạy trên nhiều làn với nhiễu khác nhau, lấy trung bình
+    (1 lần thử thật cũng nhiễu như vậy).
+    """
+    gains = as_gains(gains)
+    n = len(gains)
+    lanes = np.repeat(gains, repeats, axis=0)
+    rng = np.random.default_rng(seed)
+
+    settle_steps = int(round(settle / LOOP_TIME))
+    trial_steps = int(round(duration / LOOP_TIME))
+    stats = np.zeros((len(lanes), 4))  # score, mean_abs, max_abs, standing
+
+    for start in range(0, len(lanes), chunk):
+        block = lanes[start:start + chunk]
+        sim = ReactionWheelSim(len(block), seed=rng.integers(1 << 63))
+        sim.set_gains(*block.T)
+        for _ in range(settle_steps):
+            sim.step()
+        trial = TrialStats(len(block), fall_threshold)
+        for _ in range(trial_steps):
+            sim.step()
+            trial.add(sim.angle_err)
+        stats[start:start + len(block)] = np.column_stack(
+            [trial.score(), trial.mean_abs, trial.max_abs, trial.standing_ratio])
+
+    stats = stats.reshape(n, repeats, 4).mean(axis=1)
+    results = np.zeros(n, dtype=RESULT_DTYPE)
+    for i, name in enumerate(('k1', 'k2', 'k3', 'k4')):
+        results[name] = gains[:, i]
+    for i, name in enumerate(('score', 'mean_abs', 'max_abs', 'standing')):
+        results[name] = stats[:, i]
+    return results
+
+
+def rank(results, top=None):
+    """Sắp xếp kết quả theo score giảm dần"""
+    order = np.argsort(-results['score'], kind='stable')
+    return results[order[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-screen lưới K1/K2/K3 bằng mô phỏng theo lô")
+    parser.add_argument('--grid', type=int, nargs=3, default=(11, 13, 6), metavar=('N1', 'N2', 'N3'),
+                        help='Số điểm lưới cho K1, K2, K3')
+    parser.add_argument('--k4', type=float, default=FIRMWARE_K4, help='X4 của robot (lệnh K1..K3 không đổi X4)')
+    parser.add_argument('--repeats', type=int, default=2, help='Số lần thử (nhiễu khác nhau) mỗi bộ K')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    candidates = grid_candidates(args.grid, k4=args.k4)
+    lanes = len(candidates) * args.repeats
+    print(f"🧮 {len(candidates)} bộ K x {args.repeats} lần = {lanes} làn | "
+          f"{SETTLE_TIME + TRIAL_DURATION:.1f}s robot mỗi lần thử")
+
+    t0 = time.perf_counter()
+    results = simulate_trials(candidates, repeats=args.repeats, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+
+    robot_time = lanes * (SETTLE_TIME + TRIAL_DURATION)
+    standing = np.count_nonzero(results['standing'] >= 0.5)
+    print(f"⏱️ {elapsed:.1f}s ({robot_time / elapsed:.0f}x thời gian thực) | "
+          f"{standing}/{len(results)} bộ K đứng được")
+
+    print(f"\n{'#':>3} {'K1':>7} {'K2':>6} {'K3':>6} {'Score':>7} {'|góc|':>6} {'max':>6} {'đứng':>6}")
+    for i, r in enumerate(rank(results, args.top), 1):
+        print(f"{i:>3} {r['k1']:>7.1f} {r['k2']:>6.1f} {r['k3']:>6.2f} {r['score']:>7.1f} "
+              f"{r['mean_abs']:>6.2f} {r['max_abs']:>6.1f} {r['standing'] * 100:>5.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+⏱️ BENCHMARK — Giải mã telemetry: từng gói (split + float) vs theo loạt (NumPy)
+================================================================================
+Chạy: python bench_decode.py [số_sample]
+"""
+
+import sys
+import time
+import random
+from telemetry_codec import decode_csv_batch
+
+
+def make_packets(n, bad_ratio=0.0):
+    """Sinh gói giống firmware: "%.2f,%.2f,%.2f" (ae, pwm, robot_angle)"""
+    packets = []
+    for _ in range(n):
+        if random.random() < bad_ratio:
+            packets.append(b"12.3,xx")
+            continue
+        ae = random.uniform(-15, 15)
+        pwm = random.uniform(-255, 255)
+        packets.append(f"{ae:.2f},{pwm:.2f},{ae + 2.5:.2f}".encode())
+    return packets
+
+
+def decode_per_packet(packets):
+    """Cách cũ: decode() + split(',') + float() cho từng gói"""
+    out = []
+    bad = 0
+    for data in packets:
+        values = data.decode().strip().split(',')
+        try:
+            out.append((float(values[0]), float(values[1]), float(values[2])))
+        except (ValueError, IndexError):
+            bad += 1
+    return out, bad
+
+
+def bench(fn, packets, repeat=7):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(packets)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(0)
+
+    print("=" * 64)
+    print(f"⏱️ Decode benchmark — {total} samples, best of 7")
+    print("=" * 64)
+    print(f"{'batch':>6} {'bad%':>5} {'per-packet µs/s':>16} {'batch µs/s':>11} {'speedup':>8}")
+
+    for batch_size in (1, 10, 64, 256):
+        for bad_ratio in (0.0, 0.01):
+            packets = make_packets(total, bad_ratio)
+            batches = [packets[i:i + batch_size] for i in range(0, total, batch_size)]
+
+            t_old = bench(lambda b: [decode_per_packet(x) for x in b], batches)
+            t_new = bench(lambda b: [decode_csv_batch(x) for x in b], batches)
+
+            us_old = t_old / total * 1e6
+            us_new = t_new / total * 1e6
+            print(f"{batch_size:>6} {bad_ratio * 100:>5.0f} {us_old:>16.3f} {us_new:>11.3f} "
+                  f"{us_old / us_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+🖼️ BLIT RENDER — Chỉ vẽ lại các artist động, nền tĩnh lấy từ cache
+=====================================================================
+FuncAnimation(blit=False) vẽ lại cả figure mỗi frame: trục, spine, legend,
+axhline, slider... dù chúng không đổi. BlitManager đánh dấu các artist động là
+animated (bị loại khỏi lần vẽ đầy đủ), chụp nền (copy_from_bbox) sau mỗi lần vẽ
+đầy đủ, rồi mỗi frame chỉ xử lý các trục có artist động vừa đổi (stale): dán
+lại nền của trục đó → draw_artist các artist của nó → blit đúng vùng trục đó.
+Ô chữ không đổi thì không vẽ lại (vẽ chữ đắt hơn vẽ cả nghìn điểm của 1 đường).
+
+Nền bị bỏ khi cửa sổ đổi kích thước (resize_event) và được chụp lại ở lần vẽ
+đầy đủ kế tiếp; slider / TextBox gọi draw_idle() → cũng chụp lại nền mới.
+draw_static() vẽ thêm vài artist tĩnh (vd 1 cột điểm mới) thẳng lên nền đã cache
+thay vì vẽ lại cả figure.
+
+StageTimer đo thời gian từng giai đoạn của frame (EMA, ms) và FPS thực.
+
+So sánh vẽ đầy đủ với blit (Agg, không cửa sổ): python blit_render.py [--points 2000]
+"""
+
+import argparse
+import time
+import numpy as np
+
+
+class StageTimer:
+    """Thời gian (ms, trung bình hàm mũ) của từng giai đoạn trong frame + khoảng cách giữa 2 frame"""
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.stages = {}
+        self.frame_ms = 0.0
+        self._frame_start = None
+        self._t = None
+
+    def start(self):
+        """Gọi đầu mỗi frame"""
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self._ema('frame', (now - self._frame_start) * 1e3)
+        self._frame_start = self._t = now
+
+    def mark(self, stage):
+        """Kết thúc giai đoạn `stage` (tính từ mark / start trước đó)"""
+        now = time.perf_counter()
+        if self._t is not None:
+            self._ema(stage, (now - self._t) * 1e3)
+        self._t = now
+
+    def _ema(self, stage, ms):
+        if stage == 'frame':
+            self.frame_ms = ms if self.frame_ms == 0.0 else self.frame_ms + self.alpha * (ms - self.frame_ms)
+            return
+        old = self.stages.get(stage)
+        self.stages[stage] = ms if old is None else old + self.alpha * (ms - old)
+
+    @property
+    def fps(self):
+        return 1000.0 / self.frame_ms if self.frame_ms > 0 else 0.0
+
+    def snapshot(self):
+        return {'stages': dict(self.stages), 'busy_ms': sum(self.stages.values()),
+                'frame_ms': self.frame_ms, 'fps': self.fps}
+
+
+def format_timing(snapshot):
+    """1 dòng cho status bar"""
+    stages = '  '.join(f'{name} {ms:.1f}' for name, ms in snapshot['stages'].items())
+    return f"⏱ {snapshot['fps']:.0f} FPS  |  {snapshot['busy_ms']:.1f}ms / frame ({stages})"
+
+
+class BlitManager:
+    """Vẽ lại các artist động trên nền tĩnh đã cache; update() thay cho canvas.draw()"""
+
+    def __init__(self, canvas, artists=()):
+        self.canvas = canvas
+        self.full_draws = 0
+        self._bg = None
+        self._artists = []
+        self._groups = []   # [(bbox vùng blit, [artist])] theo trục
+        self._redraw_all = False
+        self._extra_blit = []   # vùng nền vừa được draw_static() vẽ thêm
+        for artist in artists:
+            self.add_artist(artist)
+        self._cids = [canvas.mpl_connect('draw_event', self._on_draw),
+                      canvas.mpl_connect('resize_event', self._on_resize)]
+
+    def add_artist(self, artist):
+        if artist.figure != self.canvas.figure:
+            raise ValueError("Artist không thuộc figure của canvas này")
+        artist.set_animated(True)
+        self._artists.append(artist)
+        # Vùng cần blit: trục chứa artist (text của figure → cả figure)
+        bbox = artist.axes.bbox if artist.axes is not None else self.canvas.figure.bbox
+        for group_bbox, members in self._groups:
+            if group_bbox is bbox:
+                members.append(artist)
+                return
+        self._groups.append((bbox, [artist]))
+
+    def disconnect(self):
+        for cid in self._cids:
+            self.canvas.mpl_disconnect(cid)
+        for artist in self._artists:
+            artist.set_animated(False)
+
+    def _on_draw(self, event):
+        """Sau mỗi lần vẽ đầy đủ (không có artist động): chụp nền rồi vẽ artist động lên"""
+        self.full_draws += 1
+        self._bg = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _on_resize(self, event):
+        self._bg = None
+
+    def draw_static(self, artists, bbox=None):
+        """
+        Vẽ thêm các artist tĩnh (không animated) lên nền đã cache, không vẽ lại cả figure;
+        vùng `bbox` (mặc định cả figure) được blit ở update() kế tiếp.
+        Chưa có nền → False (lần vẽ đầy đủ sắp tới sẽ vẽ chúng).
+        """
+        if self._bg is None:
+            return False
+        figure = self.canvas.figure
+        self.canvas.restore_region(self._bg)
+        for artist in artists:
+            figure.draw_artist(artist)
+        self._bg = self.canvas.copy_from_bbox(figure.bbox)
+        # restore_region cả figure đã xoá các artist động → vẽ lại hết ở update() kế tiếp
+        self._redraw_all = True
+        self._extra_blit.append(figure.bbox if bbox is None else bbox)
+        return True
+
+    def _draw_animated(self):
+        figure = self.canvas.figure
+        for artist in self._artists:
+            figure.draw_artist(artist)
+
+    def update(self, timer=None):
+        """Vẽ 1 frame; timer (StageTimer) nhận các giai đoạn 'restore', 'draw', 'blit'"""
+        figure = self.canvas.figure
+        if self._bg is None:
+            # Chưa có nền (mới mở / vừa resize) → vẽ đầy đủ, _on_draw chụp nền
+            self.canvas.draw()
+            dirty = self._groups
+            if timer is not None:
+                timer.mark('draw')
+        else:
+            dirty = [g for g in self._groups if any(a.stale for a in g[1])]
+            if self._redraw_all or any(bbox is figure.bbox for bbox, _ in dirty):
+                dirty = self._groups   # dán lại nền cả figure → mọi trục phải vẽ lại
+            for bbox, _ in dirty:
+                self.canvas.restore_region(self._bg, bbox)
+            if timer is not None:
+                timer.mark('restore')
+            for _, members in dirty:
+                for artist in members:
+                    figure.draw_artist(artist)
+            if timer is not None:
+                timer.mark('draw')
+        for bbox, _ in dirty:
+            self.canvas.blit(bbox)
+        for bbox in self._extra_blit:
+            self.canvas.blit(bbox)
+        self._redraw_all = False
+        self._extra_blit = []
+        self.canvas.flush_events()
+        if timer is not None:
+            timer.mark('blit')
+
+
+def main():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    parser = argparse.ArgumentParser(description="So sánh vẽ lại cả figure với blit chỉ artist động")
+    parser.add_argument('--points', type=int, default=2000, help='Số điểm mỗi đường')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--text-every', type=int, default=15, help='Đổi ô chữ mỗi N frame (60 FPS → 4 lần/giây)')
+    args = parser.parse_args()
+
+    # Bố cục giống GuiK_V2_OK: 2 trục, mỗi trục 2 đường + legend + lưới + axhline
+    fig, axes = plt.subplots(2, 1, figsize=(11, 7))
+    x = np.arange(args.points, dtype=np.float64)
+    # Tín hiệu kiểu telemetry: dao động chậm + nhiễu cảm biến; cột lẻ = bản đã làm mượt (SMA 5)
+    rng = np.random.default_rng(0)
+    total = args.frames + args.points
+    slow = 3 * np.sin(np.arange(total) / 40.0)[:, None] + np.cumsum(rng.normal(0, 0.05, (total, 2)), axis=0)
+    raw = slow + rng.normal(0, 0.5, (total, 2))
+    smooth = np.apply_along_axis(lambda c: np.convolve(c, np.ones(5) / 5, 'same'), 0, raw)
+    data = np.column_stack((raw[:, 0], smooth[:, 0], raw[:, 1], smooth[:, 1]))
+    lines = []
+    for i, ax in enumerate(axes):
+        ax.set_xlim(0, args.points)
+        ax.set_ylim(-15, 15)
+        ax.grid(True, alpha=0.2, linestyle='--')
+        for y in (0, 2, -2):
+            ax.axhline(y=y, linestyle=':')
+        lines += [ax.plot(x, data[:args.points, 2 * i], linewidth=0.8, alpha=0.5, label='Raw')[0],
+                  ax.plot(x, data[:args.points, 2 * i + 1], linewidth=2, label='Smoothed')[0]]
+        ax.legend(loc='upper right')
+    status_ax = fig.add_axes([0.15, 0.0, 0.7, 0.04])
+    text = status_ax.text(0.5, 0.5, '', ha='center', va='center')
+
+    def frame(k):
+        for j, line in enumerate(lines):
+            line.set_ydata(data[k:k + args.points, j])
+        if k % args.text_every == 0:
+            text.set_text(f'frame {k}  |  Samples: {k * 4}  |  RMS: {data[k, 1]:.2f}°')
+
+    fig.canvas.draw()
+    t0 = time.perf_counter()
+    for k in range(args.frames):
+        frame(k)
+        fig.canvas.draw()
+    full = (time.perf_counter() - t0) / args.frames
+
+    timer = StageTimer()
+    manager = BlitManager(fig.canvas, lines + [text])
+    manager.update()
+    t0 = time.perf_counter()
+    for k in range(args.frames):
+        timer.start()
+        frame(k)
+        timer.mark('data')
+        manager.update(timer)
+    blit = (time.perf_counter() - t0) / args.frames
+
+    print(f"🖼️ {len(lines)} đường × {args.points} điểm, {args.frames} frame (Agg)")
+    print(f"   Vẽ lại cả figure : {full * 1e3:7.2f} ms / frame  ({1 / full:5.0f} FPS tối đa)")
+    print(f"   Blit             : {blit * 1e3:7.2f} ms / frame  ({1 / blit:5.0f} FPS tối đa)")
+    print(f"   {format_timing(timer.snapshot())}")
+    print(f"   Lần vẽ đầy đủ khi blit: {manager.full_draws}")
+
+
+if __name__ == "__main__":
+    main()
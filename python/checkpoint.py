@@ -0,0 +1,72 @@
+"""
+💾 CHECKPOINT — Lưu / khôi phục phiên auto-tune sau mỗi lần thử
+=================================================================
+Optimizer là generator (không pickle được) nhưng hoàn toàn tất định theo
+(tên, bounds, start, seed, prior, kwargs) và chuỗi điểm đã báo → checkpoint chỉ
+lưu các tham số đó + results_log; resume dựng lại optimizer rồi replay() từng
+lần thử đã đo → đúng trạng thái lúc dừng (kể cả RNG), không tốn thêm lần thử nào.
+
+File JSON ghi nguyên tử (file tạm + os.replace): mất điện giữa lúc ghi thì
+vẫn còn checkpoint của lần thử trước.
+"""
+
+import json
+import os
+import numpy as np
+
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'autotune_checkpoint.json')
+
+VERSION = 1
+
+
+def _to_json(value):
+    """np.float64 / np.ndarray / tuple → kiểu JSON"""
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def save(state, path=CHECKPOINT_FILE):
+    """Ghi nguyên tử dict trạng thái phiên"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(_to_json(dict(state, version=VERSION)), f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path=CHECKPOINT_FILE):
+    """dict trạng thái, hoặc None nếu không có / hỏng / khác phiên bản"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Không đọc được checkpoint {path}: {e}")
+        return None
+    if state.get('version') != VERSION:
+        print(f"⚠️ Checkpoint {path} khác phiên bản, bỏ qua")
+        return None
+    return state
+
+
+def replay(optimizer, trials, tol=1e-6):
+    """
+    Báo lại cho optimizer (vừa dựng với đúng tham số cũ) các lần thử đã đo,
+    theo đúng thứ tự → số lần thử khớp bộ K optimizer hỏi lại.
+    """
+    matched = 0
+    for t in trials:
+        k = optimizer.ask()
+        if np.allclose(k, t['k'], atol=tol, rtol=0):
+            matched += 1
+        optimizer.tell(t['k'], t['score'])
+        if optimizer.done:
+            break
+    return matched
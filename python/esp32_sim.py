@@ -0,0 +1,272 @@
+"""
+🧪 ESP32 SIM — Giả lập ESP32 + robot qua UDP (không cần phần cứng)
+===================================================================
+Chạy mô hình con lắc bánh đà (pendulum_model.py) với đúng luật điều khiển
+của firmware, và nói đúng giao thức của receiveUDP() / updateToUDP():
+- nhận "K1=..,K2=..,K3=..[,K4=..][,R=ms][,S=seq]" → cập nhật X1..X4, trả "KACK [S=seq,]K1=..,K2=..,K3=..,K4=..,B=build"
+  (lệnh gửi lại tới muộn, cũ hơn lệnh đã áp dụng → không áp dụng, chỉ ACK trạng thái hiện tại;
+  R → X1..X4 chuyển dần sang bộ K mới trong R ms như updateGainRamp())
+- gửi telemetry mỗi loop_time_py:
+    mặc định : frame binary "RW", mỗi datagram chở mọi sample 200Hz kể từ lần gửi trước
+    --no-batch: frame binary 1 sample / datagram (TELEMETRY_BATCH = 0)
+    --csv    : chuỗi "ae,pwm,robot_angle" cũ (TELEMETRY_BINARY = 0)
+- --speed N: chạy nhanh gấp N lần thời gian thực (0 = nhanh nhất có thể)
+- --robots N: N robot cùng loại (seed khác nhau), robot i nghe lệnh ở --listen-port + i
+- --loss P: bỏ ngẫu nhiên tỉ lệ P lệnh K và KACK (thử kênh lệnh khi Wi-Fi kém)
+
+Cách dùng:
+    python esp32_sim.py                         # thời gian thực, gửi tới 127.0.0.1:4210
+    python esp32_sim.py --speed 20              # nhanh 20 lần
+    python AutoTune_PID.py --sim-speed 20       # auto-tune với sim (cùng hệ số tốc độ)
+Sim nghe lệnh ở cổng --listen-port (mặc định 4211) vì 4210 đã bị PC chiếm
+(GuiK_V2_OK.py: đặt ESP32_IP = "127.0.0.1", ESP32_PORT = 4211).
+"""
+
+import argparse
+import socket
+import time
+import zlib
+import numpy as np
+import pendulum_model
+from pendulum_model import ReactionWheelSim
+from telemetry_codec import FRAME_SAMPLE_DTYPE, encode_frame, format_ack
+
+# X1..X4 mặc định trong one_axis_reaction_wheel_stick.ino
+DEFAULT_GAINS = (167.0, 16.8, 0.10, 1.0)
+
+# Như CMD_SEQ_WINDOW / RAMP_MS_MAX trong firmware
+CMD_SEQ_WINDOW = 64
+RAMP_MS_MAX = 5000
+
+# Như FIRMWARE_BUILD: CRC32 mã nguồn mô hình + sim → sửa luật điều khiển = bản build mới
+SIM_BUILD = 0
+for _path in (pendulum_model.__file__, __file__):
+    with open(_path, 'rb') as _f:
+        SIM_BUILD = zlib.crc32(_f.read(), SIM_BUILD)
+
+
+class TelemetrySender:
+    """Gom sample như telemetry_frame trong function.ino rồi gửi theo frame"""
+
+    def __init__(self, sock, addr, batch=True, binary=True, batch_max=16):
+        self.sock = sock
+        self.addr = addr
+        self.batch = batch
+        self.binary = binary
+        self.batch_max = batch_max
+        self.seq = 0
+        self.frames_sent = 0
+        self._pending = np.zeros(batch_max, dtype=FRAME_SAMPLE_DTYPE)
+        self._count = 0
+        self._last = None
+
+    def record(self, t_us, angle_err, angle, motor_speed, pwm):
+        """Gọi mỗi vòng điều khiển (recordTelemetrySample)"""
+        sample = (self.seq, t_us & 0xFFFFFFFF, angle_err, angle, int(motor_speed), int(pwm), 0)
+        self.seq += 1
+        self._last = sample
+        if not (self.binary and self.batch):
+            return
+        self._pending[self._count] = sample
+        self._count += 1
+        if self._count >= self.batch_max:
+            self.flush()
+
+    def flush(self):
+        """Gọi mỗi loop_time_py (updateToUDP)"""
+        if not self.binary:
+            if self._last is None:
+                return
+            _, _, ae, angle, _, pwm, _ = self._last
+            self.sock.sendto(f"{ae:.2f},{float(pwm):.2f},{angle:.2f}".encode(), self.addr)
+        elif not self.batch:
+            if self._last is None:
+                return
+            self.sock.sendto(encode_frame([self._last]), self.addr)
+        else:
+            if self._count == 0:
+                return
+            self.sock.sendto(encode_frame(self._pending[:self._count]), self.addr)
+            self._count = 0
+        self.frames_sent += 1
+
+
+def _to_float(text):
+    """Như String::toFloat(): chuỗi không hợp lệ → 0"""
+    try:
+        return float(text)
+    except ValueError:
+        return 0.0
+
+
+def parse_gains(msg, gains):
+    """
+    Như receiveUDP(): "K1=..,K2=..,K3=..[,K4=..][,S=..]" → (X1, X2, X3, X4) mới.
+    K4 tùy chọn (giữ nguyên X4 cũ nếu thiếu). Không phải lệnh K → None.
+    """
+    if not msg.startswith("K1"):
+        return None
+    fields = {}
+    for part in msg.split(','):
+        key, _, value = part.partition('=')
+        fields[key.strip()] = _to_float(value.strip())
+    return (fields.get('K1', 0.0), fields.get('K2', 0.0), fields.get('K3', 0.0),
+            fields.get('K4', gains[3]))
+
+
+def parse_uint(msg, key):
+    """",<key>=<số>" trong lệnh K → int (như strtoul); không có trường này → None"""
+    idx = msg.find(f",{key}=")
+    if idx < 0:
+        return None
+    digits = msg[idx + len(key) + 2:]
+    n = len(digits) - len(digits.lstrip('0123456789'))
+    return int(digits[:n] or 0) & 0xFFFFFFFF
+
+
+class SimulatedESP32:
+    """Robot ảo + vòng loop() của firmware, nói giao thức UDP thật"""
+
+    def __init__(self, sock, telemetry_addr, batch=True, binary=True, send_ms=50.0,
+                 gains=DEFAULT_GAINS, seed=None, loss=0.0):
+        self.sock = sock
+        self.sim = ReactionWheelSim(1, seed=seed)
+        self.gains = tuple(gains)   # bộ K đã nhận (đích của ramp nếu đang ramp)
+        self.sim.set_gains(*self.gains)
+        self.ramp_from = self.gains
+        self.ramp_start = 0.0
+        self.ramp_ms = 0
+        self.sender = TelemetrySender(sock, telemetry_addr, batch=batch, binary=binary)
+        # loop_time_py / loop_time: số vòng điều khiển giữa 2 lần updateToUDP()
+        self.steps_per_send = max(1, round(send_ms / 1000.0 / pendulum_model.LOOP_TIME))
+        self.steps = 0
+        self.commands = 0
+        self.last_cmd_seq = None  # None = chưa nhận lệnh có S (has_cmd_seq = false)
+        self.loss = loss
+        self.dropped = 0
+        self._loss_rng = np.random.default_rng(None if seed is None else seed + 1000)
+
+    def _lost(self):
+        """Gói này có bị "Wi-Fi" làm mất không (--loss)"""
+        if self.loss > 0 and self._loss_rng.random() < self.loss:
+            self.dropped += 1
+            return True
+        return False
+
+    def receive(self):
+        """receiveUDP(): đọc tối đa 1 gói lệnh mỗi lần gọi, giống parsePacket()"""
+        try:
+            data, addr = self.sock.recvfrom(128)
+        except (BlockingIOError, socket.timeout):
+            return
+        if self._lost():
+            return
+        msg = data[:127].decode(errors='ignore')
+        gains = parse_gains(msg, self.gains)
+        if gains is None:
+            return
+        seq = parse_uint(msg, 'S')
+        stale = (seq is not None and self.last_cmd_seq is not None
+                 and (self.last_cmd_seq - seq) & 0xFFFFFFFF < CMD_SEQ_WINDOW)
+        if not stale:
+            # startGainRamp(): ramp từ giá trị đang áp dụng (có thể đang giữa ramp trước)
+            self.ramp_from = tuple(float(g) for g in self.sim.gains[:, 0])
+            self.ramp_start = self.sim.t
+            self.ramp_ms = min(parse_uint(msg, 'R') or 0, RAMP_MS_MAX)
+            self.gains = gains
+            if not self.ramp_ms:
+                self.sim.set_gains(*gains)
+            if seq is not None:
+                self.last_cmd_seq = seq
+            self.commands += 1
+            print(f"📩 K1={gains[0]:.2f} K2={gains[1]:.2f} K3={gains[2]:.2f} K4={gains[3]:.2f} "
+                  f"R={self.ramp_ms}ms")
+        if not self._lost():
+            ack_seq = self.last_cmd_seq if seq is not None else None
+            self.sock.sendto(format_ack(self.gains, ack_seq, SIM_BUILD).encode(), addr)
+
+    def update_ramp(self):
+        """updateGainRamp(): nội suy smoothstep X1..X4 theo giờ robot"""
+        if not self.ramp_ms:
+            return
+        elapsed = (self.sim.t - self.ramp_start) * 1000.0
+        a = min(elapsed / self.ramp_ms, 1.0)
+        a = a * a * (3.0 - 2.0 * a)
+        self.sim.set_gains(*(f + (t - f) * a for f, t in zip(self.ramp_from, self.gains)))
+        if elapsed >= self.ramp_ms:
+            self.ramp_ms = 0
+
+    def step(self):
+        """1 vòng loop(): điều khiển 5ms, và cứ loop_time_py thì gửi + nhận UDP"""
+        sim = self.sim
+        self.update_ramp()
+        sim.step()
+        self.steps += 1
+        self.sender.record(int(sim.t * 1e6), float(sim.angle_err[0]), float(sim.robot_angle[0]),
+                           float(sim.motor_speed[0]), float(sim.pwm[0]))
+        if self.steps % self.steps_per_send == 0:
+            self.sender.flush()   # updateToUDP()
+            self.receive()        # receiveUDP()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Giả lập ESP32 + robot con lắc bánh đà qua UDP")
+    parser.add_argument('--host', default='127.0.0.1', help='IP máy chạy Python (udpAddress)')
+    parser.add_argument('--port', type=int, default=4210, help='udpPort')
+    parser.add_argument('--listen-port', type=int, default=4211, help='Cổng sim nhận lệnh K')
+    parser.add_argument('--send-ms', type=float, default=50.0, help='loop_time_py (ms) — chu kỳ gửi')
+    parser.add_argument('--speed', type=float, default=1.0, help='Hệ số tốc độ (0 = nhanh nhất)')
+    parser.add_argument('--duration', type=float, default=0, help='Số giây thời gian robot (0 = vô hạn)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed nhiễu (tái lập kết quả)')
+    parser.add_argument('--no-batch', action='store_true', help='1 sample / datagram')
+    parser.add_argument('--csv', action='store_true', help='Gửi chuỗi CSV cũ')
+    parser.add_argument('--robots', type=int, default=1, help='Số robot ảo (cổng lệnh listen-port + i)')
+    parser.add_argument('--loss', type=float, default=0.0, help='Tỉ lệ mất lệnh K / KACK (0..1)')
+    args = parser.parse_args()
+
+    fleet = []
+    for i in range(args.robots):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('0.0.0.0', args.listen_port + i))
+        sock.setblocking(False)
+        seed = None if args.seed is None else args.seed + i
+        fleet.append(SimulatedESP32(sock, (args.host, args.port), batch=not args.no_batch,
+                                    binary=not args.csv, send_ms=args.send_ms, seed=seed,
+                                    loss=args.loss))
+    esp = fleet[0]
+
+    mode = 'CSV' if args.csv else ('binary 1 sample' if args.no_batch else 'binary batch')
+    speed = f"x{args.speed:g}" if args.speed > 0 else "tối đa"
+    ports = (f"{args.listen_port}" if args.robots == 1
+             else f"{args.listen_port}-{args.listen_port + args.robots - 1} ({args.robots} robot)")
+    loss = f" | mất {args.loss:.0%} lệnh/ACK" if args.loss > 0 else ""
+    print(f"🧪 ESP32 SIM :{ports} → {args.host}:{args.port} | 200Hz | "
+          f"gửi mỗi {args.send_ms:.0f}ms | {mode} | tốc độ {speed}{loss}")
+
+    start = time.perf_counter()
+    try:
+        while args.duration <= 0 or esp.sim.t < args.duration:
+            for robot in fleet:
+                robot.step()
+            if args.speed > 0 and esp.steps % esp.steps_per_send == 0:
+                # Giữ nhịp: thời gian robot / speed = thời gian thực
+                delay = start + esp.sim.t / args.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    for robot in fleet:
+        robot.sender.flush()
+
+    elapsed = time.perf_counter() - start
+    samples = sum(r.sender.seq for r in fleet)
+    frames = sum(r.sender.frames_sent for r in fleet)
+    commands = sum(r.commands for r in fleet)
+    dropped = sum(r.dropped for r in fleet)
+    print(f"✅ {esp.sim.t:.1f}s robot trong {elapsed:.1f}s thực (x{esp.sim.t / elapsed:.1f}) | "
+          f"{samples} sample, {frames} datagram, {commands} lệnh K"
+          + (f", bỏ {dropped} gói lệnh/ACK" if dropped else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+🚜 FLEET TUNE — Auto-tune song song trên nhiều robot cùng loại
+================================================================
+Mỗi robot (tách bằng telemetry_hub.TelemetryHub trên 1 cổng) chạy lần thử của
+riêng nó (trial_runner.TrialRunner) trong 1 thread; mọi kết quả đổ về 1
+BayesianOptimizer dùng chung. Robot nào rảnh thì lấy ngay bộ K kế tiếp
+(BayesianOptimizer.suggest với các bộ K đang đo làm "pending") → không robot
+nào phải đợi robot khác.
+
+Robot rớt mạng giữa lần thử: bộ K đang đo được trả lại hàng đợi cho robot khác,
+robot đó bị loại khỏi phiên; các robot còn lại chạy tiếp.
+
+Cuối phiên in tốc độ so với tune 1 robot: tổng thời gian các lần thử (1 robot sẽ
+phải chạy nối tiếp) / thời gian thực của cả phiên.
+
+Cách dùng:
+    python esp32_sim.py --robots 4 --speed 10
+    python fleet_tune.py --robots 4 --sim-speed 10 [--trials 30]
+"""
+
+import argparse
+import math
+import socket
+import threading
+import time
+from batch_sim import K_RANGES
+from optimizers import BayesianOptimizer
+from telemetry_hub import TelemetryHub
+from trial_runner import RAMP_MODES, RAMP_TIME, TrialRunner
+
+START_K = (76.0, 24.0, 0.16)
+TRIALS = 30
+
+
+class FleetTuner:
+    """Chia các lần thử của 1 BayesianOptimizer cho nhiều robot; run() block tới khi xong"""
+
+    def __init__(self, robots, bounds=K_RANGES, start=START_K, trials=TRIALS, seed=None,
+                 speed=1.0, **runner_kwargs):
+        self.optimizer = BayesianOptimizer(bounds, start=start, seed=seed)
+        self.trials = trials
+        self.runners = [TrialRunner(r, speed=speed, verbose=False, prefix=f"[{r.name}] ", **runner_kwargs)
+                        for r in robots]
+        self.results = []        # dict mỗi lần thử xong, theo thứ tự xong
+        self.dropped = []        # tên robot đã rớt mạng
+        self.best_k = None
+        self.best_score = -math.inf
+        self.elapsed = 0.0
+        self._X, self._Y = [], []
+        self._pending = {}       # runner → bộ K (chuẩn hóa) đang đo
+        self._retry = []         # bộ K bị bỏ dở vì robot rớt mạng
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        for runner in self.runners:
+            runner.cancel()
+
+    @property
+    def robot_time(self):
+        """Tổng thời gian thực của các lần thử = thời gian nếu chỉ có 1 robot"""
+        return sum(r['wall'] for r in self.results)
+
+    @property
+    def speedup(self):
+        return self.robot_time / self.elapsed if self.elapsed > 0 else 0.0
+
+    def _next(self, runner):
+        """Bộ K (chuẩn hóa) cho robot rảnh; 'wait' = chờ lần thử của robot khác; None = hết việc"""
+        with self._lock:
+            if self._retry:
+                x = self._retry.pop()
+            elif self._issued < self.trials:
+                x = self.optimizer.suggest(self._X, self._Y, list(self._pending.values()))
+                self._issued += 1
+            else:
+                # Lần thử đang chạy ở robot khác có thể bị trả lại nếu robot đó rớt mạng
+                return 'wait' if self._pending else None
+            self._pending[runner] = x
+            return x
+
+    def _worker(self, runner):
+        while runner.active:
+            x = self._next(runner)
+            if x is None:
+                return
+            if isinstance(x, str):
+                time.sleep(0.1)
+                continue
+            k = [float(v) for v in self.optimizer.from_unit(x)]
+            t0 = time.perf_counter()
+            scorer, settle, acked = runner.run(k, self.best_score if self.best_score > 0 else None)
+            wall = time.perf_counter() - t0
+
+            with self._lock:
+                del self._pending[runner]
+                if scorer is None:
+                    if runner.dropped:
+                        self._retry.append(x)
+                        self.dropped.append(runner.robot.name)
+                    return
+                score = scorer.score()
+                self._X.append(x)
+                self._Y.append(score)
+                better = score > self.best_score
+                if better:
+                    self.best_score, self.best_k = score, k
+                n = len(self.results)
+                self.results.append({'k': k, 'score': score, 'trial': n, 'robot': runner.robot.name,
+                                     'stopped': scorer.stopped, 'settle': settle.elapsed,
+                                     'acked': acked, 'wall': wall})
+            early = f" (dừng sớm: {scorer.stopped})" if scorer.stopped else ""
+            print(f"  #{n} [{runner.robot.name}] K=({k[0]:.0f}, {k[1]:.1f}, {k[2]:.2f}) "
+                  f"→ Score={score:.1f} {'✅' if better else '❌'}{early}")
+
+    def run(self):
+        """Chạy tới khi đủ `trials` lần thử (hoặc cancel / mọi robot rớt mạng) → results"""
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, args=(r,), daemon=True) for r in self.runners]
+        for t in threads:
+            t.start()
+        for t in threads:
+            while t.is_alive():
+                t.join(0.1)
+        self.elapsed = time.perf_counter() - t0
+
+        # Gửi bộ K tốt nhất cho mọi robot còn kết nối
+        if self.best_k is not None:
+            for runner in self.runners:
+                if not runner.dropped:
+                    runner.send_gains(self.best_k)
+        return self.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-tune song song trên nhiều robot cùng loại")
+    parser.add_argument('--robots', type=int, default=2, help='Số robot cần đợi trước khi bắt đầu')
+    parser.add_argument('--wait', type=float, default=10.0, help='Giây tối đa đợi đủ robot')
+    parser.add_argument('--trials', type=int, default=TRIALS, help='Tổng số lần thử của cả đội')
+    parser.add_argument('--start', type=float, nargs=3, default=START_K)
+    parser.add_argument('--sim-speed', type=float, default=1.0, help='Hệ số tốc độ của esp32_sim.py')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--port', type=int, default=4210)
+    parser.add_argument('--no-early-abort', action='store_true')
+    parser.add_argument('--ramp', choices=RAMP_MODES, default='off', help='Cách đổi sang bộ K mới')
+    parser.add_argument('--ramp-time', type=float, default=RAMP_TIME, help='Giây chuyển sang bộ K mới')
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    sock.bind(("0.0.0.0", args.port))
+    hub = TelemetryHub(sock, single_field='angle').start()
+
+    print(f"🚜 Đợi {args.robots} robot trên :{args.port}...")
+    robots = hub.wait_for_robots(args.robots, timeout=args.wait)
+    if not robots:
+        print("⚠️ Không thấy robot nào")
+        return
+    robots = sorted(robots, key=lambda r: r.addr)[:args.robots]
+    print(f"🔗 {len(robots)} robot: {', '.join(r.name for r in robots)}")
+
+    tuner = FleetTuner(robots, start=args.start, trials=args.trials, seed=args.seed,
+                       speed=args.sim_speed, early_abort=not args.no_early_abort,
+                       ramp=args.ramp, ramp_time=args.ramp_time)
+    worker = threading.Thread(target=tuner.run)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.1)
+    except KeyboardInterrupt:
+        print("\n⏹ Đang dừng...")
+        tuner.cancel()
+        worker.join()
+    hub.stop()
+
+    results = tuner.results
+    print(f"\n{'='*50}")
+    print(f"🏆 FLEET AUTO-TUNE ({len(robots)} robot, {len(results)} lần thử):")
+    if tuner.best_k is not None:
+        k = tuner.best_k
+        print(f"   K1 = {k[0]:.1f}  K2 = {k[1]:.1f}  K3 = {k[2]:.2f}  Score = {tuner.best_score:.1f}")
+    for r in robots:
+        n = sum(1 for x in results if x['robot'] == r.name)
+        print(f"   {r.name:<21} {n:>3} lần thử{'  📴 rớt mạng' if r.name in tuner.dropped else ''}")
+    print(f"   Thời gian: {tuner.elapsed:.1f}s thực | 1 robot sẽ mất {tuner.robot_time:.1f}s "
+          f"→ nhanh x{tuner.speedup:.2f}")
+    print(f"{'='*50}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+📨 GAIN CHANNEL — Gửi lệnh K tin cậy qua UDP: số thứ tự, gửi lại, đo RTT
+==========================================================================
+Mỗi lệnh K mang số thứ tự ",S=<seq>" (telemetry_codec.format_command); firmware
+trả "KACK S=<seq>,K1=..." với seq của lệnh MỚI NHẤT đã áp dụng. Nhờ vậy:
+- lệnh hoặc ACK bị mất → hết ack_timeout thì gửi lại đúng lệnh đó (cùng seq),
+  quá `retries` lần → báo thất bại (failed) thay vì im lặng
+- ACK trễ của lệnh cũ không bị nhận nhầm là ACK của lệnh mới
+- chỉ nhận ACK mang ĐÚNG seq kênh này đã gửi: qua telemetry_relay mọi client nhận mọi
+  KACK, seq của client khác (GUI + AutoTune cùng lúc) không xác nhận hộ lệnh có thể đã mất
+- kéo slider: chỉ 1 lệnh trên đường truyền, giá trị mới hơn THAY giá trị đang xếp
+  hàng (latest-value-wins) → robot luôn nhận giá trị cuối, không có hàng dài lệnh cũ
+- RTT (gửi → ACK) của các lệnh không phải gửi lại (thuật toán Karn) → histogram
+
+Firmware cũ (ACK không có S): ACK được so với bộ K đang chờ bằng ack_matches,
+"KACK" trần thì nhận luôn.
+
+Đổi bộ K không giật (bumpless) khi bộ K mới khác xa bộ K cũ:
+- ramp(): PC gửi chuỗi bộ K trung gian (smoothstep) mỗi RAMP_STEP giây — chạy với mọi firmware
+- send(gains, ramp_ms=...): firmware tự nội suy trong ramp_ms (",R=", updateGainRamp)
+
+Không có thread riêng: poll() lo việc gửi lại — GUI gọi trong vòng animation,
+wait() tự gọi khi chờ. on_ack() gọi từ thread nhận (TelemetryReceiver / hub).
+
+Thử với sim mất gói:
+    python esp32_sim.py --speed 5 --loss 0.2
+    python gain_channel.py [--count 100] [--drag 3]
+"""
+
+import argparse
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from telemetry_codec import ack_matches, format_command, parse_ack, parse_ack_build, parse_ack_seq
+
+ACK_TIMEOUT = 0.5       # giây thật chờ KACK trước khi gửi lại
+ACK_RETRIES = 3         # số lần gửi tối đa 1 lệnh
+
+RAMP_STEP = 0.05        # giây giữa 2 lệnh trung gian của ramp() (= loop_time_py của firmware)
+
+# Biên các ô histogram RTT (ms)
+RTT_BINS_MS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf'))
+
+SEQ_MASK = 0xFFFFFFFF
+
+SENT_SEQ_HISTORY = 1024   # số seq đã gửi gần nhất được nhớ để nhận ra ACK của chính mình
+
+
+def seq_newer(a, b):
+    """Seq a mới hơn hoặc bằng b (so sánh vòng 32 bit như firmware)"""
+    return (a - b) & SEQ_MASK < 0x80000000
+
+
+def ramp_points(start, target, duration, step=RAMP_STEP):
+    """
+    Các bộ K trung gian từ start tới target trong `duration` giây, cách nhau `step` giây
+    (nội suy smoothstep như updateGainRamp: đổi chậm ở 2 đầu) → list tuple, phần tử cuối = target.
+    """
+    start = np.asarray(start, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    n = max(1, int(round(duration / step)))
+    a = np.arange(1, n + 1) / n
+    a = a * a * (3.0 - 2.0 * a)
+    points = start + (target - start) * a[:, None]
+    return [tuple(p) for p in points[:-1].tolist()] + [tuple(target.tolist())]
+
+
+class GainChannel:
+    """Kênh lệnh K tới 1 robot; an toàn khi send()/poll() và on_ack() ở 2 thread khác nhau"""
+
+    def __init__(self, send, ack_timeout=ACK_TIMEOUT, retries=ACK_RETRIES, on_acked=None,
+                 window=1000, seq=None):
+        """
+        send    : send(text) gửi 1 datagram tới robot (vd RobotLink.send)
+        on_acked: on_acked(seq) khi 1 lệnh được xác nhận (gọi trong on_ack)
+        seq     : seq đầu tiên; mặc định theo ms đồng hồ → PC khởi động lại vẫn đi tiếp
+                  các seq lớn hơn, firmware không coi là lệnh cũ
+        """
+        self._send = send
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.on_acked = on_acked
+        self._next_seq = (int(time.time() * 1000) & 0x7FFFFFFF) if seq is None else seq
+        self.inflight = None       # lệnh đang chờ ACK: dict seq, gains, ramp_ms, sent, tries
+        self.queued = None         # (seq, gains, ramp_ms) chờ lệnh đang bay xong; mới hơn thì thay
+        self.acked_seq = None      # seq mới nhất robot đã xác nhận
+        self.failed_seq = None     # seq mới nhất bị bỏ sau `retries` lần gửi
+        self.last_ack = None       # bộ K trong KACK gần nhất ('legacy' nếu chỉ "KACK")
+        self.last_build = None     # mã build firmware ("B=" trong KACK), None nếu firmware chưa báo
+        self.sent = 0
+        self.retransmits = 0
+        self.coalesced = 0         # giá trị bị giá trị mới hơn thay trước khi kịp gửi
+        self.superseded = 0        # lệnh đang bay bị bỏ vì đã có giá trị mới hơn
+        self.acked = 0
+        self.failed = 0
+        self.late_acks = 0         # ACK của lệnh cũ / không khớp bộ K đang chờ
+        self.foreign_acks = 0      # ACK mang seq kênh này không gửi (client khác qua relay)
+        self._sent_seqs = OrderedDict()   # seq đã gửi (cũ → mới), tối đa SENT_SEQ_HISTORY
+        self._rtts = np.zeros(window)
+        self._rtt_count = 0
+        self._cond = threading.Condition(threading.RLock())
+
+    # ----- gửi -----
+    def send(self, gains, ramp_ms=None):
+        """
+        Gửi bộ K (K1, K2, K3[, K4]) → seq của lệnh. Đang có lệnh chờ ACK → xếp hàng,
+        thay giá trị đang xếp hàng (nếu có); gửi ngay khi lệnh trước xong.
+        ramp_ms: firmware chuyển dần sang bộ K này trong ramp_ms (firmware cũ: đổi ngay).
+        """
+        gains = tuple(float(g) for g in gains)
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq = (self._next_seq + 1) & SEQ_MASK
+            if self.inflight is None:
+                self._transmit(seq, gains, ramp_ms)
+            else:
+                if self.queued is not None:
+                    self.coalesced += 1
+                self.queued = (seq, gains, ramp_ms)
+            return seq
+
+    def ramp(self, start, target, duration, step=RAMP_STEP, sleep=time.sleep, active=None):
+        """
+        Chuyển dần từ bộ K start sang target bằng chuỗi lệnh trung gian (ramp_points),
+        mỗi `step` giây 1 lệnh (lệnh chưa kịp ACK thì giá trị sau thay giá trị trước)
+        → seq của lệnh cuối (= target). sleep: hàm chờ (vd theo giờ robot ảo).
+        """
+        points = ramp_points(start, target, duration, step)
+        for gains in points[:-1]:
+            if active is not None and not active():
+                break
+            self.send(gains)
+            sleep(step)
+            self.poll()
+        return self.send(points[-1])
+
+    def _transmit(self, seq, gains, ramp_ms=None):
+        self.inflight = {'seq': seq, 'gains': gains, 'ramp_ms': ramp_ms,
+                         'sent': time.perf_counter(), 'tries': 1}
+        self._sent_seqs[seq] = True
+        if len(self._sent_seqs) > SENT_SEQ_HISTORY:
+            self._sent_seqs.popitem(last=False)
+        self.sent += 1
+        self._send(format_command(gains, seq, ramp_ms))
+
+    def _send_queued(self):
+        self.inflight = None
+        if self.queued is not None:
+            seq, gains, ramp_ms = self.queued
+            self.queued = None
+            self._transmit(seq, gains, ramp_ms)
+
+    def poll(self):
+        """Gửi lại / bỏ lệnh quá hạn → số giây tới lần cần poll() tiếp (None = không còn lệnh chờ)"""
+        with self._cond:
+            cur = self.inflight
+            if cur is None:
+                return None
+            now = time.perf_counter()
+            remaining = cur['sent'] + self.ack_timeout - now
+            if remaining > 0:
+                return remaining
+            if self.queued is not None:
+                # Đã có giá trị mới hơn → không cần cố gửi giá trị cũ nữa
+                self.superseded += 1
+                self._send_queued()
+            elif cur['tries'] < self.retries:
+                cur['tries'] += 1
+                cur['sent'] = now
+                self.sent += 1
+                self.retransmits += 1
+                self._send(format_command(cur['gains'], cur['seq'], cur['ramp_ms']))
+            else:
+                self.failed += 1
+                self.failed_seq = cur['seq']
+                self.inflight = None
+                self._cond.notify_all()
+                return None
+            return self.ack_timeout
+
+    # ----- nhận -----
+    def on_ack(self, text):
+        """Xử lý 1 gói "KACK..." → True nếu nó xác nhận lệnh đang chờ"""
+        seq = parse_ack_seq(text)
+        acked = parse_ack(text)
+        build = parse_ack_build(text)
+        now = time.perf_counter()
+        with self._cond:
+            self.last_ack = acked if acked is not None else 'legacy'
+            if build is not None:
+                self.last_build = build
+            cur = self.inflight
+            if seq is None:
+                # Firmware chưa gửi S: so bộ K ("KACK" trần → nhận luôn)
+                if cur is None or (acked is not None and not ack_matches(acked, cur['gains'])):
+                    self.late_acks += 1
+                    return False
+                seq = cur['seq']
+            elif seq not in self._sent_seqs:
+                # Firmware chỉ báo seq mới nhất nó nhận, từ bất kỳ client nào → không xác nhận gì
+                self.foreign_acks += 1
+                return False
+            if self.acked_seq is None or seq_newer(seq, self.acked_seq):
+                self.acked_seq = seq
+            if cur is None or seq != cur['seq']:
+                self.late_acks += 1
+                self._cond.notify_all()
+                return False
+            if cur['tries'] == 1 and seq == cur['seq']:
+                # Karn: lệnh đã gửi lại thì không biết ACK là của lần gửi nào → không đo
+                slot = self._rtt_count % len(self._rtts)
+                self._rtts[slot] = now - cur['sent']
+                self._rtt_count += 1
+            self.acked += 1
+            self._send_queued()
+            self._cond.notify_all()
+        if self.on_acked is not None:
+            self.on_acked(seq)
+        return True
+
+    # ----- chờ -----
+    def result(self, seq):
+        """True = robot đã áp dụng lệnh này (hoặc lệnh mới hơn), False = thất bại, None = đang chờ"""
+        with self._cond:
+            if self.acked_seq is not None and seq_newer(self.acked_seq, seq):
+                return True
+            if self.failed_seq is not None and seq_newer(self.failed_seq, seq):
+                return False
+            if self.inflight is None and self.queued is None:
+                return False   # bị bỏ khi lệnh mới hơn thất bại
+            return None
+
+    @property
+    def pending(self):
+        return self.inflight is not None or self.queued is not None
+
+    def wait(self, seq, timeout=None, active=None):
+        """
+        Chờ (có gửi lại) tới khi lệnh seq xong → True / False; None nếu hết timeout
+        hoặc active() trả về False.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while True:
+                done = self.result(seq)
+                if done is not None:
+                    return done
+                if active is not None and not active():
+                    return None
+                delay = self.poll()
+                if delay is None:
+                    continue
+                if deadline is not None:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        return None
+                    delay = min(delay, remaining)
+                # active() không đánh thức được Condition → kiểm tra lại mỗi 0.1s
+                self._cond.wait(min(delay, 0.1) if active is not None else delay)
+
+    # ----- thống kê -----
+    def rtt_histogram(self):
+        """(biên ô ms, số đếm) của RTT trong cửa sổ trượt"""
+        n = min(self._rtt_count, len(self._rtts))
+        counts, _ = np.histogram(self._rtts[:n] * 1000.0, bins=RTT_BINS_MS)
+        return RTT_BINS_MS, counts
+
+    def snapshot(self):
+        """Bộ đếm + RTT p50/p95/max (ms) dưới dạng dict"""
+        with self._cond:
+            n = min(self._rtt_count, len(self._rtts))
+            rtts_ms = self._rtts[:n] * 1000.0
+            p50, p95 = (np.percentile(rtts_ms, [50, 95]) if n else (0.0, 0.0))
+            return {
+                'sent': self.sent,
+                'retransmits': self.retransmits,
+                'coalesced': self.coalesced,
+                'superseded': self.superseded,
+                'acked': self.acked,
+                'failed': self.failed,
+                'late_acks': self.late_acks,
+                'foreign_acks': self.foreign_acks,
+                'pending': self.pending,
+                'rtt_samples': self._rtt_count,
+                'rtt_p50_ms': float(p50),
+                'rtt_p95_ms': float(p95),
+                'rtt_max_ms': float(rtts_ms.max()) if n else 0.0,
+            }
+
+
+def format_channel_stats(stats):
+    """1 dòng tóm tắt kênh lệnh cho status bar / console"""
+    state = '⏳ chờ ACK' if stats['pending'] else '✅ ACK'
+    return (f"{state}  |  Lệnh: {stats['acked']}/{stats['sent']} (gửi lại {stats['retransmits']}, "
+            f"mất {stats['failed']})  |  RTT p50: {stats['rtt_p50_ms']:.1f}ms  p95: {stats['rtt_p95_ms']:.1f}ms")
+
+
+def main():
+    from telemetry_hub import TelemetryHub
+    import socket
+
+    parser = argparse.ArgumentParser(description="Thử kênh lệnh K (seq + gửi lại) với robot / esp32_sim")
+    parser.add_argument('--port', type=int, default=4210)
+    parser.add_argument('--robot', default=None, help='IP[:port] của robot (mặc định: robot đầu tiên)')
+    parser.add_argument('--count', type=int, default=50, help='Số lệnh gửi lần lượt, đợi ACK từng lệnh')
+    parser.add_argument('--drag', type=float, default=0.0,
+                        help='Thêm: giả lập kéo slider trong bấy nhiêu giây (lệnh mới mỗi 10ms)')
+    parser.add_argument('--timeout', type=float, default=ACK_TIMEOUT)
+    parser.add_argument('--retries', type=int, default=ACK_RETRIES)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("0.0.0.0", args.port))
+    hub = TelemetryHub(sock).start()
+    print(f"📨 Đợi robot trên :{args.port}...")
+    robot = None
+    while robot is None:
+        time.sleep(0.05)
+        if args.robot:
+            ip, _, port = args.robot.partition(':')
+            robot = hub.robot((ip, int(port)) if port else ip)
+        elif hub.robots:
+            robot = next(iter(hub.robots.values()))
+    print(f"🔗 {robot.name}")
+
+    channel = GainChannel(robot.send, ack_timeout=args.timeout, retries=args.retries)
+    robot.on_ack = lambda text, addr: channel.on_ack(text)
+    rng = np.random.default_rng(0)
+    try:
+        for _ in range(args.count):
+            gains = (rng.uniform(60, 90), rng.uniform(15, 30), rng.uniform(0.05, 0.25))
+            channel.wait(channel.send(gains))
+
+        if args.drag > 0:
+            # Kéo slider: giá trị mới mỗi 10ms, chỉ giá trị cuối cần tới robot
+            end = time.perf_counter() + args.drag
+            k1 = 60.0
+            while time.perf_counter() < end:
+                k1 = 60.0 + (k1 - 59.9) % 30.0
+                last = channel.send((k1, 20.0, 0.15))
+                channel.poll()
+                time.sleep(0.01)
+            done = channel.wait(last)
+            final = channel.last_ack
+            ok = done and isinstance(final, tuple) and ack_matches(final, (k1, 20.0, 0.15))
+            print(f"🎚️ Kéo slider: robot giữ giá trị cuối K1={k1:.2f} → {'✅' if ok else '❌'} {final}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hub.stop()
+
+    stats = channel.snapshot()
+    print(f"📊 {format_channel_stats(stats)}")
+    print(f"   gộp {stats['coalesced']} giá trị, bỏ {stats['superseded']} lệnh cũ, "
+          f"{stats['late_acks']} ACK trễ, {stats['foreign_acks']} ACK của client khác, "
+          f"{stats['rtt_samples']} mẫu RTT")
+    edges, counts = channel.rtt_histogram()
+    print("⏱️ Histogram RTT:")
+    for lo, hi, c in zip(edges[:-1], edges[1:], counts):
+        print(f"   {lo:>5g}–{hi:<5g} ms: {c}")
+
+
+if __name__ == "__main__":
+    main()
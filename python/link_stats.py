@@ -0,0 +1,282 @@
+"""
+📶 LINK STATS — Đo mất gói / đảo thứ tự / trùng lặp và độ trễ telemetry
+========================================================================
+- recv_timestamped(): nhận datagram kèm timestamp của kernel (SO_TIMESTAMPNS
+  trên Linux), nơi khác dùng time.time() ngay sau recvfrom.
+- SequenceTracker: dựa vào seq của frame binary để đếm sample mất / đến trễ / trùng.
+- LinkStats: gom cả 2 phần trên + jitter (RFC 3550) + histogram độ trễ trượt.
+
+Chạy headless: python link_stats.py [--port 4210 | --relay] — in bộ đếm mỗi giây.
+Tự kiểm tra SequenceTracker (không cần robot): python link_stats.py --self-test
+
+Độ trễ ở đây là độ trễ MỘT CHIỀU TƯƠNG ĐỐI: (giờ nhận - giờ lấy mẫu đã quy đổi
+bằng DeviceClock). Vì offset là min các lần đo nên 0 ms = gói nhanh nhất từng thấy.
+"""
+
+import socket
+import struct
+import sys
+import time
+import numpy as np
+
+# Linux: SO_TIMESTAMPNS = SCM_TIMESTAMPNS = 35 (Python không export hằng số này)
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+_TIMESPEC = struct.Struct('@ll')
+
+# Biên các ô histogram độ trễ (ms)
+LATENCY_BINS_MS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf'))
+
+
+def enable_kernel_timestamps(sock):
+    """Bật SO_TIMESTAMPNS nếu hệ điều hành hỗ trợ. Trả về True nếu bật được."""
+    if not sys.platform.startswith('linux') or not hasattr(sock, 'recvmsg'):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        return False
+    return True
+
+
+def recv_timestamped(sock, bufsize=1024, kernel=False):
+    """
+    recvfrom() kèm thời điểm nhận (giây, cùng gốc với time.time()).
+    kernel=True: lấy timestamp lúc gói vào card mạng từ ancillary data.
+    """
+    if not kernel:
+        data, addr = sock.recvfrom(bufsize)
+        return data, addr, time.time()
+
+    data, ancdata, _, addr = sock.recvmsg(bufsize, socket.CMSG_SPACE(_TIMESPEC.size))
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(payload) >= _TIMESPEC.size:
+            sec, nsec = _TIMESPEC.unpack_from(payload)
+            return data, addr, sec + nsec * 1e-9
+    return data, addr, time.time()
+
+
+class SequenceTracker:
+    """
+    Đếm sample mất / đến trễ (đảo thứ tự) / trùng theo seq tăng dần.
+    Sample mất được đếm ngay khi thấy khe hở; nếu sau đó nó đến trễ
+    thì trừ lại khỏi `lost` và cộng vào `reordered`.
+    seq nhảy lùi từ WINDOW trở lên (gói trễ / trùng xa vậy không phân biệt được) hoặc
+    restart() (DeviceClock thấy giờ thiết bị nhảy lùi) → ESP32 khởi động lại, đếm tiếp từ seq mới.
+    """
+
+    WINDOW = 4096      # nhớ bao nhiêu seq gần nhất để nhận ra gói trùng / đến trễ
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.expected = None
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.restarts = 0
+        self._seen = np.zeros(self.WINDOW, dtype=bool)
+
+    def update(self, seqs):
+        """Cập nhật với mảng seq theo thứ tự đến"""
+        seqs = np.asarray(seqs, dtype=np.int64)
+        if len(seqs) == 0:
+            return
+        # Đường nhanh: cả loạt liên tục, đúng thứ tự
+        if self.expected is not None and seqs[0] == self.expected and \
+                (len(seqs) == 1 or (np.diff(seqs) == 1).all()) and len(seqs) < self.WINDOW:
+            self._mark(seqs)
+            self.received += len(seqs)
+            self.expected = int(seqs[-1]) + 1
+            return
+        for seq in seqs.tolist():
+            self._update_one(seq)
+
+    def restart(self):
+        """Thiết bị khởi động lại: seq kế tiếp là gốc mới (không tính mất / trùng)"""
+        if self.expected is not None:
+            self.restarts += 1
+        self.expected = None
+        self._seen[:] = False
+
+    def _mark(self, seqs):
+        # Ô của seq mới đè lên ô của seq cũ hơn WINDOW (đã ra khỏi cửa sổ)
+        self._seen[seqs % self.WINDOW] = True
+
+    def _update_one(self, seq):
+        if self.expected is not None and self.expected - seq >= self.WINDOW:
+            self.restart()
+        if self.expected is None:
+            self.expected = seq
+        if seq >= self.expected:
+            gap = seq - self.expected
+            if gap >= self.WINDOW:
+                self._seen[:] = False
+            else:
+                for missing in range(self.expected, seq):
+                    self._seen[missing % self.WINDOW] = False
+            self.lost += gap
+            self._seen[seq % self.WINDOW] = True
+            self.received += 1
+            self.expected = seq + 1
+        elif self._seen[seq % self.WINDOW]:
+            self.duplicates += 1
+        else:
+            self._seen[seq % self.WINDOW] = True
+            self.received += 1
+            self.lost -= 1
+            self.reordered += 1
+
+    @property
+    def loss_ratio(self):
+        total = self.received + self.lost
+        return self.lost / total if total else 0.0
+
+
+class LinkStats:
+    """Bộ đếm chất lượng đường truyền, đọc được từ GUI và công cụ headless qua snapshot()"""
+
+    def __init__(self, window=2000, kernel_timestamps=False):
+        self.seq = SequenceTracker()
+        self.kernel_timestamps = kernel_timestamps
+        self.datagrams = 0
+        self.jitter = 0.0  # giây, RFC 3550
+        self._last_transit = None
+        self._delays = np.zeros(window)
+        self._delay_count = 0
+
+    def on_datagrams(self, arrival, sample_t, seqs=None):
+        """
+        arrival  : thời điểm nhận của từng datagram (giây)
+        sample_t : thời điểm lấy mẫu (giờ PC) của sample CUỐI mỗi datagram
+        seqs     : seq của mọi sample (theo thứ tự đến), None nếu là CSV cũ
+        """
+        if seqs is not None:
+            self.seq.update(seqs)
+        arrival = np.asarray(arrival, dtype=np.float64)
+        transit = arrival - np.asarray(sample_t, dtype=np.float64)
+        self.datagrams += len(transit)
+        for d in transit.tolist():
+            if self._last_transit is not None:
+                self.jitter += (abs(d - self._last_transit) - self.jitter) / 16.0
+            self._last_transit = d
+        window = len(self._delays)
+        delays = np.maximum(transit, 0.0)[-window:]
+        slots = (self._delay_count + np.arange(len(delays))) % window
+        self._delays[slots] = delays
+        self._delay_count += len(delays)
+
+    def latency_histogram(self):
+        """(biên ô ms, số đếm) của độ trễ trong cửa sổ trượt"""
+        n = min(self._delay_count, len(self._delays))
+        counts, _ = np.histogram(self._delays[:n] * 1000.0, bins=LATENCY_BINS_MS)
+        return LATENCY_BINS_MS, counts
+
+    def snapshot(self):
+        """Tất cả bộ đếm dưới dạng dict (chỉ số đơn giản, an toàn khi đọc từ thread khác)"""
+        n = min(self._delay_count, len(self._delays))
+        delays_ms = self._delays[:n] * 1000.0
+        p50, p95 = (np.percentile(delays_ms, [50, 95]) if n else (0.0, 0.0))
+        return {
+            'datagrams': self.datagrams,
+            'received': self.seq.received,
+            'lost': self.seq.lost,
+            'reordered': self.seq.reordered,
+            'duplicates': self.seq.duplicates,
+            'restarts': self.seq.restarts,
+            'loss_pct': self.seq.loss_ratio * 100.0,
+            'jitter_ms': self.jitter * 1000.0,
+            'latency_p50_ms': float(p50),
+            'latency_p95_ms': float(p95),
+            'latency_max_ms': float(delays_ms.max()) if n else 0.0,
+            'kernel_timestamps': self.kernel_timestamps,
+        }
+
+
+def format_stats(stats):
+    """1 dòng tóm tắt cho status bar / console"""
+    return (f"Loss: {stats['loss_pct']:.1f}% ({stats['lost']})  |  "
+            f"Reorder: {stats['reordered']}  |  Dup: {stats['duplicates']}  |  "
+            f"Jitter: {stats['jitter_ms']:.1f}ms  |  p95: {stats['latency_p95_ms']:.1f}ms")
+
+
+def self_test():
+    """Các kịch bản seq (mất, đảo thứ tự, trùng, ESP32 khởi động lại) → True nếu đều đúng"""
+    def run(*chunks):
+        tracker = SequenceTracker()
+        for chunk in chunks:
+            tracker.update(chunk)
+        return {k: getattr(tracker, k) for k in ('received', 'lost', 'reordered', 'duplicates', 'restarts')}
+
+    cases = [
+        ('liên tục', run(np.arange(6000)),
+         {'received': 6000, 'lost': 0, 'reordered': 0, 'duplicates': 0, 'restarts': 0}),
+        ('mất 10', run(np.arange(100), np.arange(110, 200)),
+         {'received': 190, 'lost': 10, 'reordered': 0, 'duplicates': 0, 'restarts': 0}),
+        ('đến trễ + trùng', run(np.arange(50), [52, 53, 51, 51, 50, 10]),
+         {'received': 54, 'lost': 0, 'reordered': 2, 'duplicates': 2, 'restarts': 0}),
+        # Khởi động lại sau 6000 sample (~30 s @ 200 Hz): seq 0..2999 là sample mới, không phải trùng
+        ('khởi động lại', run(np.arange(6000), np.arange(3000)),
+         {'received': 9000, 'lost': 0, 'reordered': 0, 'duplicates': 0, 'restarts': 1}),
+        ('khởi động lại + mất', run(np.arange(6000), np.arange(20), np.arange(25, 40)),
+         {'received': 6035, 'lost': 5, 'reordered': 0, 'duplicates': 0, 'restarts': 1}),
+    ]
+    tracker = SequenceTracker()
+    tracker.update(np.arange(1000))
+    tracker.restart()   # DeviceClock thấy reset dù seq mới chưa lùi đủ WINDOW
+    tracker.update(np.arange(500))
+    cases.append(('restart() từ DeviceClock', {k: getattr(tracker, k) for k in cases[0][2]},
+                  {'received': 1500, 'lost': 0, 'reordered': 0, 'duplicates': 0, 'restarts': 1}))
+
+    ok = True
+    for name, got, want in cases:
+        passed = got == want
+        ok &= passed
+        print(f"   {'✅' if passed else '❌'} {name:<26} {got}" + ('' if passed else f"  (cần {want})"))
+    return ok
+
+
+def main():
+    import argparse
+    from telemetry import SampleRing, TelemetryReceiver
+
+    parser = argparse.ArgumentParser(description="Theo dõi chất lượng telemetry UDP (headless)")
+    parser.add_argument('--port', type=int, default=4210)
+    parser.add_argument('--interval', type=float, default=1.0)
+    parser.add_argument('--relay', action='store_true', help='Nhận qua telemetry_relay.py')
+    parser.add_argument('--self-test', action='store_true', help='Kiểm tra SequenceTracker rồi thoát')
+    args = parser.parse_args()
+
+    if args.self_test:
+        print("🧪 SequenceTracker")
+        sys.exit(0 if self_test() else 1)
+
+    if args.relay:
+        from telemetry_relay import RelaySocket
+        sock = RelaySocket()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        sock.bind(("0.0.0.0", args.port))
+    sock.settimeout(0.1)
+    receiver = TelemetryReceiver(sock, SampleRing(4096)).start()
+    print(f"📶 Nghe UDP :{args.port} | kernel timestamp: {receiver.kernel_timestamps}")
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            stats = receiver.stats.snapshot()
+            print(f"📦 {stats['received']} sample / {stats['datagrams']} gói  |  {format_stats(stats)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.stop()
+        edges, counts = receiver.stats.latency_histogram()
+        print("⏱️ Histogram độ trễ:")
+        for lo, hi, c in zip(edges[:-1], edges[1:], counts):
+            print(f"   {lo:>5g}–{hi:<5g} ms: {c}")
+
+
+if __name__ == "__main__":
+    main()
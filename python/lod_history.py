@@ -0,0 +1,229 @@
+"""
+🔭 LOD HISTORY — Lịch sử dài cho biểu đồ: kim tự tháp min/max nhiều mức phân giải
+===================================================================================
+Vẽ vài phút telemetry (200 Hz → hàng chục nghìn sample) bằng cách vẽ thẳng mọi
+điểm thì mỗi frame là hàng chục nghìn vertex. MinMaxPyramid giữ cho 1 trường:
+
+    mức 0 : từng sample (lo = hi = giá trị)
+    mức l : mỗi ô = min / max của FACTOR**l sample liên tiếp
+
+mỗi mức là 1 SampleRing (lo, hi) riêng; sample mới gộp dần lên các mức trên
+(khấu hao O(1) / sample). envelope(start, end, pixels) chọn mức thô nhất mà mỗi ô
+vẫn ≤ 1 pixel → 1–2 cặp vertex (min, max) mỗi pixel ở mọi mức zoom, phần đuôi
+chưa đủ 1 ô của mức đó lấy từ các mức mịn hơn (vẫn thấy sample mới nhất).
+
+Mức mịn giữ được ít thời gian hơn mức thô (cùng capacity ô): xem lại đoạn cũ hơn
+capacity sample → dùng mức mịn nhất còn dữ liệu (thô hơn 1 pixel một chút).
+
+    history = LodHistory(('angle_err', 'pwm'))
+    history.update_from(ring)                       # mỗi frame: chỉ sample mới
+    x, y = history['pwm'].envelope(start, end, 800)  # polyline min/max, x = chỉ số sample
+
+So sánh với vẽ mọi điểm: python lod_history.py [--samples 1000000]
+"""
+
+import argparse
+import time
+import numpy as np
+from telemetry import SampleRing
+
+HISTORY_CAPACITY = 1 << 15   # ô mỗi mức (mức 0: 32768 sample ≈ 2.7 phút @ 200 Hz, 27 phút @ 20 Hz)
+LOD_FACTOR = 2               # số ô mức dưới gộp thành 1 ô mức trên (2 → mỗi pixel 1–2 ô)
+LOD_LEVELS = 10              # mức thô nhất: 1 ô = 2**10 sample → giữ được ~46 giờ @ 200 Hz
+ENVELOPE_DTYPE = np.dtype([('lo', 'f4'), ('hi', 'f4')])
+
+
+class MinMaxPyramid:
+    """Kim tự tháp min/max của 1 chuỗi số; chỉ số sample tuyệt đối tăng đơn điệu như SampleRing.count"""
+
+    def __init__(self, capacity=HISTORY_CAPACITY, factor=LOD_FACTOR, levels=LOD_LEVELS):
+        self.factor = int(factor)
+        self.levels = int(levels)
+        self.rings = [SampleRing(capacity, ENVELOPE_DTYPE) for _ in range(self.levels + 1)]
+        # Các ô đã xong của mức l - 1 chưa đủ FACTOR để thành 1 ô mức l
+        self._pending = [np.zeros(0, ENVELOPE_DTYPE) for _ in range(self.levels + 1)]
+        self._x = np.zeros(0)
+        self._y = np.zeros(0)
+
+    @property
+    def count(self):
+        return self.rings[0].count
+
+    def bucket(self, level):
+        """Số sample trong 1 ô của mức `level`"""
+        return self.factor ** level
+
+    def oldest(self, level=None):
+        """Chỉ số sample cũ nhất còn giữ ở mức `level` (mặc định: mức thô nhất)"""
+        level = self.levels if level is None else level
+        ring = self.rings[level]
+        return max(ring.count - ring.capacity, 0) * self.bucket(level)
+
+    def extend(self, values):
+        """Thêm các sample mới (theo thứ tự đến)"""
+        values = np.asarray(values, dtype=np.float32)
+        if len(values) == 0:
+            return
+        cells = np.empty(len(values), ENVELOPE_DTYPE)
+        cells['lo'] = values
+        cells['hi'] = values
+        self._push(0, cells)
+
+    def _push(self, level, cells):
+        self.rings[level].extend(cells)
+        if level == self.levels:
+            return
+        merged = np.concatenate((self._pending[level + 1], cells))
+        full = len(merged) // self.factor * self.factor
+        if full:
+            groups = merged[:full].reshape(-1, self.factor)
+            up = np.empty(len(groups), ENVELOPE_DTYPE)
+            up['lo'] = groups['lo'].min(axis=1)
+            up['hi'] = groups['hi'].max(axis=1)
+            self._push(level + 1, up)
+        self._pending[level + 1] = merged[full:]
+
+    def level_for(self, start, end, pixels):
+        """Mức thô nhất có ô ≤ 1 pixel và còn giữ dữ liệu từ `start` (không có → mức thô nhất)"""
+        per_pixel = max((end - start) / max(pixels, 1), 1.0)
+        level = min(int(np.log(per_pixel) / np.log(self.factor) + 1e-9), self.levels)
+        while level < self.levels and start < self.oldest(level):
+            level += 1
+        return level
+
+    def envelope(self, start, end, pixels, origin=0):
+        """
+        Polyline (x, y) phủ các sample [start, end): mỗi ô 2 vertex (x, min), (x, max);
+        x = chỉ số sample ở giữa ô - origin. Trả view của buffer dùng lại giữa các lần gọi
+        (set_data của matplotlib tự copy).
+        """
+        end = min(end, self.count)
+        start = max(start, self.oldest(), 0)
+        if start >= end:
+            return self._x[:0], self._y[:0]
+        level = self.level_for(start, end, pixels)
+        segments = []
+        pos = start
+        # Mức đã chọn phủ tới ô cuối đã xong; phần đuôi lấy ở các mức mịn dần
+        for l in range(level, -1, -1):
+            b = self.bucket(l)
+            first = max(pos // b, self.rings[l].count - self.rings[l].capacity)
+            last = min(-(-end // b), self.rings[l].count)
+            if last > first:
+                cells, _ = self.rings[l].read(first, last)
+                segments.append((cells, first * b + (b - 1) / 2.0, b))
+                pos = last * b
+            if pos >= end:
+                break
+        n = 2 * sum(len(cells) for cells, _, _ in segments)
+        if len(self._x) < n:
+            self._x = np.empty(2 * n)
+            self._y = np.empty(2 * n)
+        i = 0
+        for cells, x0, b in segments:
+            k = len(cells)
+            x = self._x[i:i + 2 * k]
+            x[0::2] = np.arange(k)
+            x[0::2] *= b
+            x[0::2] += x0 - origin
+            x[1::2] = x[0::2]
+            self._y[i:i + 2 * k:2] = cells['lo']
+            self._y[i + 1:i + 2 * k:2] = cells['hi']
+            i += 2 * k
+        return self._x[:n], self._y[:n]
+
+
+class LodHistory:
+    """MinMaxPyramid cho từng trường sample, nạp từ ring theo con trỏ riêng (như RollingStats)"""
+
+    def __init__(self, fields, capacity=HISTORY_CAPACITY, factor=LOD_FACTOR, levels=LOD_LEVELS):
+        self.pyramids = {name: MinMaxPyramid(capacity, factor, levels) for name in fields}
+        self._ring = None
+        self._cursor = 0
+
+    def __getitem__(self, field):
+        return self.pyramids[field]
+
+    @property
+    def count(self):
+        return next(iter(self.pyramids.values())).count
+
+    def oldest(self):
+        return next(iter(self.pyramids.values())).oldest()
+
+    def add_records(self, records):
+        for name, pyramid in self.pyramids.items():
+            pyramid.extend(records[name])
+
+    def update_from(self, ring):
+        """Nạp các sample mới của ring (sample bị ring ghi đè trước khi đọc → bỏ qua) → số sample mới"""
+        if ring is not self._ring:
+            self._ring, self._cursor = ring, 0
+        batch, lost = ring.read(self._cursor)
+        self._cursor += lost + len(batch)
+        if len(batch):
+            self.add_records(batch)
+        return len(batch)
+
+
+def main():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    parser = argparse.ArgumentParser(description="So sánh vẽ mọi sample với đường bao min/max theo mức chi tiết")
+    parser.add_argument('--samples', type=int, default=1_000_000, help='Độ dài lịch sử')
+    parser.add_argument('--batch', type=int, default=4, help='Sample mới mỗi lần nạp (200 Hz / 50 FPS)')
+    parser.add_argument('--pixels', type=int, default=800, help='Bề ngang trục (pixel)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    t = np.arange(args.samples)
+    signal = (5 * np.sin(t / 3000.0) + np.cumsum(rng.normal(0, 0.02, args.samples))
+              + rng.normal(0, 0.5, args.samples)).astype(np.float32)
+
+    pyramid = MinMaxPyramid()
+    t0 = time.perf_counter()
+    pyramid.extend(signal[:args.samples // 2])
+    bulk = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    n_small = min(20000, args.samples // 2)
+    for k in range(args.samples // 2, args.samples // 2 + n_small, args.batch):
+        pyramid.extend(signal[k:k + args.batch])
+    small = (time.perf_counter() - t0) / (n_small / args.batch)
+    pyramid.extend(signal[args.samples // 2 + n_small:])
+
+    # Đường bao phải chứa đúng min / max của mọi đoạn
+    x, y = pyramid.envelope(0, args.samples, args.pixels)
+    ok = np.isclose(y.min(), signal.min()) and np.isclose(y.max(), signal.max())
+
+    fig, ax = plt.subplots(figsize=(args.pixels / 100, 3), dpi=100)
+    ax.set_xlim(0, args.samples)
+    ax.set_ylim(signal.min() - 1, signal.max() + 1)
+    line, = ax.plot([], [], linewidth=0.8)
+    fig.canvas.draw()
+
+    def draw(xd, yd):
+        line.set_data(xd, yd)
+        t0 = time.perf_counter()
+        fig.draw_artist(line)
+        return time.perf_counter() - t0
+
+    full = draw(t, signal)
+    t0 = time.perf_counter()
+    for _ in range(20):
+        x, y = pyramid.envelope(0, args.samples, args.pixels)
+    query = (time.perf_counter() - t0) / 20
+    lod = draw(x, y)
+
+    print(f"🔭 {args.samples:,} sample, trục {args.pixels} px, {pyramid.levels + 1} mức (×{pyramid.factor})")
+    print(f"   Nạp 1 lần {args.samples // 2:,} sample : {bulk * 1e3:8.1f} ms")
+    print(f"   Nạp {args.batch} sample / frame     : {small * 1e6:8.1f} µs / frame")
+    print(f"   Vẽ mọi sample              : {full * 1e3:8.1f} ms  ({args.samples:,} vertex)")
+    print(f"   Đường bao (mức {pyramid.level_for(0, args.samples, args.pixels)})         : "
+          f"{(query + lod) * 1e3:8.1f} ms  ({len(x):,} vertex, truy vấn {query * 1e3:.2f} ms)")
+    print(f"   Min / max khớp dữ liệu gốc: {'✅' if ok else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+🏭 OFFLINE TUNE — Dò bộ K trên robot ảo, chia việc cho mọi nhân CPU
+===================================================================
+Chia danh sách bộ K thành từng khối, mỗi khối chấm bằng batch_sim.simulate_trials()
+trong 1 tiến trình của ProcessPoolExecutor.
+- Tái lập được: mỗi khối có seed riêng sinh từ SeedSequence(seed), nên kết quả
+  không phụ thuộc số tiến trình hay thứ tự khối xong.
+- Giới hạn số khối đang chạy (max_in_flight) → bộ nhớ không phình, dừng nhanh.
+- cancel() (nút DỪNG của AutoTune, Ctrl+C ở đây) bỏ các khối chưa chạy,
+  run() trả về bảng xếp hạng của phần đã chấm xong.
+
+Cách dùng:
+    python offline_tune.py                          # lưới 21 x 25 x 11, mọi nhân CPU
+    python offline_tune.py --random 20000 --workers 4 --seed 1 --top 20
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from batch_sim import FIRMWARE_K4, K_RANGES, RESULT_DTYPE, as_gains, grid_candidates, rank, simulate_trials
+
+# Số bộ K mỗi khối gửi cho 1 tiến trình (đủ lớn để NumPy có lợi, đủ nhỏ để dừng nhanh)
+CHUNK_CANDIDATES = 256
+
+
+def random_candidates(n, ranges=K_RANGES, seed=None, k4=FIRMWARE_K4):
+    """n bộ K ngẫu nhiên đều trong phạm vi → mảng (n, 4)"""
+    rng = np.random.default_rng(seed)
+    cols = [rng.uniform(lo, hi, n) for lo, hi in ranges]
+    return np.column_stack(cols + [np.full(n, k4)])
+
+
+def _evaluate_chunk(gains, repeats, seed):
+    """Chạy trong tiến trình con (phải ở mức module để pickle được)"""
+    return simulate_trials(gains, repeats=repeats, seed=seed)
+
+
+class OfflineTuner:
+    """Chấm điểm song song 1 danh sách bộ K; gọi run() từ thread bất kỳ, cancel() từ thread khác"""
+
+    def __init__(self, candidates, repeats=2, seed=0, workers=None,
+                 chunk=CHUNK_CANDIDATES, max_in_flight=None):
+        self.candidates = as_gains(candidates)
+        self.repeats = repeats
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk = chunk
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.done = 0
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self, on_progress=None):
+        """
+        Chấm toàn bộ → kết quả RESULT_DTYPE đã xếp hạng (score giảm dần).
+        on_progress(done, total, best) được gọi mỗi khi 1 khối xong (từ thread gọi run()).
+        """
+        total = len(self.candidates)
+        starts = range(0, total, self.chunk)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(starts))
+        jobs = iter(zip(starts, seeds))
+        results = np.zeros(total, dtype=RESULT_DTYPE)
+        finished = np.zeros(total, dtype=bool)
+        self.done = 0
+
+        pool = ProcessPoolExecutor(max_workers=self.workers)
+        pending = {}
+        try:
+            while True:
+                # Nạp thêm việc tới khi đủ max_in_flight khối đang chạy
+                while not self.cancelled and len(pending) < self.max_in_flight:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    start, seed = job
+                    gains = self.candidates[start:start + self.chunk]
+                    pending[pool.submit(_evaluate_chunk, gains, self.repeats, seed)] = start
+                if not pending:
+                    break
+
+                ready, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in ready:
+                    start = pending.pop(future)
+                    if future.cancelled():
+                        continue
+                    block = future.result()
+                    results[start:start + len(block)] = block
+                    finished[start:start + len(block)] = True
+                    self.done += len(block)
+                    if on_progress is not None:
+                        best = results['score'][finished].max()
+                        on_progress(self.done, total, best)
+
+                if self.cancelled:
+                    for future in pending:
+                        future.cancel()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        return rank(results[finished])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-tune offline trên robot ảo, chạy song song")
+    parser.add_argument('--grid', type=int, nargs=3, default=(21, 25, 11), metavar=('N1', 'N2', 'N3'),
+                        help='Số điểm lưới cho K1, K2, K3')
+    parser.add_argument('--random', type=int, default=0, help='Dùng N bộ K ngẫu nhiên thay cho lưới')
+    parser.add_argument('--repeats', type=int, default=2, help='Số lần thử (nhiễu khác nhau) mỗi bộ K')
+    parser.add_argument('--workers', type=int, default=None, help='Số tiến trình (mặc định: số nhân CPU)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--k4', type=float, default=FIRMWARE_K4, help='X4 của robot (lệnh K1..K3 không đổi X4)')
+    args = parser.parse_args()
+
+    if args.random:
+        candidates = random_candidates(args.random, seed=args.seed, k4=args.k4)
+    else:
+        candidates = grid_candidates(args.grid, k4=args.k4)
+    tuner = OfflineTuner(candidates, repeats=args.repeats, seed=args.seed, workers=args.workers)
+    print(f"🏭 {len(candidates)} bộ K x {args.repeats} lần | {tuner.workers} tiến trình | seed={args.seed}")
+
+    def progress(done, total, best):
+        print(f"\r   {done}/{total} bộ K | best={best:.1f}", end='', flush=True)
+
+    # Ctrl+C → dừng giống nút DỪNG: run() chạy ở thread phụ, thread chính chờ
+    ranking = []
+    worker = threading.Thread(target=lambda: ranking.append(tuner.run(progress)))
+    t0 = time.perf_counter()
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.1)
+    except KeyboardInterrupt:
+        print("\n⏹ Đang dừng...")
+        tuner.cancel()
+        worker.join()
+    elapsed = time.perf_counter() - t0
+    ranking = ranking[0]
+
+    print(f"\n⏱️ {len(ranking)} bộ K trong {elapsed:.1f}s")
+    print(f"\n{'#':>3} {'K1':>7} {'K2':>6} {'K3':>6} {'Score':>7} {'|góc|':>6} {'max':>6} {'đứng':>6}")
+    for i, r in enumerate(ranking[:args.top], 1):
+        print(f"{i:>3} {r['k1']:>7.1f} {r['k2']:>6.1f} {r['k3']:>6.2f} {r['score']:>7.1f} "
+              f"{r['mean_abs']:>6.2f} {r['max_abs']:>6.1f} {r['standing'] * 100:>5.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""
+🎯 OPTIMIZERS — Các thuật toán dò bộ K dùng chung 1 giao diện ask / tell
+========================================================================
+    opt = make_optimizer('bayes', bounds, start=[76, 24, 0.16], seed=0)
+    while not opt.done:
+        k = opt.ask()            # bộ K cần thử
+        score = run_trial(k)     # đo trên robot (hoặc robot ảo)
+        opt.tell(k, score)       # điểm càng cao càng tốt
+    opt.best_k, opt.best_score
+
+- 'hill'        : Hill Climbing cũ của AutoTune (1 K mỗi lần, bước cố định)
+- 'bayes'       : Bayesian optimization, surrogate Gaussian process (Matern 5/2)
+                  + Expected Improvement — ít lần thử nhất
+- 'cmaes'       : CMA-ES (Hansen), quần thể nhỏ, chịu nhiễu tốt
+- 'nelder-mead' : đơn hình Nelder–Mead, không cần đạo hàm
+
+Mọi thuật toán làm việc trong không gian chuẩn hóa [0, 1]^d theo bounds;
+lần thử đầu tiên luôn là `start` (giống bước "đo bộ K ban đầu").
+prior = [(k, score), ...] đo từ trước (vd trial_cache): 'bayes' đưa thẳng vào GP
+(bớt các điểm thiết kế ban đầu); các thuật toán khác chỉ dùng để chọn start.
+
+So sánh trên robot ảo: python optimizers.py [--trials 30 --runs 10]
+"""
+
+import argparse
+import math
+import numpy as np
+
+
+class Optimizer:
+    """Khung chung: đổi đơn vị, lưu lịch sử, bộ K tốt nhất"""
+
+    name = ''
+
+    def __init__(self, bounds, start=None, seed=None, prior=None):
+        bounds = np.asarray(bounds, dtype=np.float64)
+        self.lo, self.hi = bounds[:, 0], bounds[:, 1]
+        self.dim = len(bounds)
+        self.rng = np.random.default_rng(seed)
+        self.prior = [(self.to_unit(k), float(score)) for k, score in (prior or [])]
+        if start is None and self.prior:
+            start = self.from_unit(max(self.prior, key=lambda p: p[1])[0])
+        self.start = np.full(self.dim, 0.5) if start is None else self.to_unit(start)
+        self.history = []
+        self.best_k = None
+        self.best_score = -math.inf
+        self.done = False
+        self._search_gen = self._search()
+        self._pending = next(self._search_gen)
+
+    def to_unit(self, k):
+        return np.clip((np.asarray(k, dtype=np.float64) - self.lo) / (self.hi - self.lo), 0.0, 1.0)
+
+    def from_unit(self, x):
+        return self.lo + np.clip(x, 0.0, 1.0) * (self.hi - self.lo)
+
+    def ask(self):
+        """Bộ K tiếp theo cần thử (gọi lại trước tell() → trả lại đúng bộ đó)"""
+        return self.from_unit(self._pending)
+
+    def tell(self, k, score):
+        """Báo điểm của bộ K vừa hỏi"""
+        k = np.asarray(k, dtype=np.float64)
+        self.history.append((k.copy(), score))
+        if score > self.best_score:
+            self.best_score = score
+            self.best_k = k.copy()
+        try:
+            self._pending = self._search_gen.send(score)
+        except StopIteration:
+            self.done = True
+
+    def _search(self):
+        """Generator: `score = yield x` cho từng điểm x (chuẩn hóa) cần thử"""
+        raise NotImplementedError
+
+
+# ========== HILL CLIMBING ==========
+class HillClimbing(Optimizer):
+    """Thuật toán gốc của auto_tune_thread: luân phiên K1/K2/K3, hướng ngẫu nhiên, thử ngược nếu tệ"""
+
+    name = 'hill'
+
+    def __init__(self, bounds, start=None, seed=None, prior=None, steps=None, patience=9):
+        bounds = np.asarray(bounds, dtype=np.float64)
+        steps = np.full(len(bounds), 0.05) * (bounds[:, 1] - bounds[:, 0]) if steps is None else steps
+        self.steps = np.asarray(steps, dtype=np.float64) / (bounds[:, 1] - bounds[:, 0])
+        self.patience = patience
+        super().__init__(bounds, start, seed, prior)
+
+    def _search(self):
+        best_x = self.start.copy()
+        best = yield best_x
+        trial = 0
+        no_improve = 0
+        while no_improve < self.patience:
+            i = trial % self.dim
+            direction = self.rng.choice([-1, 1])
+            trial += 1
+            x = best_x.copy()
+            x[i] = np.clip(x[i] + direction * self.steps[i], 0.0, 1.0)
+            if np.array_equal(x, best_x):
+                continue
+            score = yield x
+            if score > best:
+                best, best_x, no_improve = score, x, 0
+                continue
+            no_improve += 1
+            # Thử hướng ngược lại
+            x = best_x.copy()
+            x[i] = np.clip(x[i] - direction * self.steps[i], 0.0, 1.0)
+            if not np.array_equal(x, best_x):
+                trial += 1
+                score = yield x
+                if score > best:
+                    best, best_x, no_improve = score, x, 0
+
+
+# ========== NELDER–MEAD ==========
+class NelderMead(Optimizer):
+    """Đơn hình Nelder–Mead (tối đa hóa score); đơn hình co lại quá nhỏ → dựng lại quanh điểm tốt nhất"""
+
+    name = 'nelder-mead'
+
+    def __init__(self, bounds, start=None, seed=None, prior=None, initial_step=0.15, min_size=0.01):
+        self.initial_step = initial_step
+        self.min_size = min_size
+        super().__init__(bounds, start, seed, prior)
+
+    def _simplex_around(self, x0, step):
+        points = [x0.copy()]
+        for i in range(self.dim):
+            p = x0.copy()
+            p[i] = p[i] + step if p[i] + step <= 1.0 else p[i] - step
+            points.append(p)
+        return points
+
+    def _search(self):
+        # Cực tiểu hóa -score; ký hiệu theo Nelder–Mead chuẩn (α=1, γ=2, ρ=0.5, σ=0.5)
+        step = self.initial_step
+        simplex = self._simplex_around(self.start, step)
+        f = []
+        for p in simplex:
+            f.append(-(yield p))
+
+        while True:
+            order = np.argsort(f)
+            simplex = [simplex[i] for i in order]
+            f = [f[i] for i in order]
+            best, worst = simplex[0], simplex[-1]
+
+            size = max(np.abs(p - best).max() for p in simplex[1:])
+            if size < self.min_size:
+                step = max(step / 2, 2 * self.min_size)
+                simplex = self._simplex_around(best, step)
+                f = f[:1]
+                for p in simplex[1:]:
+                    f.append(-(yield p))
+                continue
+
+            centroid = np.mean(simplex[:-1], axis=0)
+            xr = np.clip(centroid + (centroid - worst), 0.0, 1.0)
+            fr = -(yield xr)
+
+            if f[0] <= fr < f[-2]:
+                simplex[-1], f[-1] = xr, fr
+                continue
+            if fr < f[0]:
+                xe = np.clip(centroid + 2.0 * (xr - centroid), 0.0, 1.0)
+                fe = -(yield xe)
+                simplex[-1], f[-1] = (xe, fe) if fe < fr else (xr, fr)
+                continue
+
+            if fr < f[-1]:
+                xc = centroid + 0.5 * (xr - centroid)
+                fc = -(yield xc)
+                accept = fc <= fr
+            else:
+                xc = centroid + 0.5 * (worst - centroid)
+                fc = -(yield xc)
+                accept = fc < f[-1]
+            if accept:
+                simplex[-1], f[-1] = xc, fc
+                continue
+
+            # Co cả đơn hình về điểm tốt nhất
+            for i in range(1, len(simplex)):
+                simplex[i] = best + 0.5 * (simplex[i] - best)
+                f[i] = -(yield simplex[i])
+
+
+# ========== CMA-ES ==========
+class CMAES(Optimizer):
+    """(μ/μ_w, λ)-CMA-ES theo "The CMA Evolution Strategy: A Tutorial" (Hansen, 2016)"""
+
+    name = 'cmaes'
+
+    def __init__(self, bounds, start=None, seed=None, prior=None, sigma=0.2, popsize=None):
+        self.sigma0 = sigma
+        self.popsize = popsize
+        super().__init__(bounds, start, seed, prior)
+
+    def _sample(self, mean, sigma, B, D):
+        """Lấy mẫu trong [0, 1]^d (lấy lại tối đa 10 lần, sau đó kẹp)"""
+        for _ in range(10):
+            z = self.rng.standard_normal(self.dim)
+            x = mean + sigma * (B @ (D * z))
+            if ((x >= 0) & (x <= 1)).all():
+                return x
+        return np.clip(x, 0.0, 1.0)
+
+    def _search(self):
+        n = self.dim
+        lam = self.popsize or 4 + int(3 * math.log(n))
+        mu = lam // 2
+        weights = math.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        weights /= weights.sum()
+        mueff = 1.0 / (weights ** 2).sum()
+
+        cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+        cs = (mueff + 2) / (n + mueff + 5)
+        c1 = 2 / ((n + 1.3) ** 2 + mueff)
+        cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+        damps = 1 + 2 * max(0.0, math.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+        chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+
+        mean = self.start.copy()
+        sigma = self.sigma0
+        pc = np.zeros(n)
+        ps = np.zeros(n)
+        C = np.eye(n)
+        B, D = np.eye(n), np.ones(n)
+        generation = 0
+
+        yield mean.copy()  # đo bộ K ban đầu
+
+        while True:
+            xs = [self._sample(mean, sigma, B, D) for _ in range(lam)]
+            scores = []
+            for x in xs:
+                scores.append((yield x))
+            order = np.argsort(scores)[::-1][:mu]  # điểm cao trước
+            selected = np.array([xs[i] for i in order])
+
+            old_mean = mean
+            mean = weights @ selected
+            y = (mean - old_mean) / sigma
+            C_inv_sqrt = B @ np.diag(1 / D) @ B.T
+            ps = (1 - cs) * ps + math.sqrt(cs * (2 - cs) * mueff) * (C_inv_sqrt @ y)
+            generation += 1
+            hsig = np.linalg.norm(ps) / math.sqrt(1 - (1 - cs) ** (2 * generation)) / chi_n < 1.4 + 2 / (n + 1)
+            pc = (1 - cc) * pc + hsig * math.sqrt(cc * (2 - cc) * mueff) * y
+
+            artmp = (selected - old_mean) / sigma
+            C = ((1 - c1 - cmu) * C
+                 + c1 * (np.outer(pc, pc) + (not hsig) * cc * (2 - cc) * C)
+                 + cmu * artmp.T @ np.diag(weights) @ artmp)
+            sigma *= math.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+            sigma = min(sigma, 0.5)
+
+            C = np.triu(C) + np.triu(C, 1).T
+            eigvals, B = np.linalg.eigh(C)
+            D = np.sqrt(np.maximum(eigvals, 1e-12))
+
+
+# ========== BAYESIAN OPTIMIZATION ==========
+def _matern52(a, b, length):
+    """Kernel Matern 5/2 giữa 2 tập điểm (m, d), (k, d)"""
+    d = np.sqrt(np.maximum(((a[:, None, :] - b[None, :, :]) ** 2).sum(-1), 0.0)) / length
+    s5 = math.sqrt(5.0) * d
+    return (1.0 + s5 + s5 * s5 / 3.0) * np.exp(-s5)
+
+
+_erf = np.vectorize(math.erf, otypes=[np.float64])
+
+
+class BayesianOptimizer(Optimizer):
+    """
+    GP (Matern 5/2, nhiễu Gauss) trên score đã chuẩn hóa; độ dài kernel và mức nhiễu
+    chọn theo marginal likelihood trên 1 lưới nhỏ. Điểm kế tiếp = argmax Expected
+    Improvement trên các điểm ngẫu nhiên + điểm rải quanh các bộ K tốt nhất.
+    """
+
+    name = 'bayes'
+
+    LENGTH_SCALES = (0.1, 0.2, 0.35, 0.6, 1.0)
+    NOISE_LEVELS = (0.01, 0.05, 0.2)
+
+    def __init__(self, bounds, start=None, seed=None, prior=None, n_init=5, n_candidates=2048, xi=0.01):
+        self.n_init = n_init
+        self.n_candidates = n_candidates
+        self.xi = xi
+        super().__init__(bounds, start, seed, prior)
+
+    def _search(self):
+        X = [x for x, _ in self.prior]
+        Y = [y for _, y in self.prior]
+        # Thiết kế ban đầu: start + Latin hypercube (prior đã có thì bớt tương ứng)
+        init = [self.start.copy()]
+        m = self.n_init - 1 - len(self.prior)
+        if m > 0:
+            cells = np.stack([self.rng.permutation(m) for _ in range(self.dim)], axis=1)
+            init += list((cells + self.rng.uniform(size=(m, self.dim))) / m)
+        for x in init:
+            y = yield x
+            X.append(x)
+            Y.append(y)
+        while True:
+            x = self._propose(np.array(X), np.array(Y, dtype=np.float64))
+            y = yield x
+            X.append(x)
+            Y.append(y)
+
+    def suggest(self, X, Y, pending=()):
+        """
+        Chế độ song song (fleet_tune.py: nhiều robot đo cùng lúc, điểm về không theo thứ tự),
+        không dùng ask() / tell(): bộ K kế tiếp (chuẩn hóa) từ các điểm đã đo (X, Y) và các
+        điểm đang đo `pending`. Constant liar: điểm đang đo coi như có score = trung bình Y
+        → EI không đề xuất lại quanh đó. Đầu tiên là start, rồi ngẫu nhiên đều tới n_init điểm.
+        """
+        X = [np.asarray(x, dtype=np.float64) for x in X]
+        pending = [np.asarray(x, dtype=np.float64) for x in pending]
+        if not X and not pending:
+            return self.start.copy()
+        if len(X) + len(pending) < self.n_init or len(X) < 2:
+            return self.rng.uniform(size=self.dim)
+        Y = np.asarray(Y, dtype=np.float64)
+        lies = np.full(len(pending), Y.mean())
+        return self._propose(np.array(X + pending), np.concatenate([Y, lies]))
+
+    def _fit(self, X, y):
+        """Chọn (length, noise) có log marginal likelihood lớn nhất → (length, L, alpha)"""
+        best = None
+        for length in self.LENGTH_SCALES:
+            K = _matern52(X, X, length)
+            for noise in self.NOISE_LEVELS:
+                try:
+                    L = np.linalg.cholesky(K + (noise + 1e-9) * np.eye(len(X)))
+                except np.linalg.LinAlgError:
+                    continue
+                alpha = np.linalg.solve(L.T, np.linalg.solve(L, y))
+                lml = -0.5 * y @ alpha - np.log(np.diag(L)).sum()
+                if best is None or lml > best[0]:
+                    best = (lml, length, L, alpha)
+        return best[1:]
+
+    def _propose(self, X, Y):
+        mean, std = Y.mean(), Y.std()
+        y = (Y - mean) / (std if std > 0 else 1.0)
+        length, L, alpha = self._fit(X, y)
+
+        top = X[np.argsort(Y)[::-1][:3]]
+        local = top[self.rng.integers(len(top), size=self.n_candidates // 4)]
+        local = local + self.rng.normal(0, 0.05, local.shape)
+        candidates = np.clip(np.vstack([self.rng.uniform(size=(self.n_candidates, self.dim)), local]), 0, 1)
+
+        Ks = _matern52(candidates, X, length)
+        mu = Ks @ alpha
+        v = np.linalg.solve(L, Ks.T)
+        sd = np.sqrt(np.maximum(1.0 - (v * v).sum(0), 1e-12))
+
+        improvement = mu - y.max() - self.xi
+        z = improvement / sd
+        ei = improvement * 0.5 * (1 + _erf(z / math.sqrt(2))) + sd * np.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+        return candidates[np.argmax(ei)]
+
+
+OPTIMIZERS = {
+    'hill': HillClimbing,
+    'bayes': BayesianOptimizer,
+    'cmaes': CMAES,
+    'nelder-mead': NelderMead,
+}
+
+
+def make_optimizer(name, bounds, start=None, seed=None, prior=None, **kwargs):
+    """Tạo optimizer theo tên trong OPTIMIZERS (kwargs riêng của từng loại, vd steps= cho 'hill')"""
+    if name not in OPTIMIZERS:
+        raise ValueError(f"Không có optimizer '{name}' (chọn: {', '.join(OPTIMIZERS)})")
+    return OPTIMIZERS[name](bounds, start=start, seed=seed, prior=prior, **kwargs)
+
+
+def main():
+    from batch_sim import K_RANGES, simulate_trials
+
+    parser = argparse.ArgumentParser(description="So sánh các optimizer trên robot ảo")
+    parser.add_argument('--trials', type=int, default=30, help='Số lần thử mỗi lượt (như MAX_ROUNDS)')
+    parser.add_argument('--runs', type=int, default=10, help='Số lượt độc lập mỗi optimizer')
+    parser.add_argument('--start', type=float, nargs=3, default=(76.0, 24.0, 0.16))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"🎯 {args.runs} lượt x {args.trials} lần thử | start K={tuple(args.start)}")
+    print(f"{'optimizer':>12} {'best@5':>8} {'best@10':>8} {'best@20':>8} {'best@end':>9} {'điểm thật':>10}")
+    for name in OPTIMIZERS:
+        # Mỗi lượt là 1 làn: cả `runs` lượt bước cùng lúc trong 1 lần simulate_trials
+        opts = [make_optimizer(name, K_RANGES, start=args.start, seed=args.seed + r)
+                for r in range(args.runs)]
+        curves = np.full((args.runs, args.trials), np.nan)
+        for t in range(args.trials):
+            live = [i for i, o in enumerate(opts) if not o.done]
+            if not live:
+                break
+            ks = np.array([opts[i].ask() for i in live])
+            scores = simulate_trials(ks, seed=args.seed * 100003 + t)['score']
+            for i, k, score in zip(live, ks, scores):
+                opts[i].tell(k, float(score))
+                curves[i, t] = opts[i].best_score
+        curves = np.fmax.accumulate(np.nan_to_num(curves, nan=-np.inf), axis=1)
+
+        # Điểm "thật" của bộ K được chọn: chấm lại với nhiều nhiễu khác nhau
+        finals = simulate_trials(np.array([o.best_k for o in opts]), repeats=8, seed=args.seed + 7)['score']
+        at = lambda n: curves[:, min(n, args.trials) - 1].mean()
+        print(f"{name:>12} {at(5):>8.1f} {at(10):>8.1f} {at(20):>8.1f} {at(args.trials):>9.1f} "
+              f"{finals.mean():>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+🧮 PENDULUM MODEL — Con lắc ngược bánh đà + luật điều khiển của firmware
+========================================================================
+Mô phỏng 1 vòng loop() của one_axis_reaction_wheel_stick.ino:
+- cảm biến: gyro + accel có nhiễu, bộ lọc bù (Gyro_amount = 0.996)
+- vertical có trễ (ngã khi |ae| > 10°, dựng lại khi |ae| < 2°)
+- pwm = X1*ae + X2*gyroZfilt + X3*-motor_speed + X4*error_sum, kẹp ±255
+- motor_speed = motor_speed*0.995 + pwm (kẹp ±2000), anti-windup error_sum ±30
+- ngã → phanh, reset motor_speed / error_sum
+
+Mọi trạng thái là mảng NumPy shape (n,): mỗi làn là 1 robot ảo với bộ K riêng.
+esp32_sim.py dùng n=1; mô phỏng theo lô dùng n = số bộ K cần thử.
+Thông số cơ khí là ước lượng cho stick ~0.25kg (chọn để các bộ K đã tune tay
+trong repo đứng được), không phải đo trên robot thật.
+"""
+
+import numpy as np
+
+# ========== FIRMWARE ==========
+LOOP_TIME = 0.005          # loop_time = 5ms (200Hz)
+GYRO_AMOUNT = 0.996        # Gyro_amount
+ALPHA = 1.0                # alpha lọc gyro
+ANGLE_OFFSET = 2.5         # angle_offset (độ)
+ERROR_SUM_LIMIT = 30.0     # anti-windup
+PWM_MAX = 255
+MOTOR_SPEED_DECAY = 0.995
+MOTOR_SPEED_LIMIT = 2000
+VERTICAL_OFF_DEG = 10.0    # |ae| > 10 → ngã
+VERTICAL_ON_DEG = 2.0      # |ae| < 2 → đứng lại
+
+# ========== CƠ KHÍ ==========
+GRAVITY = 9.81
+BODY_MASS = 0.25           # kg
+COM_HEIGHT = 0.06          # m, trục quay → trọng tâm
+BODY_INERTIA = 0.006       # kg·m², quanh trục quay
+WHEEL_INERTIA = 4e-4       # kg·m², bánh đà
+MOTOR_STALL_TORQUE = 0.8   # N·m ở PWM 255
+MOTOR_MAX_SPEED = 350.0    # rad/s không tải
+MOTOR_DEADZONE = 15        # |pwm| nhỏ hơn → motor không quay
+MOTOR_TIME_CONSTANT = 0.01 # s, trễ điện của motor
+WHEEL_FRICTION = 2e-5      # N·m·s/rad
+BRAKE_TIME_CONSTANT = 0.05 # s, phanh dừng bánh đà
+BALANCE_BIAS_DEG = 0.3     # điểm cân bằng thật lệch so với offset đo được
+PHYSICS_SUBSTEPS = 2       # tích phân 2.5ms trong mỗi vòng 5ms
+
+# ========== NHIỄU ==========
+GYRO_NOISE = 2.0           # °/s (1 sigma, gồm rung từ bánh đà)
+ACC_NOISE = 0.8            # ° (1 sigma)
+DISTURBANCE_TORQUE = 0.01  # N·m (1 sigma) — gió, dây cáp, tay chạm...
+DISTURBANCE_TIME = 0.3     # s, thời gian tương quan của nhiễu
+
+# ========== NGÃ / ĐỠ LẠI ==========
+FALL_LIMIT_DEG = 30.0      # chạm giá đỡ
+PICKUP_DELAY = 1.0         # s nằm trước khi người đỡ dựng lại
+PICKUP_ANGLE_DEG = 1.5     # góc ngẫu nhiên lúc dựng lại
+
+DEG = 180.0 / np.pi
+
+
+class ReactionWheelSim:
+    """n robot ảo chạy song song, mỗi lần step() = 1 vòng điều khiển 5ms"""
+
+    def __init__(self, n=1, seed=None, pickup=True):
+        self.n = n
+        self.pickup = pickup
+        self.rng = np.random.default_rng(seed)
+        self.t = 0.0
+        self.gains = np.zeros((4, n))  # X1..X4
+
+        # --- Cơ học ---
+        self.theta = self.rng.uniform(-1, 1, n) / DEG   # rad, so với offset cảm biến
+        self.theta_dot = np.zeros(n)
+        self.wheel_speed = np.zeros(n)                  # rad/s
+        self.torque = np.zeros(n)                       # N·m motor → bánh đà
+        self.fallen_time = np.zeros(n)
+        self.disturbance = np.zeros(n)
+
+        # --- Firmware ---
+        self.robot_angle = self.theta * DEG + ANGLE_OFFSET
+        self.gyro_z = np.zeros(n)
+        self.gyro_filt = np.zeros(n)
+        self.error_sum = np.zeros(n)
+        self.motor_speed = np.zeros(n)
+        self.pwm = np.zeros(n)
+        self.vertical = np.abs(self.theta * DEG) < VERTICAL_ON_DEG
+
+    def set_gains(self, k1, k2, k3, k4):
+        """Như receiveUDP(): gán X1..X4 (số hoặc mảng shape (n,))"""
+        for i, k in enumerate((k1, k2, k3, k4)):
+            self.gains[i] = k
+
+    @property
+    def angle_err(self):
+        """ae = robot_angle - angle_offset (giá trị firmware gửi lên)"""
+        return self.robot_angle - ANGLE_OFFSET
+
+    def step(self):
+        dt = LOOP_TIME
+        n = self.n
+
+        # --- angle_calc(): gyro tích phân + accel, bộ lọc bù ---
+        self.gyro_z = self.theta_dot * DEG + self.rng.normal(0, GYRO_NOISE, n)
+        acc_angle = self.theta * DEG + ANGLE_OFFSET + self.rng.normal(0, ACC_NOISE, n)
+        self.robot_angle += self.gyro_z * dt
+        self.robot_angle = self.robot_angle * GYRO_AMOUNT + acc_angle * (1.0 - GYRO_AMOUNT)
+
+        ae = self.robot_angle - ANGLE_OFFSET
+        self.vertical = np.where(np.abs(ae) > VERTICAL_OFF_DEG, False,
+                                 np.where(np.abs(ae) < VERTICAL_ON_DEG, True, self.vertical))
+        v = self.vertical
+
+        # --- Luật điều khiển (chỉ khi vertical) ---
+        self.gyro_filt = np.where(v, ALPHA * self.gyro_z + (1 - ALPHA) * self.gyro_filt, self.gyro_filt)
+        self.error_sum = np.where(v, np.clip(self.error_sum + ae * dt, -ERROR_SUM_LIMIT, ERROR_SUM_LIMIT), 0.0)
+        k1, k2, k3, k4 = self.gains
+        u = k1 * ae + k2 * self.gyro_filt + k3 * -self.motor_speed + k4 * self.error_sum
+        # pwm_s là int → C cắt phần thập phân về 0
+        self.pwm = np.where(v, np.trunc(np.clip(u, -PWM_MAX, PWM_MAX)), 0.0)
+        ms = np.trunc(self.motor_speed * MOTOR_SPEED_DECAY + self.pwm)  # int32_t
+        self.motor_speed = np.where(v, np.clip(ms, -MOTOR_SPEED_LIMIT, MOTOR_SPEED_LIMIT), 0.0)
+
+        # Nhiễu mô-men ngoài: quá trình Ornstein–Uhlenbeck
+        decay = dt / DISTURBANCE_TIME
+        self.disturbance += -self.disturbance * decay + \
+            DISTURBANCE_TORQUE * np.sqrt(2 * decay) * self.rng.normal(0, 1, n)
+
+        self._integrate(dt, brake=~v)
+        self.t += dt
+
+    def _integrate(self, dt, brake):
+        h = dt / PHYSICS_SUBSTEPS
+        mgl = BODY_MASS * GRAVITY * COM_HEIGHT
+        bias = BALANCE_BIAS_DEG / DEG
+        drive = np.where(np.abs(self.pwm) < MOTOR_DEADZONE, 0.0, self.pwm / PWM_MAX)
+        for _ in range(PHYSICS_SUBSTEPS):
+            target = MOTOR_STALL_TORQUE * (drive - self.wheel_speed / MOTOR_MAX_SPEED)
+            self.torque += (np.where(brake, 0.0, target) - self.torque) * (h / MOTOR_TIME_CONSTANT)
+            wheel_torque = np.where(brake, -WHEEL_INERTIA * self.wheel_speed / BRAKE_TIME_CONSTANT,
+                                    self.torque - WHEEL_FRICTION * self.wheel_speed)
+            # Bánh đà nhận wheel_torque, thân nhận phản lực ngược dấu
+            theta_ddot = (mgl * np.sin(self.theta - bias) - wheel_torque + self.disturbance) / BODY_INERTIA
+            self.wheel_speed += wheel_torque / WHEEL_INERTIA * h
+            self.theta_dot += theta_ddot * h
+            self.theta += self.theta_dot * h
+
+        # Chạm giá đỡ → nằm yên; sau PICKUP_DELAY người đỡ dựng lại
+        limit = FALL_LIMIT_DEG / DEG
+        down = np.abs(self.theta) >= limit
+        self.theta = np.clip(self.theta, -limit, limit)
+        self.theta_dot = np.where(down, 0.0, self.theta_dot)
+        self.fallen_time = np.where(down, self.fallen_time + dt, 0.0)
+
+        if self.pickup:
+            lift = self.fallen_time >= PICKUP_DELAY
+            if lift.any():
+                new_theta = self.rng.uniform(-PICKUP_ANGLE_DEG, PICKUP_ANGLE_DEG, self.n) / DEG
+                # Gyro "thấy" cú dựng lại nên ước lượng góc đi theo
+                self.robot_angle = np.where(lift, self.robot_angle + (new_theta - self.theta) * DEG,
+                                            self.robot_angle)
+                self.theta = np.where(lift, new_theta, self.theta)
+                self.wheel_speed = np.where(lift, 0.0, self.wheel_speed)
+                self.torque = np.where(lift, 0.0, self.torque)
+                self.fallen_time = np.where(lift, 0.0, self.fallen_time)
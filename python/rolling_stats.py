@@ -0,0 +1,218 @@
+"""
+📐 ROLLING STATS — Thống kê chất lượng cân bằng cập nhật theo từng sample
+===========================================================================
+Thay cho việc mỗi frame cắt 100 điểm cuối rồi tính lại RMS / max bằng NumPy:
+mỗi cửa sổ giữ tổng chạy (Σx, Σx², số sample trong dải ±BAND) và 1 deque đơn
+điệu cho |x| lớn nhất → thêm 1 sample là O(1) (khấu hao), đọc kết quả là O(1).
+
+- RollingWindow(seconds) : cửa sổ trượt theo thời gian sample ('t'); None = cả phiên
+- RollingStats           : nhiều cửa sổ cùng lúc (mặc định 1s, 10s, phiên) trên 1 trường,
+                           update_from(ring) tự giữ con trỏ đọc ring như trial_runner
+
+    perf = RollingStats(field='angle_err')
+    perf.update_from(ring)            # mỗi frame: chỉ xử lý sample mới
+    perf['1s'].rms, perf['10s'].in_band, perf.snapshot()
+
+"% trong dải" tính theo số sample (telemetry đều nhịp → ≈ % thời gian).
+
+So sánh với cách tính lại mỗi frame: python rolling_stats.py [--window 2000]
+"""
+
+import argparse
+import math
+import time
+from collections import deque
+import numpy as np
+
+BAND = 2.0   # ± độ: robot coi là "đứng vững"
+WINDOWS = {'1s': 1.0, '10s': 10.0, 'all': None}   # 'all' = cả phiên
+
+
+class RollingWindow:
+    """Mean / RMS / độ lệch chuẩn / max |x| / % trong ±band trên `seconds` giây gần nhất"""
+
+    def __init__(self, seconds=None, band=BAND):
+        self.seconds = seconds
+        self.band = band
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._in_band = 0
+        self._samples = deque()   # (t, x) còn trong cửa sổ
+        self._max = deque()       # (t, |x|) giảm dần: phần tử đầu = max của cửa sổ
+        self._peak = 0.0          # max của cả phiên (seconds=None)
+        self._evicted = 0
+
+    def add(self, t, x):
+        a = abs(x)
+        self.n += 1
+        self._sum += x
+        self._sum_sq += x * x
+        self._in_band += a <= self.band
+        if self.seconds is None:
+            if a > self._peak:
+                self._peak = a
+            return
+        self._samples.append((t, x))
+        while self._max and self._max[-1][1] <= a:
+            self._max.pop()
+        self._max.append((t, a))
+        self._evict(t - self.seconds)
+
+    def extend(self, t, x):
+        """Thêm 1 loạt sample (mảng t, x cùng độ dài) theo thứ tự đến"""
+        for ti, xi in zip(np.asarray(t, dtype=np.float64).tolist(),
+                          np.asarray(x, dtype=np.float64).tolist()):
+            self.add(ti, xi)
+
+    def _evict(self, limit):
+        samples = self._samples
+        while samples and samples[0][0] <= limit:
+            _, x = samples.popleft()
+            self.n -= 1
+            self._sum -= x
+            self._sum_sq -= x * x
+            self._in_band -= abs(x) <= self.band
+            self._evicted += 1
+        while self._max and self._max[0][0] <= limit:
+            self._max.popleft()
+        # Cộng / trừ mãi thì tổng chạy trôi sai số → tính lại sau mỗi vòng cửa sổ (khấu hao O(1))
+        if self._evicted > max(len(samples), 256):
+            self._sum = math.fsum(x for _, x in samples)
+            self._sum_sq = math.fsum(x * x for _, x in samples)
+            self._evicted = 0
+
+    @property
+    def mean(self):
+        return self._sum / self.n if self.n else 0.0
+
+    @property
+    def variance(self):
+        if not self.n:
+            return 0.0
+        mean = self._sum / self.n
+        return max(self._sum_sq / self.n - mean * mean, 0.0)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def rms(self):
+        return math.sqrt(max(self._sum_sq / self.n, 0.0)) if self.n else 0.0
+
+    @property
+    def max(self):
+        """max |x| trong cửa sổ"""
+        if self.seconds is None:
+            return self._peak
+        return self._max[0][1] if self._max else 0.0
+
+    @property
+    def in_band(self):
+        """% sample có |x| ≤ band"""
+        return 100.0 * self._in_band / self.n if self.n else 0.0
+
+    def snapshot(self):
+        return {'n': self.n, 'mean': self.mean, 'std': self.std, 'rms': self.rms,
+                'max': self.max, 'in_band': self.in_band}
+
+
+class RollingStats:
+    """Các RollingWindow cùng nhận 1 trường sample; đọc theo tên cửa sổ: stats['1s'].rms"""
+
+    def __init__(self, windows=WINDOWS, field='angle', band=BAND):
+        self.field = field
+        self.band = band
+        self.windows = {name: RollingWindow(seconds, band) for name, seconds in windows.items()}
+        self._ring = None
+        self._cursor = 0
+
+    def __getitem__(self, name):
+        return self.windows[name]
+
+    def reset(self):
+        """Bắt đầu phiên mới (vd đổi bộ K); update_from() tiếp tục từ sample mới nhất"""
+        for w in self.windows.values():
+            w.reset()
+        if self._ring is not None:
+            self._cursor = self._ring.count
+
+    def extend(self, t, x):
+        for w in self.windows.values():
+            w.extend(t, x)
+
+    def add_records(self, records):
+        """Thêm các sample (mảng có cấu trúc, có trường 't' và self.field)"""
+        if len(records):
+            self.extend(records['t'], records[self.field])
+
+    def update_from(self, ring):
+        """Đọc các sample mới của ring kể từ lần trước (đổi ring → đọc lại từ đầu) → số sample mới"""
+        if ring is not self._ring:
+            self._ring, self._cursor = ring, 0
+        batch, lost = ring.read(self._cursor)
+        self._cursor += lost + len(batch)
+        self.add_records(batch)
+        return len(batch)
+
+    def snapshot(self):
+        return {name: w.snapshot() for name, w in self.windows.items()}
+
+
+def format_rolling(snapshot, unit='°'):
+    """Bảng nhỏ (font monospace) cho panel Performance: mỗi cột 1 cửa sổ"""
+    names = list(snapshot)
+    rows = [' ' * 4 + ''.join(f'{name[:5]:>6}' for name in names)]
+    for label, key, fmt in (('RMS', 'rms', '{:6.2f}'), ('Max', 'max', '{:6.2f}'),
+                            ('σ', 'std', '{:6.2f}'), (f'±{BAND:g}{unit}', 'in_band', '{:5.0f}%')):
+        rows.append(f'{label:<4}' + ''.join(fmt.format(snapshot[n][key]) for n in names))
+    return '\n'.join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh thống kê cập nhật từng sample với tính lại mỗi frame")
+    parser.add_argument('--window', type=int, default=2000, help='Số sample của cửa sổ (10 s @ 200 Hz)')
+    parser.add_argument('--rate', type=float, default=200.0, help='Hz telemetry')
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=4, help='Sample mới mỗi frame (200 Hz / 50 FPS)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    total = args.window + args.frames * args.batch
+    signal = np.cumsum(rng.normal(0, 0.2, total)) * 0.1 + rng.normal(0, 1.0, total)
+    times = np.arange(total) / args.rate
+    seconds = (args.window - 0.5) / args.rate   # nửa sample dư: đúng `window` sample dù t làm tròn
+
+    def recompute(x):
+        """Cách cũ: tính lại trên cả cửa sổ mỗi frame"""
+        return (np.sqrt(np.mean(np.square(x))), np.max(np.abs(x)),
+                np.std(x), 100.0 * np.mean(np.abs(x) <= BAND))
+
+    t0 = time.perf_counter()
+    for k in range(args.frames):
+        end = args.window + (k + 1) * args.batch
+        recompute(signal[end - args.window:end])
+    old = (time.perf_counter() - t0) / args.frames
+
+    w = RollingWindow(seconds)
+    w.extend(times[:args.window], signal[:args.window])
+    t0 = time.perf_counter()
+    for k in range(args.frames):
+        end = args.window + (k + 1) * args.batch
+        w.extend(times[end - args.batch:end], signal[end - args.batch:end])
+        got = (w.rms, w.max, w.std, w.in_band)
+    new = (time.perf_counter() - t0) / args.frames
+    worst = max(abs(a - b) for a, b in zip(got, recompute(signal[end - args.window:end])))
+
+    print(f"📐 Cửa sổ {args.window} sample ({args.window / args.rate:g}s), {args.batch} sample mới / frame")
+    print(f"   Tính lại mỗi frame : {old * 1e3:8.3f} ms / frame")
+    print(f"   RollingWindow      : {new * 1e3:8.3f} ms / frame  (x{old / new:,.0f})")
+    print(f"   Khớp cách cũ (sai lệch {worst:.2e}): {'✅' if worst < 1e-6 else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+📊 SCORE CHART — Biểu đồ điểm các lần thử, cập nhật tăng dần (retained mode)
+=============================================================================
+Thay cho ax.clear() + vẽ lại mọi cột / tiêu đề / axhline mỗi frame: các artist
+được giữ lại giữa các frame, sync(results_log) chỉ làm việc khi có lần thử mới:
+
+- lần thử thường  : thêm 1 cột + 1 đoạn đường "best tới hiện tại", vẽ thẳng lên
+                    nền đã cache (BlitManager.draw_static) → O(1), không vẽ lại figure
+- best mới / hoà  : đổi màu cột best cũ và cột mới, dời axhline, đổi tiêu đề → 1 lần
+                    vẽ đầy đủ (draw_idle); trục x / y chỉ nới rộng theo bội 2 nên
+                    hiếm khi phải vẽ lại vì đổi giới hạn trục
+
+Frame không có lần thử mới không đụng tới biểu đồ → CPU mỗi frame như nhau dù
+phiên có 5 hay 500 lần thử.
+
+So sánh với cách vẽ lại mỗi frame: python score_chart.py [--trials 500]
+"""
+
+import argparse
+import time
+import numpy as np
+from matplotlib.lines import Line2D
+
+BAR_COLOR = 'steelblue'
+BEST_COLOR = 'green'
+BAR_ALPHA = 0.7
+X_SPAN = 10        # số lần thử trên trục x lúc đầu (nhân đôi khi đầy)
+
+
+class ScoreChart:
+    """Cột điểm mỗi lần thử + đường best tới hiện tại + axhline best trên 1 trục"""
+
+    def __init__(self, ax, blit=None):
+        self.ax = ax
+        self.blit = blit
+        ax.set_autoscale_on(False)   # giới hạn trục do sync() quản lý
+        ax.set_ylabel("Score")
+        ax.set_xlabel("Trial #")
+        self.step_line, = ax.plot([], [], drawstyle='steps-post', color=BEST_COLOR,
+                                  linewidth=1.5, label='Best tới hiện tại')
+        self.best_line = ax.axhline(y=0, color=BEST_COLOR, linestyle='--', alpha=0.5, linewidth=1)
+        # Đoạn mới của đường best, chỉ dùng khi vẽ thẳng lên nền (không nằm trong trục)
+        self._segment = Line2D([], [], color=BEST_COLOR, linewidth=1.5, transform=ax.transData)
+        self._segment.set_figure(ax.figure)
+        self._segment.set_clip_box(ax.bbox)
+        self.bars = []
+        self._results = None
+        self.reset()
+
+    def reset(self):
+        """Xoá mọi cột (phiên mới / offline / tiếp tục checkpoint)"""
+        for bar in self.bars:
+            bar.remove()
+        self.bars = []
+        self.trials = np.zeros(64)
+        self.best_so_far = np.zeros(64)
+        self.best_bars = []   # cột đang tô màu best (nhiều cột nếu hoà điểm)
+        self.step_line.set_data([], [])
+        self.best_line.set_visible(False)
+        self.ax.set_title("📊 Điểm mỗi lần thử (cao = tốt)")
+        self._xmax = X_SPAN
+        self._ylim = (0.0, 1.0)
+        self.ax.set_xlim(0.5, self._xmax + 0.5)
+        self.ax.set_ylim(*self._ylim)
+        if not self.ax.get_legend():
+            # Legend ngay trên góc phải trục (ngang tiêu đề): cột mới vẽ lên nền không bao giờ đè lên nó
+            self.ax.legend(loc='lower right', bbox_to_anchor=(1.0, 1.0), fontsize=8, frameon=False,
+                           borderaxespad=0.2)
+
+    @property
+    def best_score(self):
+        return self.best_bars[0].get_height() if self.best_bars else None
+
+    def _grow(self, array):
+        out = np.zeros(2 * len(array))
+        out[:len(array)] = array
+        return out
+
+    def add(self, trial, score):
+        """Thêm 1 lần thử → True nếu phải vẽ lại cả figure (best mới / nới trục)"""
+        n = len(self.bars)
+        best = self.best_score
+        bar = self.ax.bar([trial], [score], color=BAR_COLOR, alpha=BAR_ALPHA)[0]
+        self.bars.append(bar)
+
+        if n == len(self.trials):
+            self.trials = self._grow(self.trials)
+            self.best_so_far = self._grow(self.best_so_far)
+        new_best = best is None or score >= best
+        self.trials[n] = trial
+        self.best_so_far[n] = score if new_best else best
+        self.step_line.set_data(self.trials[:n + 1], self.best_so_far[:n + 1])
+
+        full = False
+        if new_best:
+            # Chỉ đổi màu cột best cũ (bị vượt hẳn) và cột mới; hoà điểm → cùng tô xanh
+            if best is not None and score > best:
+                for old in self.best_bars:
+                    old.set_color(BAR_COLOR)
+                    old.set_alpha(BAR_ALPHA)
+                self.best_bars = []
+            bar.set_color(BEST_COLOR)
+            bar.set_alpha(BAR_ALPHA)
+            self.best_bars.append(bar)
+            self.best_line.set_ydata([score, score])
+            self.best_line.set_visible(score > 0)
+            self.ax.set_title(f"📊 Scores — Best: {score:.1f}")
+            full = True
+        if trial > self._xmax:
+            while trial > self._xmax:
+                self._xmax *= 2
+            self.ax.set_xlim(0.5, self._xmax + 0.5)
+            full = True
+        lo, hi = self._ylim
+        if score < lo or score > hi:
+            self._ylim = (min(lo, score * 1.25), max(hi, score * 1.25))
+            self.ax.set_ylim(*self._ylim)
+            full = True
+        return full
+
+    def sync(self, results):
+        """
+        Đưa các lần thử mới của `results` (results_log) lên biểu đồ; results là list khác
+        với lần trước (phiên mới, offline, checkpoint) → vẽ lại từ đầu. → số cột vừa thêm.
+        """
+        full = False
+        if results is not self._results:
+            self.reset()
+            self._results = results
+            full = True
+        n = len(self.bars)
+        new = results[n:]
+        for r in new:
+            full |= self.add(r['trial'], r['score'])
+        if not new and not full:
+            return 0
+        if full or self.blit is None or not self._draw_incremental(len(new)):
+            self.ax.figure.canvas.draw_idle()
+        return len(new)
+
+    def _draw_incremental(self, k):
+        """Vẽ k cột mới + đoạn đường best tương ứng thẳng lên nền của BlitManager"""
+        n = len(self.bars)
+        start = max(n - k - 1, 0)
+        self._segment.set_data(self.trials[start:n], self.best_so_far[start:n])
+        self._segment.set_drawstyle('steps-post')
+        return self.blit.draw_static(self.bars[n - k:] + [self._segment], self.ax.bbox)
+
+
+def main():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from blit_render import BlitManager
+
+    parser = argparse.ArgumentParser(description="So sánh vẽ lại biểu đồ điểm mỗi frame với ScoreChart")
+    parser.add_argument('--trials', type=int, default=500)
+    parser.add_argument('--frames', type=int, default=30, help='Frame đo ở mỗi mốc số lần thử')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    scores = 60 + 30 * (1 - np.exp(-np.arange(args.trials) / 80)) + rng.normal(0, 8, args.trials)
+    results = [{'trial': i + 1, 'score': float(s)} for i, s in enumerate(scores)]
+    marks = [m for m in (5, 50, 500, 5000) if m <= args.trials]
+
+    def old_frame(ax, log):
+        """Bản cũ trong AutoTune_PID.update()"""
+        ax.clear()
+        trials = [r['trial'] for r in log]
+        sc = [r['score'] for r in log]
+        best = max(sc)
+        ax.bar(trials, sc, color=['green' if s == best else 'steelblue' for s in sc], alpha=0.7)
+        ax.step(trials, np.maximum.accumulate(sc), where='post', color='green', linewidth=1.5)
+        ax.set_title(f"📊 Scores — Best: {best:.1f}")
+        ax.axhline(y=best, color='green', linestyle='--', alpha=0.5, linewidth=1)
+
+    print(f"📊 ms / frame (Agg) theo số lần thử đã có")
+    print(f"   {'lần thử':>8} {'vẽ lại mỗi frame':>18} {'ScoreChart':>12} {'thêm 1 lần thử':>16}")
+    for m in marks:
+        fig, (ax_angle, ax) = plt.subplots(2, 1, figsize=(10, 7))
+        line, = ax_angle.plot(np.arange(200), rng.normal(0, 3, 200))
+        ax_angle.set_ylim(-20, 20)
+        t0 = time.perf_counter()
+        for _ in range(args.frames):
+            old_frame(ax, results[:m])
+            line.set_ydata(rng.normal(0, 3, 200))
+            fig.canvas.draw()
+        old = (time.perf_counter() - t0) / args.frames
+        plt.close(fig)
+
+        fig, (ax_angle, ax) = plt.subplots(2, 1, figsize=(10, 7))
+        line, = ax_angle.plot(np.arange(200), rng.normal(0, 3, 200))
+        ax_angle.set_ylim(-20, 20)
+        manager = BlitManager(fig.canvas, [line])
+        chart = ScoreChart(ax, manager)
+        log = results[:m - 1]
+        chart.sync(log)
+        fig.canvas.draw()
+        t0 = time.perf_counter()
+        for _ in range(args.frames):
+            chart.sync(log)
+            line.set_ydata(rng.normal(0, 3, 200))
+            manager.update()
+        new = (time.perf_counter() - t0) / args.frames
+        # 1 lần thử mới không phải best (không vẽ lại figure)
+        log.append({'trial': m, 'score': float(min(scores[:m]))})
+        t0 = time.perf_counter()
+        chart.sync(log)
+        manager.update()
+        add = time.perf_counter() - t0
+        plt.close(fig)
+        print(f"   {m:>8} {old * 1e3:>15.1f} ms {new * 1e3:>9.2f} ms {add * 1e3:>13.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+⏳ SETTLE — Phát hiện robot đã ổn định sau khi đổi bộ K
+========================================================
+Thay cho sleep(1.5) cố định: robot coi là ổn định khi trong cửa sổ WINDOW giây gần nhất
+- độ lệch chuẩn của góc < STD_THRESHOLD (hết dao động), và
+- độ trôi (hệ số góc hồi quy tuyến tính của góc theo thời gian) < DRIFT_THRESHOLD °/s,
+- không sample nào trong cửa sổ vượt fall_threshold,
+và đã qua ít nhất MIN_TIME giây. Quá TIMEOUT giây thì bỏ cuộc (timed_out; fallen cho biết
+lúc đó robot có đang nằm không — tức là ngã với chính bộ K mới).
+
+Robot còn nằm từ lần thử trước không được tính vào đây: TrialRunner.wait_upright() chờ
+người dựng robot lại (không giới hạn thời gian) rồi mới bắt đầu SettleDetector.
+"""
+
+from collections import deque
+import numpy as np
+from trial_scoring import FALL_THRESHOLD
+
+WINDOW = 0.4            # giây
+STD_THRESHOLD = 1.0     # độ
+DRIFT_THRESHOLD = 2.0   # độ / giây
+MIN_TIME = 0.3          # giây
+TIMEOUT = 3.0           # giây
+
+
+class SettleDetector:
+    """Nhận (thời điểm, góc) theo loạt; settled / timed_out cho biết lúc nào dừng chờ"""
+
+    def __init__(self, window=WINDOW, std_threshold=STD_THRESHOLD, drift_threshold=DRIFT_THRESHOLD,
+                 min_time=MIN_TIME, timeout=TIMEOUT, fall_threshold=FALL_THRESHOLD):
+        self.window = window
+        self.std_threshold = std_threshold
+        self.drift_threshold = drift_threshold
+        self.min_time = min_time
+        self.timeout = timeout
+        self.fall_threshold = fall_threshold
+        self.count = 0
+        self.elapsed = 0.0
+        self.settled = False
+        self.fallen = False
+        self.timed_out = False
+        self.std = float('nan')
+        self.drift = float('nan')
+        self._t = deque()
+        self._a = deque()
+
+    @property
+    def done(self):
+        return self.settled or self.timed_out
+
+    def add(self, times, angles, now):
+        """
+        times : thời điểm của từng sample (giây, tính từ lúc bắt đầu chờ)
+        angles: góc tương ứng
+        now   : thời điểm hiện tại (giây) → True nếu đã có thể dừng chờ
+        """
+        self.elapsed = now
+        angles = np.asarray(angles, dtype=np.float64)
+        self.count += len(angles)
+        self._t.extend(np.asarray(times, dtype=np.float64).tolist())
+        self._a.extend(angles.tolist())
+        while self._t and self._t[0] < now - self.window:
+            self._t.popleft()
+            self._a.popleft()
+
+        if len(angles):
+            self.fallen = abs(angles[-1]) >= self.fall_threshold
+        if now >= self.min_time and len(self._a) >= 3 and self._t[-1] - self._t[0] >= self.window / 2:
+            t = np.fromiter(self._t, dtype=np.float64)
+            a = np.fromiter(self._a, dtype=np.float64)
+            self.std = float(a.std())
+            self.drift = float(abs(np.polyfit(t - t.mean(), a, 1)[0]))
+            self.settled = (self.std < self.std_threshold and self.drift < self.drift_threshold
+                            and np.abs(a).max() < self.fall_threshold)
+        if not self.done and now >= self.timeout:
+            self.timed_out = True
+        return self.done
+
+    @property
+    def rate(self):
+        """Số sample / giây đã nhận trong lúc chờ (0 nếu chưa có gì)"""
+        return self.count / self.elapsed if self.elapsed > 0 else 0.0
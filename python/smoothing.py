@@ -0,0 +1,247 @@
+"""
+〰️ SMOOTHING — Bộ lọc làm mượt theo luồng (cập nhật từng loạt sample mới)
+==========================================================================
+Thay cho moving_average() tính lại cả cửa sổ hiển thị mỗi frame: mỗi bộ lọc giữ
+trạng thái giữa các lần gọi, update(x, t) chỉ xử lý các sample MỚI → chi phí theo
+số sample tới, không theo MAX_POINTS hay độ dài cửa sổ.
+
+- SMA(window)         : trung bình trượt bằng tổng cộng dồn (O(1) / sample)
+- EMA(alpha | span)   : trung bình hàm mũ (O(1) / sample)
+- SavitzkyGolay(w, p) : fit đa thức bậc p trên w sample gần nhất, lấy giá trị tại
+                        sample mới nhất (nhân quả, không trễ nửa cửa sổ; O(w) / sample)
+- OneEuro(...)        : lọc 1€ (Casiez 2012) — mượt khi đứng yên, bám nhanh khi đổi nhanh
+
+Smoother gắn các bộ lọc vào trường của sample và ghi kết quả vào trường
+"<trường>_smooth" NGAY TRONG ring (telemetry.ingest gọi apply() trước khi ghi):
+GUI chỉ đọc view['angle_err_smooth'] như đọc dữ liệu thô.
+
+So sánh tốc độ với moving_average() cũ: python smoothing.py [--window 200]
+"""
+
+import argparse
+import time
+import numpy as np
+
+SUFFIX = '_smooth'
+
+
+class SMA:
+    """Trung bình trượt `window` sample; lúc đầu (chưa đủ window) lấy trung bình phần đã có"""
+
+    def __init__(self, window=5):
+        self.window = int(window)
+        self.reset()
+
+    def reset(self):
+        self._tail = np.zeros(0)   # window - 1 sample cuối của lần trước
+
+    def update(self, x, t=None):
+        x = np.asarray(x, dtype=np.float64)
+        if len(x) == 0:
+            return x
+        buf = np.concatenate((self._tail, x))
+        sums = np.concatenate(([0.0], np.cumsum(buf)))
+        pos = np.arange(len(self._tail), len(buf))
+        lo = np.maximum(pos - self.window + 1, 0)
+        out = (sums[pos + 1] - sums[lo]) / (pos + 1 - lo)
+        self._tail = buf[-(self.window - 1):] if self.window > 1 else buf[:0]
+        return out
+
+
+class EMA:
+    """y += alpha * (x - y); span N ↔ alpha = 2 / (N + 1) (cùng độ trễ trung bình với SMA(N))"""
+
+    def __init__(self, alpha=None, span=5):
+        self.alpha = float(alpha) if alpha is not None else 2.0 / (span + 1.0)
+        self.reset()
+
+    def reset(self):
+        self._y = None
+
+    def update(self, x, t=None):
+        out = np.empty(len(x))
+        y, a = self._y, self.alpha
+        for i, v in enumerate(np.asarray(x, dtype=np.float64).tolist()):
+            y = v if y is None else y + a * (v - y)
+            out[i] = y
+        self._y = y
+        return out
+
+
+class SavitzkyGolay:
+    """
+    Savitzky–Golay nhân quả: bình phương tối thiểu đa thức bậc `order` trên `window`
+    sample gần nhất, đánh giá tại sample mới nhất (giữ đỉnh tốt hơn SMA cùng cửa sổ).
+    Chưa đủ window sample → trả giá trị thô.
+    """
+
+    def __init__(self, window=11, order=2):
+        if order >= window:
+            raise ValueError("order phải nhỏ hơn window")
+        self.window = int(window)
+        self.order = int(order)
+        # Hàng 0 của pinv(Vandermonde) trên vị trí -w+1..0 = hệ số cho giá trị tại 0
+        pos = np.arange(-self.window + 1, 1, dtype=np.float64)
+        self._coeffs = np.linalg.pinv(np.vander(pos, self.order + 1, increasing=True))[0]
+        self.reset()
+
+    def reset(self):
+        self._tail = np.zeros(0)
+
+    def update(self, x, t=None):
+        x = np.asarray(x, dtype=np.float64)
+        if len(x) == 0:
+            return x
+        buf = np.concatenate((self._tail, x))
+        out = x.copy()
+        if len(buf) >= self.window:
+            fitted = np.convolve(buf, self._coeffs[::-1], mode='valid')
+            out[len(x) - len(fitted):] = fitted[-len(x):]
+        self._tail = buf[-(self.window - 1):]
+        return out
+
+
+class OneEuro:
+    """
+    Lọc 1€: low-pass có tần số cắt tăng theo tốc độ thay đổi của tín hiệu
+    cutoff = min_cutoff + beta * |dx/dt|. t = thời điểm sample (giây); thiếu t → 1/rate.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0, rate=200.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.rate = rate
+        self.reset()
+
+    def reset(self):
+        self._x = None
+        self._dx = 0.0
+        self._t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, x, t=None):
+        x = np.asarray(x, dtype=np.float64).tolist()
+        times = [None] * len(x) if t is None else np.asarray(t, dtype=np.float64).tolist()
+        out = np.empty(len(x))
+        for i, (v, ti) in enumerate(zip(x, times)):
+            if self._x is None:
+                self._x, self._t = v, ti
+                out[i] = v
+                continue
+            dt = ti - self._t if ti is not None and self._t is not None else 0.0
+            if dt <= 0.0:
+                dt = 1.0 / self.rate
+            self._t = ti
+            a_d = self._alpha(self.d_cutoff, dt)
+            self._dx += a_d * ((v - self._x) / dt - self._dx)
+            a = self._alpha(self.min_cutoff + self.beta * abs(self._dx), dt)
+            self._x += a * (v - self._x)
+            out[i] = self._x
+        return out
+
+
+FILTERS = {
+    'sma': SMA,
+    'ema': EMA,
+    'savgol': SavitzkyGolay,
+    'euro': OneEuro,
+}
+
+
+def make_filter(name, window=5, **kwargs):
+    """Tạo bộ lọc theo tên trong FILTERS; window ↔ span (EMA) / window (SMA, S-G), 1€ bỏ qua"""
+    if name not in FILTERS:
+        raise ValueError(f"Không có bộ lọc '{name}' (chọn: {', '.join(FILTERS)})")
+    if name == 'sma':
+        return SMA(window)
+    if name == 'ema':
+        return EMA(span=window, **kwargs)
+    if name == 'savgol':
+        # Cửa sổ S-G cần > bậc đa thức
+        order = kwargs.get('order', 2)
+        return SavitzkyGolay(max(window, order + 2), order)
+    return OneEuro(**kwargs)
+
+
+class Smoother:
+    """Các bộ lọc theo trường sample; apply() ghi kết quả vào trường '<tên>_smooth' của records"""
+
+    def __init__(self, filters):
+        """filters: {tên trường: bộ lọc}, vd {'angle_err': SMA(5), 'pwm': SMA(5)}"""
+        self.filters = dict(filters)
+
+    @property
+    def fields(self):
+        return [name + SUFFIX for name in self.filters]
+
+    def ring_dtype(self, base=None):
+        """dtype của ring = dtype sample + các trường _smooth (float32)"""
+        if base is None:
+            from telemetry import SAMPLE_DTYPE
+            base = SAMPLE_DTYPE
+        base = np.dtype(base)
+        return np.dtype(base.descr + [(f, 'f4') for f in self.fields if f not in base.names])
+
+    def reset(self):
+        for f in self.filters.values():
+            f.reset()
+
+    def apply(self, records):
+        """Lọc các sample mới (theo thứ tự đến) tại chỗ"""
+        t = records['t'] if 't' in records.dtype.names else None
+        for name, f in self.filters.items():
+            records[name + SUFFIX] = f.update(records[name], t)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh moving_average() cũ với bộ lọc theo luồng")
+    parser.add_argument('--points', type=int, default=300, help='MAX_POINTS của GUI')
+    parser.add_argument('--window', type=int, default=5, help='SMOOTH_WINDOW')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=4, help='Sample mới mỗi frame (200 Hz / 50 FPS)')
+    args = parser.parse_args()
+
+    def moving_average(data, window):
+        """Bản cũ trong GuiK_V2_OK.py: np.mean trên cửa sổ cho TỪNG điểm hiển thị"""
+        if len(data) < window:
+            return data
+        result = np.empty(len(data))
+        for i in range(len(data)):
+            start = max(0, i - window + 1)
+            result[i] = np.mean(data[start:i + 1])
+        return result
+
+    rng = np.random.default_rng(0)
+    signal = np.cumsum(rng.normal(0, 0.3, args.points + args.frames * args.batch))
+    t0 = time.perf_counter()
+    for k in range(args.frames):
+        end = args.points + k * args.batch
+        moving_average(signal[end - args.points:end], args.window)
+    old = (time.perf_counter() - t0) / args.frames
+
+    print(f"〰️ {args.points} điểm hiển thị, cửa sổ {args.window}, {args.batch} sample mới / frame")
+    print(f"   moving_average() cũ : {old * 1e3:8.3f} ms / frame")
+    for name in FILTERS:
+        f = make_filter(name, args.window)
+        f.update(signal[:args.points])
+        t0 = time.perf_counter()
+        for k in range(args.frames):
+            end = args.points + k * args.batch
+            f.update(signal[end - args.batch:end])
+        new = (time.perf_counter() - t0) / args.frames
+        print(f"   {name:<20}: {new * 1e3:8.3f} ms / frame  (x{old / new:,.0f})")
+
+    # SMA theo luồng phải khớp moving_average() cũ
+    f = SMA(args.window)
+    streamed = np.concatenate([f.update(c) for c in np.split(signal[:args.points], range(7, args.points, 7))])
+    ok = np.allclose(streamed, moving_average(signal[:args.points], args.window))
+    print(f"   SMA khớp moving_average(): {'✅' if ok else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+📡 TELEMETRY — Nhận dữ liệu UDP từ ESP32 trong thread nền
+==========================================================
+- SampleRing: ring buffer NumPy cấp phát trước, 1 thread ghi / nhiều thread đọc;
+  chỉ số sample tăng đơn điệu → đọc đúng đoạn [start, end) bằng read().
+- DeviceClock: đổi t_us (micros() của ESP32) sang giờ PC để sample trong
+  1 datagram batch giữ đúng thời điểm lấy mẫu gốc.
+- drain(): đọc hết các gói đang chờ trong socket (không block).
+- ingest(): giải mã cả loạt datagram của 1 thiết bị bằng
+  telemetry_codec.decode_datagrams() (binary hoặc CSV cũ) rồi đẩy vào ring;
+  có smoother (smoothing.Smoother) thì giá trị làm mượt được ghi cùng record.
+- TelemetryReceiver: thread nền đọc socket liên tục (1 robot), gọi ingest().
+  Nhiều robot trên 1 socket: telemetry_hub.TelemetryHub.
+  Mỗi datagram được gắn thời điểm nhận (timestamp kernel nếu có) và đưa vào
+  link_stats.LinkStats → receiver.stats.snapshot() cho GUI / công cụ headless.
+
+GUI chỉ đọc `ring.latest(n)` (view, không copy) nên tốc độ nhận
+không còn phụ thuộc vào FPS của matplotlib.
+"""
+
+import select
+import socket
+import threading
+import time
+import numpy as np
+from link_stats import LinkStats, enable_kernel_timestamps, recv_timestamped
+from telemetry_codec import TELEMETRY_DTYPE, decode_datagrams, is_ack
+
+# t = thời điểm lấy mẫu theo giờ PC (time.time()); CSV cũ không có timestamp → giờ nhận
+SAMPLE_DTYPE = np.dtype([('t', 'f8')] + [(name, TELEMETRY_DTYPE[name]) for name in TELEMETRY_DTYPE.names])
+
+
+class SampleRing:
+    """
+    Ring buffer ghi đôi (mirrored): mỗi sample được ghi ở vị trí i và i + capacity,
+    nên `capacity` sample gần nhất luôn nằm liên tục trong bộ nhớ → đọc bằng view.
+    `count` tăng đơn điệu, chỉ được cập nhật SAU khi dữ liệu đã ghi xong.
+    """
+
+    def __init__(self, capacity, dtype=SAMPLE_DTYPE):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._buf = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self.count = 0  # tổng số sample đã ghi từ đầu
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def push(self, record):
+        """Ghi 1 sample (tuple theo thứ tự các trường của dtype)"""
+        i = self.count % self.capacity
+        self._buf[i] = record
+        self._buf[i + self.capacity] = record
+        self.count += 1
+
+    def extend(self, records):
+        """Ghi nhiều sample (mảng structured cùng dtype)"""
+        n = len(records)
+        if n == 0:
+            return
+        if n > self.capacity:
+            records = records[-self.capacity:]
+            self.count += n - self.capacity
+            n = self.capacity
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        for base in (start, start + self.capacity):
+            self._buf[base:base + first] = records[:first]
+        if first < n:
+            rest = n - first
+            self._buf[0:rest] = records[first:]
+            self._buf[self.capacity:self.capacity + rest] = records[first:]
+        self.count += n
+
+    def read(self, start, end=None):
+        """
+        View (không copy) các sample có chỉ số tuyệt đối [start, end), end mặc định = count.
+        Dùng cho 1 thread đọc theo con trỏ riêng: start = end của lần đọc trước.
+        Sample cũ hơn `capacity` đã bị ghi đè → bỏ qua. Trả về (view, số sample bị mất).
+        View còn đúng tới khi thread ghi thêm capacity - (count - start) sample nữa
+        → đọc xong trước đó (capacity >> số sample giữa 2 lần đọc) là không cần khoá.
+        """
+        count = self.count
+        end = count if end is None else min(end, count)
+        oldest = max(count - self.capacity, 0)
+        lost = max(oldest - start, 0)
+        start = max(start, oldest)
+        if start >= end:
+            return self._buf[:0], lost
+        i = start % self.capacity
+        return self._buf[i:i + end - start], lost
+
+    def latest(self, n=None):
+        """View (không copy) của n sample gần nhất, cũ → mới"""
+        count = self.count
+        n = len(self) if n is None else min(n, count, self.capacity)
+        end = count % self.capacity + self.capacity
+        return self._buf[end - n:end]
+
+
+class DeviceClock:
+    """
+    Đổi timestamp thiết bị (u32 micros(), quay vòng sau ~71 phút) sang giờ PC.
+    offset = min(giờ PC lúc nhận - giờ thiết bị): gói đến nhanh nhất có độ trễ
+    nhỏ nhất nên cho ước lượng tốt nhất; offset được phép trôi lên chậm
+    (DRIFT_PPM) để theo kịp lệch xung nhịp giữa 2 máy.
+    """
+
+    WRAP = 1 << 32
+    DRIFT_PPM = 200e-6
+    RESET_JUMP_S = 5.0  # ESP32 reset → t_us nhảy lùi, bắt đầu lại
+
+    def __init__(self):
+        self.offset = None
+        self.resets = 0     # số lần thấy ESP32 khởi động lại (giờ thiết bị nhảy lùi)
+        self._last_raw = None
+        self._wraps = 0
+        self._last_update = None
+
+    def unwrap(self, t_us):
+        """u32 → µs tăng đơn điệu (int64)"""
+        raw = np.asarray(t_us, dtype=np.int64)
+        prev = raw[0] if self._last_raw is None else self._last_raw
+        steps = np.diff(raw, prepend=prev)
+        wraps = self._wraps + np.cumsum(steps < -(self.WRAP // 2))
+        self._last_raw = int(raw[-1])
+        self._wraps = int(wraps[-1])
+        return raw + wraps * self.WRAP
+
+    def to_pc(self, t_us, arrival):
+        """
+        Mảng t_us → giờ PC (giây). `arrival` = thời điểm nhận của datagram chứa
+        từng sample (số hoặc mảng cùng độ dài).
+        """
+        dev = self.unwrap(t_us) * 1e-6
+        candidate = float(np.min(arrival - dev))
+        arrival = float(np.max(arrival))
+        if self.offset is not None and abs(candidate - self.offset) > self.RESET_JUMP_S:
+            self.offset = None
+            self.resets += 1
+        if self.offset is None:
+            self.offset = candidate
+        else:
+            self.offset += self.DRIFT_PPM * (arrival - self._last_update)
+            self.offset = min(self.offset, candidate)
+        self._last_update = arrival
+        return dev + self.offset
+
+
+def drain(sock, first=None, max_packets=256, bufsize=1024):
+    """
+    Đọc tất cả datagram đang chờ trong socket mà không block.
+    `first` = gói (data, addr) đã đọc bằng recvfrom() blocking trước đó.
+    Trả về (danh sách data, addr của gói cuối).
+    """
+    datagrams = []
+    addr = None
+    if first is not None:
+        datagrams.append(first[0])
+        addr = first[1]
+    while len(datagrams) < max_packets:
+        if not select.select([sock], [], [], 0)[0]:
+            break
+        try:
+            data, addr = sock.recvfrom(bufsize)
+        except (BlockingIOError, socket.timeout):
+            break
+        datagrams.append(data)
+    return datagrams, addr
+
+
+def ingest(telemetry, ring, clock, stats, single_field=None, smoother=None):
+    """
+    Giải mã các datagram telemetry [(data, t_nhận)] của CÙNG 1 thiết bị, đổi thời điểm
+    sang giờ PC bằng `clock`, đẩy vào `ring` và cập nhật `stats` → (số sample, số gói hỏng).
+    smoother: điền các trường "_smooth" (ring phải tạo với smoother.ring_dtype()).
+    """
+    decoded, n_bad, index = decode_datagrams([d for d, _ in telemetry], single_field=single_field,
+                                             return_index=True)
+    n = len(decoded)
+    if n == 0:
+        return 0, n_bad
+
+    records = np.empty(n, dtype=ring.dtype)
+    for name in decoded.dtype.names:
+        records[name] = decoded[name]
+    # Sample binary: dùng timestamp gốc của ESP32; CSV cũ: giờ nhận của datagram
+    arrival = np.array([t for _, t in telemetry])[index]
+    records['t'] = arrival
+    has_dev_t = decoded['t_us'] >= 0
+    resets = clock.resets
+    if has_dev_t.any():
+        records['t'][has_dev_t] = clock.to_pc(decoded['t_us'][has_dev_t], arrival[has_dev_t])
+    if clock.resets != resets:
+        # ESP32 vừa khởi động lại → seq cũng bắt đầu lại, kể cả khi chưa lùi đủ WINDOW
+        stats.seq.restart()
+    if smoother is not None:
+        smoother.apply(records)
+    ring.extend(records)
+
+    # Độ trễ đo trên sample CUỐI của mỗi datagram (sample trước đó còn chờ gom batch)
+    last = np.append(index[1:] != index[:-1], True) & has_dev_t
+    seqs = decoded['seq'][decoded['seq'] >= 0]
+    stats.on_datagrams(arrival[last], records['t'][last], seqs if len(seqs) else None)
+    return n, n_bad
+
+
+class TelemetryReceiver:
+    """Thread nền đọc hết socket, giải mã theo loạt và đẩy vào SampleRing"""
+
+    MAX_BATCH = 256
+
+    def __init__(self, sock, ring, on_ack=None, kernel_timestamps=True, single_field=None, smoother=None):
+        self.sock = sock
+        self.ring = ring
+        self.on_ack = on_ack
+        self.single_field = single_field  # gói CSV chỉ có 1 giá trị → trường này
+        self.smoother = smoother          # smoothing.Smoother, chạy trong thread nhận
+        self.kernel_timestamps = kernel_timestamps and enable_kernel_timestamps(sock)
+        self.stats = LinkStats(kernel_timestamps=self.kernel_timestamps)
+        self.packet_count = 0
+        self.bad_packets = 0
+        self.timeouts = 0
+        self.last_addr = None
+        self.last_error = None
+        self.clock = DeviceClock()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _read_batch(self):
+        """recv blocking 1 gói rồi đọc nốt các gói đang chờ → [(data, addr, t_nhận)]"""
+        batch = [recv_timestamped(self.sock, kernel=self.kernel_timestamps)]
+        while len(batch) < self.MAX_BATCH and select.select([self.sock], [], [], 0)[0]:
+            try:
+                batch.append(recv_timestamped(self.sock, kernel=self.kernel_timestamps))
+            except (BlockingIOError, socket.timeout):
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            try:
+                batch = self._read_batch()
+            except socket.timeout:
+                self.timeouts += 1
+                continue
+            except OSError as e:
+                self.last_error = e
+                if not self._running:
+                    break
+                time.sleep(0.01)
+                continue
+
+            self.last_addr = batch[-1][1]
+            telemetry = []
+            for data, addr, arrival in batch:
+                if is_ack(data):
+                    if self.on_ack is not None:
+                        self.on_ack(data.decode(errors='ignore').strip(), addr)
+                else:
+                    telemetry.append((data, arrival))
+            if not telemetry:
+                continue
+
+            n, n_bad = ingest(telemetry, self.ring, self.clock, self.stats, self.single_field,
+                              self.smoother)
+            self.bad_packets += n_bad
+            self.packet_count += n
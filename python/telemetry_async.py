@@ -0,0 +1,278 @@
+"""
+⚡ TELEMETRY ASYNC — Nhận telemetry / gửi lệnh K trên 1 event loop asyncio
+============================================================================
+Thay cho recvfrom() blocking + settimeout + thread nền + cờ toàn cục: 1
+asyncio.DatagramProtocol nhận mọi datagram, tách robot theo địa chỉ nguồn
+(như telemetry_hub) và đánh thức đúng coroutine đang chờ — không vòng poll nào.
+
+    transport, fleet = await open_fleet()          # bind 4210 (relay=True: qua telemetry_relay)
+    robot = await fleet.first_robot()
+    await robot.set_gains(76, 24, 0.16)             # xong khi nhận KACK đúng lệnh này (seq)
+    settle = await robot.wait_settled()             # settle.SettleDetector
+    async for sample in robot.samples():            # từng sample (np.void theo SAMPLE_DTYPE)
+        print(sample['angle'])
+
+Mỗi robot có SampleRing riêng; samples() / batches() đọc theo con trỏ như
+trial_runner nên nhiều coroutine cùng đọc 1 robot không lấy mất dữ liệu của nhau.
+
+Ghi CSV headless: python telemetry_async.py --record log.csv [--gains K1 K2 K3] [--relay]
+"""
+
+import argparse
+import asyncio
+import socket
+import time
+import numpy as np
+from gain_channel import ACK_RETRIES, ACK_TIMEOUT, GainChannel
+from link_stats import LinkStats
+from settle import SettleDetector
+from telemetry import DeviceClock, SampleRing, ingest
+from telemetry_codec import format_command, is_ack
+
+RING_CAPACITY = 1 << 14
+
+
+class AsyncRobot:
+    """1 robot: ring + đồng hồ + thống kê, và các API async gửi lệnh / chờ dữ liệu"""
+
+    def __init__(self, fleet, addr, ring_capacity=RING_CAPACITY):
+        self.fleet = fleet
+        self.addr = addr
+        self.ring = SampleRing(ring_capacity)
+        self.clock = DeviceClock()
+        self.stats = LinkStats()
+        self.packet_count = 0
+        self.bad_packets = 0
+        self.acks = 0
+        self.channel = GainChannel(self.send)
+        self.last_seen = time.time()
+        self._data = fleet.loop.create_future()   # xong khi có sample mới
+        self._ack = fleet.loop.create_future()    # xong khi có KACK
+
+    @property
+    def name(self):
+        return f"{self.addr[0]}:{self.addr[1]}"
+
+    @property
+    def last_ack(self):
+        """Bộ K trong KACK gần nhất ('legacy' nếu firmware cũ chỉ gửi "KACK")"""
+        return self.channel.last_ack
+
+    # ----- từ protocol -----
+    def _on_telemetry(self, telemetry):
+        n, n_bad = ingest(telemetry, self.ring, self.clock, self.stats, self.fleet.single_field)
+        self.packet_count += n
+        self.bad_packets += n_bad
+        if not self._data.done():
+            self._data.set_result(None)
+        self._data = self.fleet.loop.create_future()
+
+    def _on_ack(self, text):
+        self.acks += 1
+        self.channel.on_ack(text)
+        if not self._ack.done():
+            self._ack.set_result(None)
+        self._ack = self.fleet.loop.create_future()
+
+    # ----- API -----
+    async def wait_data(self, timeout=None):
+        """Đợi tới khi có sample mới → False nếu hết timeout"""
+        try:
+            await asyncio.wait_for(asyncio.shield(self._data), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def send(self, text):
+        self.fleet.transport.sendto(text.encode(), self.addr)
+
+    def send_gains(self, k1, k2, k3, k4=None):
+        """Gửi bộ K 1 lần, không chờ ACK → chuỗi đã gửi"""
+        msg = format_command((k1, k2, k3, k4))
+        self.send(msg)
+        return msg
+
+    async def set_gains(self, k1, k2, k3, k4=None, timeout=ACK_TIMEOUT, retries=ACK_RETRIES):
+        """
+        Gửi bộ K qua kênh lệnh (seq) và đợi KACK của đúng lệnh đó (gửi lại sau mỗi timeout
+        giây) → bộ K firmware báo đã áp dụng ('legacy' nếu firmware cũ chỉ gửi "KACK").
+        Hết `retries` lần → asyncio.TimeoutError.
+        """
+        self.channel.ack_timeout = timeout
+        self.channel.retries = retries
+        seq = self.channel.send((k1, k2, k3) if k4 is None else (k1, k2, k3, k4))
+        while True:
+            done = self.channel.result(seq)
+            if done:
+                return self.last_ack
+            if done is False:
+                raise asyncio.TimeoutError(f"{self.name}: không có KACK cho lệnh S={seq}")
+            delay = self.channel.poll()
+            if delay is not None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(self._ack), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def batches(self, start=None):
+        """Async iterator các đoạn sample mới (view của ring); start = chỉ số bắt đầu (mặc định: bây giờ)"""
+        cursor = self.ring.count if start is None else start
+        while True:
+            if self.ring.count <= cursor:
+                await asyncio.shield(self._data)
+            batch, lost = self.ring.read(cursor)
+            cursor += lost + len(batch)
+            if len(batch):
+                yield batch
+
+    async def samples(self, start=None):
+        """Async iterator từng sample (copy, np.void theo SAMPLE_DTYPE)"""
+        async for batch in self.batches(start):
+            for sample in batch.copy():
+                yield sample
+
+    async def wait_settled(self, speed=1.0, **detector_kwargs):
+        """
+        Đợi robot ổn định (SettleDetector, thời gian tính theo giờ robot — robot ảo chạy
+        nhanh `speed` lần) → detector; detector.index = sample đầu tiên sau khi ổn định.
+        """
+        detector = SettleDetector(**detector_kwargs)
+        loop = self.fleet.loop
+        cursor = self.ring.count
+        start = loop.time()
+        start_wall = time.time()
+        last = 0.0
+        while not detector.done:
+            remaining = (detector.timeout - (loop.time() - start) * speed) / speed
+            await self.wait_data(max(remaining, 0.0))
+            now = (loop.time() - start) * speed
+            batch, lost = self.ring.read(cursor)
+            cursor += lost + len(batch)
+            if speed == 1.0:
+                times = batch['t'] - start_wall
+            else:
+                # Robot ảo chạy nhanh: timestamp là giờ robot → rải đều giữa 2 lần đọc
+                times = np.linspace(last, now, len(batch) + 1)[1:]
+            detector.add(times, batch['angle'], now)
+            last = now
+        detector.index = cursor
+        return detector
+
+
+class FleetProtocol(asyncio.DatagramProtocol):
+    """Nhận datagram của mọi robot trên 1 socket, chia cho từng AsyncRobot"""
+
+    def __init__(self, loop, ring_capacity=RING_CAPACITY, single_field=None):
+        self.loop = loop
+        self.ring_capacity = ring_capacity
+        self.single_field = single_field
+        self.transport = None
+        self.robots = {}
+        self._new_robot = loop.create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        robot = self.robots.get(addr)
+        if robot is None:
+            robot = self.robots[addr] = AsyncRobot(self, addr, self.ring_capacity)
+            if not self._new_robot.done():
+                self._new_robot.set_result(robot)
+            self._new_robot = self.loop.create_future()
+        robot.last_seen = time.time()
+        if is_ack(data):
+            robot._on_ack(data.decode(errors='ignore').strip())
+        else:
+            robot._on_telemetry([(data, robot.last_seen)])
+
+    def error_received(self, exc):
+        # Windows: ICMP "port unreachable" của lần gửi trước — bỏ qua như các script cũ
+        pass
+
+    async def first_robot(self, exclude_loopback=False, timeout=None):
+        """Robot đầu tiên gửi tới (exclude_loopback: bỏ qua 127.0.0.1 như AutoTune với robot thật)"""
+        async def find():
+            while True:
+                for robot in list(self.robots.values()):
+                    if not exclude_loopback or robot.addr[0] != '127.0.0.1':
+                        return robot
+                await asyncio.shield(self._new_robot)
+        return await asyncio.wait_for(find(), timeout)
+
+
+async def open_fleet(port=4210, relay=False, ring_capacity=RING_CAPACITY, single_field=None):
+    """Bind cổng telemetry (hoặc nghe telemetry_relay) → (transport, FleetProtocol)"""
+    loop = asyncio.get_running_loop()
+    if relay:
+        from telemetry_relay import RelaySocket
+        sock = RelaySocket()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        sock.bind(("0.0.0.0", port))
+    return await loop.create_datagram_endpoint(
+        lambda: FleetProtocol(loop, ring_capacity, single_field), sock=sock)
+
+
+async def _record(args):
+    transport, fleet = await open_fleet(args.port, relay=args.relay, single_field='angle')
+    try:
+        print(f"⚡ Đợi robot trên {'relay' if args.relay else f':{args.port}'}...")
+        robot = await fleet.first_robot()
+        print(f"🔗 {robot.name}")
+        if args.gains:
+            t0 = time.perf_counter()
+            try:
+                acked = await robot.set_gains(*args.gains)
+                print(f"✅ KACK {acked} sau {(time.perf_counter() - t0) * 1000:.1f}ms")
+            except asyncio.TimeoutError as e:
+                print(f"⚠️ {e}")
+            settle = await robot.wait_settled(speed=args.speed)
+            print(f"⏳ {'ổn định' if settle.settled else 'hết giờ chờ'} sau {settle.elapsed:.2f}s")
+
+        n = 0
+        loop = asyncio.get_running_loop()
+        end = loop.time() + args.duration
+        out = open(args.record, 'w', encoding='utf-8') if args.record else None
+        try:
+            names = robot.ring.dtype.names
+            fmt = ['%.6f' if name == 't' else '%.6g' for name in names]
+            if out:
+                out.write(','.join(names) + '\n')
+            batches = robot.batches()
+            while loop.time() < end:
+                try:
+                    batch = await asyncio.wait_for(anext(batches), end - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                n += len(batch)
+                if out:
+                    np.savetxt(out, batch.tolist(), delimiter=',', fmt=fmt)
+        finally:
+            if out:
+                out.close()
+        print(f"📦 {n} sample trong {args.duration:.0f}s ({n / args.duration:.0f} Hz)"
+              + (f" → {args.record}" if args.record else ""))
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ghi telemetry bằng lõi asyncio")
+    parser.add_argument('--port', type=int, default=4210)
+    parser.add_argument('--relay', action='store_true', help='Nhận qua telemetry_relay.py')
+    parser.add_argument('--gains', type=float, nargs='+', default=None, metavar='K',
+                        help='Gửi K1 K2 K3 [K4], đợi KACK và đợi ổn định trước khi ghi')
+    parser.add_argument('--speed', type=float, default=1.0, help='Hệ số tốc độ của esp32_sim.py')
+    parser.add_argument('--duration', type=float, default=5.0, help='Số giây ghi')
+    parser.add_argument('--record', default=None, help='File CSV')
+    args = parser.parse_args()
+    try:
+        asyncio.run(_record(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+🧩 TELEMETRY CODEC — Giải mã hàng loạt các gói UDP từ ESP32
+============================================================
+Hai định dạng (tự nhận diện theo 2 byte đầu):
+
+1. Binary (mặc định của firmware, TELEMETRY_BINARY=1) — little-endian:
+     header  : magic "RW" | version u8 | count u8                  (4 byte)
+     sample  : seq u32 | t_us u32 | angle_err f32 | robot_angle f32
+               | motor_speed i32 | pwm i16 | reserved u16          (24 byte)
+   Giải mã bằng np.frombuffer → view trực tiếp trên datagram, không copy.
+
+2. CSV cũ "ae,pwm,robot_angle" — decode_csv_batch() parse cả loạt trong 1 lần gọi.
+
+Gói lỗi chỉ bị ĐẾM, không raise.
+"""
+
+import struct
+from itertools import compress, groupby
+import numpy as np
+
+# Thứ tự cột giống firmware: ae, pwm, robot_angle
+CSV_DTYPE = np.dtype([
+    ('angle_err', 'f4'),
+    ('pwm', 'f4'),
+    ('angle', 'f4'),
+])
+
+# Test3Truc nhận "x,y,z" (góc 3 trục)
+XYZ_DTYPE = np.dtype([
+    ('x', 'f4'),
+    ('y', 'f4'),
+    ('z', 'f4'),
+])
+
+
+# ========== BINARY FRAME ==========
+FRAME_MAGIC = b"RW"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<2sBB")  # magic, version, count
+
+# Layout 1 sample trong frame (khớp struct TelemetrySample trong function.ino)
+FRAME_SAMPLE_DTYPE = np.dtype([
+    ('seq', '<u4'),
+    ('t_us', '<u4'),
+    ('angle_err', '<f4'),
+    ('angle', '<f4'),
+    ('motor_speed', '<i4'),
+    ('pwm', '<i2'),
+    ('reserved', '<u2'),
+])
+
+# Dạng chung sau khi giải mã (CSV cũ: seq = t_us = -1, motor_speed = NaN)
+TELEMETRY_DTYPE = np.dtype([
+    ('seq', 'i8'),
+    ('t_us', 'i8'),
+    ('angle_err', 'f4'),
+    ('pwm', 'f4'),
+    ('angle', 'f4'),
+    ('motor_speed', 'f4'),
+])
+
+
+def is_ack(datagram):
+    """Gói xác nhận hệ số từ ESP32 ("KACK...")"""
+    return datagram[:4] == b"KACK"
+
+
+def format_command(gains, seq=None, ramp_ms=None):
+    """
+    Lệnh K PC gửi: "K1=..,K2=..,K3=..[,K4=..][,R=ms][,S=seq]" (K4 = None / thiếu → giữ K4 của firmware).
+    R: firmware chuyển dần sang bộ K mới trong R ms. R, S đặt sau các K: firmware cũ
+    đọc K bằng toFloat() nên bỏ qua phần phía sau (và đổi K ngay, không ramp).
+    """
+    msg = "K1={:.2f},K2={:.2f},K3={:.2f}".format(*gains[:3])
+    if len(gains) > 3 and gains[3] is not None:
+        msg += ",K4={:.2f}".format(gains[3])
+    if ramp_ms:
+        msg += ",R={}".format(int(ramp_ms))
+    if seq is not None:
+        msg += ",S={}".format(seq)
+    return msg
+
+
+def format_ack(gains, seq=None, build=None):
+    """
+    Chuỗi ACK firmware gửi lại sau khi áp dụng bộ K (X1..X4).
+    Lệnh có S → ACK kèm S = số thứ tự của lệnh MỚI NHẤT đã áp dụng.
+    B = mã bản build firmware (số nguyên, để mọi trường vẫn đọc được bằng float như bản cũ).
+    """
+    tag = "" if seq is None else "S={},".format(seq)
+    msg = "KACK {}K1={:.2f},K2={:.2f},K3={:.2f},K4={:.2f}".format(tag, *gains)
+    if build is not None:
+        msg += ",B={}".format(int(build))
+    return msg
+
+
+def _ack_fields(datagram):
+    """Phần sau "KACK" → dict trường; None nếu trống ("KACK" cũ) hoặc hỏng"""
+    text = datagram[4:]
+    if isinstance(text, bytes):
+        text = text.decode(errors='ignore')
+    text = text.strip()
+    if not text:
+        return None
+    fields = {}
+    for part in text.split(','):
+        key, _, value = part.partition('=')
+        try:
+            fields[key.strip()] = float(value)
+        except ValueError:
+            return None
+    return fields
+
+
+def parse_ack(datagram):
+    """
+    "KACK [S=..,]K1=..,K2=..,K3=..,K4=..[,B=..]" → (K1, K2, K3, K4).
+    Firmware cũ chỉ gửi "KACK" (không kèm bộ K) → None. Nhận cả bytes lẫn str.
+    """
+    fields = _ack_fields(datagram)
+    if fields is None:
+        return None
+    try:
+        return tuple(fields[k] for k in ('K1', 'K2', 'K3', 'K4'))
+    except KeyError:
+        return None
+
+
+def parse_ack_seq(datagram):
+    """Số thứ tự lệnh trong ACK ("S=..") → int; firmware chưa hỗ trợ S → None"""
+    fields = _ack_fields(datagram)
+    if fields is None or 'S' not in fields:
+        return None
+    return int(fields['S'])
+
+
+def parse_ack_build(datagram):
+    """Mã bản build firmware trong ACK ("B=..") → int; firmware chưa báo B → None"""
+    fields = _ack_fields(datagram)
+    if fields is None or 'B' not in fields:
+        return None
+    return int(fields['B'])
+
+
+def ack_matches(acked, gains, tol=0.006):
+    """Bộ K trong ACK có đúng là bộ đã gửi không (lệnh gửi làm tròn 2 chữ số)"""
+    return all(abs(a - g) <= tol for a, g in zip(acked, gains))
+
+
+def is_binary(datagram):
+    """Frame binary bắt đầu bằng magic "RW" (CSV luôn bắt đầu bằng số hoặc dấu -)"""
+    return datagram[:2] == FRAME_MAGIC
+
+
+def decode_frame(datagram):
+    """
+    Frame binary → view FRAME_SAMPLE_DTYPE trỏ thẳng vào bộ nhớ của datagram (không copy).
+    Trả về None nếu sai magic/version hoặc độ dài không khớp count.
+    """
+    if len(datagram) < FRAME_HEADER.size:
+        return None
+    magic, version, count = FRAME_HEADER.unpack_from(datagram)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        return None
+    if len(datagram) != FRAME_HEADER.size + count * FRAME_SAMPLE_DTYPE.itemsize:
+        return None
+    return np.frombuffer(datagram, dtype=FRAME_SAMPLE_DTYPE, count=count, offset=FRAME_HEADER.size)
+
+
+def encode_frame(samples):
+    """Đóng gói mảng FRAME_SAMPLE_DTYPE thành 1 datagram (dùng cho giả lập / test)"""
+    samples = np.asarray(samples, dtype=FRAME_SAMPLE_DTYPE)
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(samples)) + samples.tobytes()
+
+
+def decode_datagrams(datagrams, single_field=None, return_index=False):
+    """
+    Giải mã 1 loạt datagram, tự nhận diện binary / CSV → (records TELEMETRY_DTYPE, n_bad).
+    Giữ nguyên thứ tự đến; các gói KACK phải được lọc trước.
+    `single_field` được chuyển cho decode_csv_batch() (gói CSV chỉ có 1 giá trị).
+    return_index=True: trả thêm mảng index datagram nguồn của từng record.
+    """
+    parts = []
+    indices = []
+    n_bad = 0
+    base = 0
+    for binary, run in groupby(datagrams, key=is_binary):
+        run = list(run)
+        if binary:
+            frames = [(i, f) for i, f in enumerate(map(decode_frame, run)) if f is not None]
+            n_bad += len(run) - len(frames)
+            if frames:
+                raw = frames[0][1] if len(frames) == 1 else np.concatenate([f for _, f in frames])
+                records = np.empty(len(raw), dtype=TELEMETRY_DTYPE)
+                for name in ('seq', 't_us', 'angle_err', 'pwm', 'angle', 'motor_speed'):
+                    records[name] = raw[name]
+                parts.append(records)
+                indices.append(np.repeat([base + i for i, _ in frames], [len(f) for _, f in frames]))
+        else:
+            csv, bad, keep = decode_csv_batch(run, single_field=single_field, return_mask=True)
+            n_bad += bad
+            records = np.empty(len(csv), dtype=TELEMETRY_DTYPE)
+            records['seq'] = -1
+            records['t_us'] = -1
+            records['motor_speed'] = np.nan
+            for name in CSV_DTYPE.names:
+                records[name] = csv[name]
+            parts.append(records)
+            indices.append(base + np.flatnonzero(keep))
+        base += len(run)
+
+    if not parts:
+        records = np.zeros(0, dtype=TELEMETRY_DTYPE)
+        index = np.zeros(0, dtype=np.intp)
+    elif len(parts) == 1:
+        records, index = parts[0], indices[0]
+    else:
+        records, index = np.concatenate(parts), np.concatenate(indices)
+    if return_index:
+        return records, n_bad, index
+    return records, n_bad
+
+
+def decode_csv_batch(datagrams, dtype=CSV_DTYPE, single_field=None, return_mask=False):
+    """
+    Giải mã 1 loạt datagram CSV (bytes) → (records, n_bad)
+
+    - Dòng có đúng số cột của dtype → nhận.
+    - Dòng chỉ có 1 giá trị → ghi vào trường `single_field` (các trường khác = NaN),
+      nếu single_field=None thì tính là lỗi.
+    - Dòng sai số cột / không phải số → bỏ qua và đếm vào n_bad.
+    return_mask=True: trả thêm mảng bool đánh dấu datagram nào được nhận.
+    """
+    records, keep = _decode_csv(datagrams, np.dtype(dtype), single_field)
+    n_bad = len(keep) - len(records)
+    if return_mask:
+        return records, n_bad, np.array(keep, dtype=bool)
+    return records, n_bad
+
+
+def _decode_csv(datagrams, dtype, single_field):
+    """→ (records, keep): keep[i] = True nếu datagram i được nhận (list, chỉ đổi sang mảng khi cần)"""
+    ncols = len(dtype.names)
+    n = len(datagrams)
+    if n == 0:
+        return np.zeros(0, dtype=dtype), []
+
+    # Đếm số cột của MỌI dòng bằng bytes.count() (C, không tốn chi phí gọi NumPy),
+    # rồi parse mọi dòng đủ cột trong 1 lần gọi
+    good = [data.count(b",") == ncols - 1 for data in datagrams]
+    if all(good):
+        records = _parse_rows(datagrams, dtype)
+        if records is not None:
+            return records, good
+    elif single_field is None:
+        # Chỉ giữ các dòng đủ cột rồi parse theo loạt
+        records = _parse_rows(list(compress(datagrams, good)), dtype)
+        if records is not None:
+            return records, good
+
+    # Đường chậm: token không phải số, hoặc gói 1 giá trị → parse từng dòng vào mảng cấp sẵn
+    records = np.empty(n, dtype=dtype)
+    keep = [False] * n
+    count = 0
+    single = None
+    if single_field is not None:
+        single = dtype.names.index(single_field)
+    for i, data in enumerate(datagrams):
+        parts = data.split(b",")
+        try:
+            if len(parts) == ncols:
+                records[count] = tuple(map(float, parts))
+            elif len(parts) == 1 and single is not None:
+                row = [np.nan] * ncols
+                row[single] = float(parts[0])
+                records[count] = tuple(row)
+            else:
+                continue
+        except ValueError:
+            continue
+        keep[i] = True
+        count += 1
+
+    return records[:count], keep
+
+
+def _parse_rows(rows, dtype):
+    """Parse các dòng đã biết đủ cột trong 1 lần gọi; None nếu có token không phải số"""
+    ncols = len(dtype.names)
+    if not rows:
+        return np.zeros(0, dtype=dtype)
+    ftype = _field_type(dtype)
+    try:
+        values = np.array(b",".join(rows).split(b","), dtype=ftype)
+    except ValueError:
+        return None
+    if ftype.itemsize * ncols == dtype.itemsize:
+        return values.view(dtype)  # các trường cùng kiểu, liền nhau → view 1 lần, không copy
+    return _to_records(values.reshape(len(rows), ncols), dtype)
+
+
+def _field_type(dtype):
+    """Kiểu chung của các trường nếu tất cả giống nhau, ngược lại float64 (nhớ theo dtype)"""
+    ftype = _FIELD_TYPES.get(dtype)
+    if ftype is None:
+        types = {dtype.fields[name][0] for name in dtype.names}
+        ftype = _FIELD_TYPES[dtype] = types.pop() if len(types) == 1 else np.dtype(np.float64)
+    return ftype
+
+
+_FIELD_TYPES = {}
+
+
+def _to_records(values, dtype):
+    """Mảng (n, ncols) → structured array; dùng view nếu layout khớp (không copy)"""
+    if values.dtype.itemsize * values.shape[1] == dtype.itemsize and _field_type(dtype) == values.dtype:
+        return values.view(dtype).reshape(-1)
+    records = np.empty(len(values), dtype=dtype)
+    for j, name in enumerate(dtype.names):
+        records[name] = values[:, j]
+    return records
@@ -0,0 +1,210 @@
+"""
+🛰️ TELEMETRY HUB — 1 socket, nhiều robot
+==========================================
+Cả đội robot cùng gửi về PC:4210. Hub tách datagram theo địa chỉ nguồn (ip, port)
+thành từng RobotLink riêng:
+- ring (SampleRing) + DeviceClock + LinkStats riêng cho mỗi robot
+- gửi lệnh K đúng robot đó (send_gains), đếm KACK
+- robot mới tự được thêm khi gói đầu tiên tới (on_new_robot)
+
+Chỉ 1 thread + 1 selector (epoll / kqueue / select tùy hệ điều hành) cho mọi
+socket và mọi robot: mỗi lần thức dậy đọc hết gói đang chờ, gom theo robot rồi
+giải mã cả loạt (telemetry.ingest) → hàng chục robot x 200 Hz vẫn nhẹ.
+
+Theo dõi headless:
+    python esp32_sim.py --robots 8
+    python telemetry_hub.py [--port 4210]
+"""
+
+import argparse
+import selectors
+import socket
+import threading
+import time
+from link_stats import LinkStats, enable_kernel_timestamps, format_stats, recv_timestamped
+from telemetry import DeviceClock, SampleRing, ingest
+from telemetry_codec import format_command, is_ack
+
+# Mỗi robot: 2^14 sample ≈ 80 s ở 200 Hz
+RING_CAPACITY = 1 << 14
+
+# Số datagram tối đa đọc mỗi lần thức dậy (chia đều thời gian cho các socket)
+MAX_BATCH = 1024
+
+
+class RobotLink:
+    """1 robot trong hub: dữ liệu nhận được và kênh gửi lệnh về đúng địa chỉ của nó"""
+
+    def __init__(self, sock, addr, ring_capacity=RING_CAPACITY, kernel_timestamps=False):
+        self.sock = sock
+        self.addr = addr
+        self.ring = SampleRing(ring_capacity)
+        self.clock = DeviceClock()
+        self.stats = LinkStats(kernel_timestamps=kernel_timestamps)
+        self.packet_count = 0
+        self.bad_packets = 0
+        self.acks = 0
+        self.first_seen = time.time()
+        self.last_seen = self.first_seen
+        self.on_ack = None  # on_ack(text, addr) riêng robot này (giống TelemetryReceiver)
+
+    @property
+    def name(self):
+        return f"{self.addr[0]}:{self.addr[1]}"
+
+    def send(self, text):
+        self.sock.sendto(text.encode(), self.addr)
+
+    def send_gains(self, k1, k2, k3, k4=None, seq=None):
+        """
+        Gửi bộ K 1 lần, không chờ ACK (K4 = None → giữ K4 hiện tại của firmware) → chuỗi đã gửi.
+        Cần chắc chắn robot đã nhận: gain_channel.GainChannel(robot.send).
+        """
+        msg = format_command((k1, k2, k3, k4), seq)
+        self.send(msg)
+        return msg
+
+    def snapshot(self):
+        """LinkStats.snapshot() + bộ đếm riêng của robot"""
+        stats = self.stats.snapshot()
+        stats.update(robot=self.name, samples=self.ring.count, bad_packets=self.bad_packets,
+                     acks=self.acks, silent_s=time.time() - self.last_seen)
+        return stats
+
+
+class TelemetryHub:
+    """Thread nền đọc mọi socket bằng 1 selector, chia dữ liệu cho từng RobotLink"""
+
+    def __init__(self, socks, ring_capacity=RING_CAPACITY, kernel_timestamps=True,
+                 single_field=None, on_new_robot=None, on_ack=None):
+        """
+        socks       : 1 socket UDP đã bind (hoặc danh sách nhiều socket)
+        on_new_robot: on_new_robot(robot) khi thấy địa chỉ nguồn mới (từ thread của hub)
+        on_ack      : on_ack(robot, text) cho mọi KACK, trước on_ack riêng của robot
+        """
+        if isinstance(socks, socket.socket):
+            socks = [socks]
+        self.ring_capacity = ring_capacity
+        self.single_field = single_field
+        self.on_new_robot = on_new_robot
+        self.on_ack = on_ack
+        self.robots = {}  # (ip, port) → RobotLink; chỉ thread của hub thêm vào
+        self.last_error = None
+        self._selector = selectors.DefaultSelector()
+        for sock in socks:
+            sock.setblocking(False)
+            kernel = kernel_timestamps and enable_kernel_timestamps(sock)
+            self._selector.register(sock, selectors.EVENT_READ, kernel)
+        # stop() đánh thức select() ngay thay vì đợi hết timeout
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._running = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self.robots)
+
+    def robot(self, addr):
+        """RobotLink theo (ip, port), hoặc theo ip nếu chỉ 1 robot có ip đó; không thấy → None"""
+        if isinstance(addr, tuple):
+            return self.robots.get(addr)
+        matches = [r for r in list(self.robots.values()) if r.addr[0] == addr]
+        return matches[0] if len(matches) == 1 else None
+
+    def wait_for_robots(self, n=1, timeout=None):
+        """Đợi tới khi thấy ít nhất n robot (hoặc hết timeout) → danh sách RobotLink"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while len(self.robots) < n and (deadline is None or time.perf_counter() < deadline):
+            time.sleep(0.05)
+        return list(self.robots.values())
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._wake_w.send(b'\0')
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while self._running:
+            for key, _ in self._selector.select(timeout=0.5):
+                if key.fileobj is self._wake_r:
+                    self._wake_r.recv(64)
+                    continue
+                self._read(key.fileobj, key.data)
+
+    def _read(self, sock, kernel):
+        """Đọc hết gói đang chờ trên 1 socket, gom theo địa chỉ nguồn rồi xử lý từng robot"""
+        by_addr = {}
+        for _ in range(MAX_BATCH):
+            try:
+                data, addr, arrival = recv_timestamped(sock, kernel=kernel)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                # Windows: ICMP "port unreachable" của lần gửi trước → ConnectionResetError
+                self.last_error = e
+                break
+            by_addr.setdefault(addr, []).append((data, arrival))
+
+        for addr, batch in by_addr.items():
+            robot = self.robots.get(addr)
+            if robot is None:
+                robot = RobotLink(sock, addr, self.ring_capacity, kernel)
+                self.robots[addr] = robot
+                if self.on_new_robot is not None:
+                    self.on_new_robot(robot)
+            robot.last_seen = batch[-1][1]
+
+            telemetry = []
+            for data, arrival in batch:
+                if is_ack(data):
+                    robot.acks += 1
+                    text = data.decode(errors='ignore').strip()
+                    if self.on_ack is not None:
+                        self.on_ack(robot, text)
+                    if robot.on_ack is not None:
+                        robot.on_ack(text, addr)
+                else:
+                    telemetry.append((data, arrival))
+            if telemetry:
+                n, n_bad = ingest(telemetry, robot.ring, robot.clock, robot.stats, self.single_field)
+                robot.packet_count += n
+                robot.bad_packets += n_bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nhận telemetry của nhiều robot trên 1 cổng UDP")
+    parser.add_argument('--port', type=int, default=4210)
+    parser.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    sock.bind(("0.0.0.0", args.port))
+    hub = TelemetryHub(sock, on_new_robot=lambda r: print(f"🔗 Robot mới: {r.name}")).start()
+    print(f"🛰️ Hub nghe UDP :{args.port}")
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            robots = sorted(hub.robots.values(), key=lambda r: r.addr)
+            total = sum(r.ring.count for r in robots)
+            print(f"\n📦 {len(robots)} robot | {total} sample")
+            for r in robots:
+                stats = r.snapshot()
+                print(f"   {r.name:<21} {stats['samples']:>8} sample | {format_stats(stats)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hub.stop()
+
+
+if __name__ == "__main__":
+    main()
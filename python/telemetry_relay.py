@@ -0,0 +1,426 @@
+"""
+📡 TELEMETRY RELAY — 1 tiến trình giữ cổng 4210, nhiều chương trình cùng xem
+==============================================================================
+Chỉ 1 tiến trình bind được UDP 4210 → GuiK_V2_OK, AutoTune_PID và bộ ghi log
+không chạy cùng lúc được. Relay giữ socket của robot và phát lại MỌI datagram
+(telemetry + KACK, nguyên byte, kèm địa chỉ robot gốc) cho các subscriber:
+
+- UDP multicast trên loopback (MCAST_GROUP:MCAST_PORT): RelaySocket() dùng thay
+  cho socket bind 4210 — recvfrom()/sendto() y như nói chuyện thẳng với robot.
+  Mỗi subscriber có buffer kernel riêng: đọc chậm thì chỉ mình nó mất gói.
+- Unix socket (--unix PATH) và WebSocket (--ws PORT, cho trình duyệt): mỗi
+  subscriber 1 hàng đợi giới hạn `queue_limit` frame + chính sách khi đầy:
+    'oldest'    : bỏ frame cũ nhất (mặc định — đồ thị chỉ cần dữ liệu mới)
+    'newest'    : bỏ frame mới tới (bộ ghi log muốn liền mạch tới lúc đầy)
+    'disconnect': ngắt subscriber đó
+  Socket không block: subscriber chậm không bao giờ làm trễ relay / subscriber khác.
+
+Lệnh K từ subscriber (sendto của RelaySocket tới cổng COMMAND_PORT, hoặc frame
+gửi lên qua Unix / WebSocket) được chuyển tới đúng robot trong header.
+
+Định dạng: HEADER (4 byte IPv4 + u16 cổng robot) + datagram gốc. Unix stream
+thêm u16 độ dài phía trước mỗi frame; WebSocket: 1 frame binary / datagram.
+
+Cách dùng:
+    python telemetry_relay.py [--unix /tmp/robot.sock] [--ws 8765]
+    python GuiK_V2_OK.py            # USE_RELAY = True
+    python AutoTune_PID.py --relay
+    python link_stats.py --relay
+"""
+
+import argparse
+import base64
+import collections
+import hashlib
+import os
+import selectors
+import socket
+import struct
+import time
+
+MCAST_GROUP = '239.255.42.10'
+MCAST_PORT = 4220
+COMMAND_PORT = 4219          # 127.0.0.1: subscriber gửi lệnh K lên relay
+HEADER = struct.Struct('!4sH')
+LENGTH = struct.Struct('!H')
+
+QUEUE_LIMIT = 512            # frame chờ gửi tối đa mỗi subscriber stream
+DROP_POLICIES = ('oldest', 'newest', 'disconnect')
+SEND_CHUNK = 1 << 16         # gom frame thành từng khối ≤ 64KB cho mỗi send()
+
+_WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def pack_header(addr):
+    return HEADER.pack(socket.inet_aton(addr[0]), addr[1])
+
+
+def unpack_header(data):
+    """→ (addr robot, datagram gốc)"""
+    ip, port = HEADER.unpack_from(data)
+    return (socket.inet_ntoa(ip), port), data[HEADER.size:]
+
+
+class RelaySocket(socket.socket):
+    """
+    Socket nhận luồng multicast của relay, dùng thay cho socket bind 4210:
+    recvfrom() / recvmsg() trả về datagram gốc + địa chỉ robot, sendto(data, addr robot)
+    gửi lệnh qua relay → TelemetryReceiver / TelemetryHub dùng nguyên như cũ.
+    """
+
+    def __init__(self, group=MCAST_GROUP, port=MCAST_PORT, command_addr=('127.0.0.1', COMMAND_PORT)):
+        super().__init__(socket.AF_INET, socket.SOCK_DGRAM)
+        self.command_addr = command_addr
+        self.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.bind(('', port))
+        self.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                        socket.inet_aton(group) + socket.inet_aton('127.0.0.1'))
+
+    def recvfrom(self, bufsize, flags=0):
+        data, _ = super().recvfrom(bufsize + HEADER.size, flags)
+        addr, data = unpack_header(data)
+        return data, addr
+
+    def recvmsg(self, bufsize, ancbufsize=0, flags=0):
+        data, ancdata, msg_flags, _ = super().recvmsg(bufsize + HEADER.size, ancbufsize, flags)
+        addr, data = unpack_header(data)
+        return data, ancdata, msg_flags, addr
+
+    def sendto(self, data, addr):
+        return super().sendto(pack_header(addr) + data, self.command_addr)
+
+
+class Subscriber:
+    """1 subscriber stream (Unix / WebSocket): hàng đợi giới hạn + chính sách bỏ frame"""
+
+    def __init__(self, sock, kind, queue_limit=QUEUE_LIMIT, drop_policy='oldest'):
+        self.sock = sock
+        self.kind = kind                # 'unix' | 'ws'
+        self.queue = collections.deque()
+        self.queue_limit = queue_limit
+        self.drop_policy = drop_policy
+        self.handshake_done = kind != 'ws'
+        self.inbox = b''                # dữ liệu nhận chưa xử lý (handshake / frame lệnh)
+        self.outbuf = b''               # đang gửi dở
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self.name = f"{kind}#{sock.fileno()}"
+
+    def enqueue(self, frame):
+        if len(self.queue) >= self.queue_limit:
+            self.dropped += 1
+            if self.drop_policy == 'newest':
+                return
+            if self.drop_policy == 'disconnect':
+                self.closed = True
+                return
+            self.queue.popleft()
+        self.queue.append(frame)
+
+    def flush(self):
+        """Gửi không block tới khi hết hàng đợi hoặc socket đầy → True nếu còn dữ liệu chờ"""
+        while not self.closed:
+            if not self.outbuf:
+                if not self.queue:
+                    return False
+                chunks, size = [], 0
+                while self.queue and size < SEND_CHUNK:
+                    frame = self.queue.popleft()
+                    chunks.append(frame)
+                    size += len(frame)
+                self.sent += len(chunks)
+                self.outbuf = b''.join(chunks)
+            try:
+                n = self.sock.send(self.outbuf)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                self.closed = True
+                return False
+            self.outbuf = self.outbuf[n:]
+        return False
+
+
+def _ws_frame(payload, opcode=0x2):
+    n = len(payload)
+    if n < 126:
+        head = struct.pack('!BB', 0x80 | opcode, n)
+    elif n < 1 << 16:
+        head = struct.pack('!BBH', 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+    return head + payload
+
+
+def _ws_parse(buf):
+    """Tách 1 frame client (có mask) → (opcode, payload, số byte đã dùng) hoặc None nếu chưa đủ"""
+    if len(buf) < 2:
+        return None
+    opcode, n = buf[0] & 0x0F, buf[1] & 0x7F
+    pos = 2
+    if n == 126:
+        if len(buf) < 4:
+            return None
+        n, pos = struct.unpack_from('!H', buf, 2)[0], 4
+    elif n == 127:
+        if len(buf) < 10:
+            return None
+        n, pos = struct.unpack_from('!Q', buf, 2)[0], 10
+    masked = buf[1] & 0x80
+    if len(buf) < pos + (4 if masked else 0) + n:
+        return None
+    if masked:
+        mask = buf[pos:pos + 4]
+        pos += 4
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(buf[pos:pos + n]))
+    else:
+        payload = buf[pos:pos + n]
+    return opcode, payload, pos + n
+
+
+class TelemetryRelay:
+    """Vòng selector 1 thread: robot → mọi subscriber, lệnh của subscriber → robot"""
+
+    def __init__(self, robot_sock, multicast=(MCAST_GROUP, MCAST_PORT), command_port=COMMAND_PORT,
+                 unix_path=None, ws_port=None, queue_limit=QUEUE_LIMIT, drop_policy='oldest'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy phải là 1 trong {DROP_POLICIES}")
+        self.robot_sock = robot_sock
+        self.queue_limit = queue_limit
+        self.drop_policy = drop_policy
+        self.subscribers = []
+        self.forwarded = 0
+        self.commands = 0
+        self.last_robot = None      # lệnh không ghi địa chỉ (0.0.0.0:0) → robot gửi gần nhất
+        self.unix_path = unix_path
+        self._selector = selectors.DefaultSelector()
+        self._running = False
+
+        robot_sock.setblocking(False)
+        self._selector.register(robot_sock, selectors.EVENT_READ, 'robot')
+
+        self.multicast = multicast
+        self._mcast = None
+        if multicast is not None:
+            self._mcast = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._mcast.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton('127.0.0.1'))
+            self._mcast.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            self._mcast.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            self._mcast.setblocking(False)
+
+        self._command = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._command.bind(('127.0.0.1', command_port))
+        self._command.setblocking(False)
+        self._selector.register(self._command, selectors.EVENT_READ, 'command')
+
+        if unix_path is not None:
+            if not hasattr(socket, 'AF_UNIX'):
+                raise RuntimeError("Hệ điều hành này không có Unix socket — dùng multicast / WebSocket")
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(unix_path)
+            listener.listen()
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ, 'unix')
+        if ws_port is not None:
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(('127.0.0.1', ws_port))
+            listener.listen()
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ, 'ws')
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        """Chạy vòng selector tới khi stop() (gọi từ thread khác) hoặc Ctrl+C"""
+        self._running = True
+        try:
+            while self._running:
+                for key, events in self._selector.select(timeout=0.2):
+                    tag = key.data
+                    if tag == 'robot':
+                        self._from_robot()
+                    elif tag == 'command':
+                        self._from_command_port()
+                    elif tag in ('unix', 'ws'):
+                        self._accept(key.fileobj, tag)
+                    else:
+                        if events & selectors.EVENT_READ:
+                            self._from_subscriber(tag)
+                        if events & selectors.EVENT_WRITE:
+                            self._flush(tag)
+        finally:
+            if self.unix_path is not None and os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+
+    # ----- robot → subscriber -----
+    def _from_robot(self):
+        frames = []
+        while len(frames) < 1024:
+            try:
+                data, addr = self.robot_sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # Windows: ICMP "port unreachable" của lần gửi trước
+                break
+            self.last_robot = addr
+            frames.append(pack_header(addr) + data)
+        if not frames:
+            return
+        self.forwarded += len(frames)
+
+        if self._mcast is not None:
+            for frame in frames:
+                try:
+                    self._mcast.sendto(frame, self.multicast)
+                except OSError:
+                    pass
+        for sub in list(self.subscribers):
+            if not sub.handshake_done:
+                continue
+            for frame in frames:
+                sub.enqueue(_ws_frame(frame) if sub.kind == 'ws' else LENGTH.pack(len(frame)) + frame)
+            self._flush(sub)
+
+    def _flush(self, sub):
+        more = sub.flush()
+        if sub.closed:
+            self._drop(sub)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if more else 0)
+        if self._selector.get_key(sub.sock).events != events:
+            self._selector.modify(sub.sock, events, sub)
+
+    # ----- subscriber → robot -----
+    def _send_command(self, frame):
+        if len(frame) <= HEADER.size:
+            return
+        addr, data = unpack_header(frame)
+        if addr == ('0.0.0.0', 0):
+            addr = self.last_robot
+        if addr is None:
+            return
+        try:
+            self.robot_sock.sendto(data, addr)
+            self.commands += 1
+        except OSError:
+            pass
+
+    def _from_command_port(self):
+        while True:
+            try:
+                frame, _ = self._command.recvfrom(2048)
+            except (BlockingIOError, InterruptedError, ConnectionResetError):
+                return
+            self._send_command(frame)
+
+    def _accept(self, listener, kind):
+        try:
+            conn, _ = listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setblocking(False)
+        sub = Subscriber(conn, kind, self.queue_limit, self.drop_policy)
+        self.subscribers.append(sub)
+        self._selector.register(conn, selectors.EVENT_READ, sub)
+        print(f"➕ Subscriber {sub.name}")
+
+    def _from_subscriber(self, sub):
+        try:
+            data = sub.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(sub)
+            return
+        sub.inbox += data
+        if not sub.handshake_done:
+            self._ws_handshake(sub)
+        elif sub.kind == 'ws':
+            while (frame := _ws_parse(sub.inbox)) is not None:
+                opcode, payload, used = frame
+                sub.inbox = sub.inbox[used:]
+                if opcode == 0x8:
+                    self._drop(sub)
+                    return
+                if opcode in (0x1, 0x2):
+                    self._send_command(payload)
+        else:
+            while len(sub.inbox) >= LENGTH.size:
+                n = LENGTH.unpack_from(sub.inbox)[0]
+                if len(sub.inbox) < LENGTH.size + n:
+                    break
+                self._send_command(sub.inbox[LENGTH.size:LENGTH.size + n])
+                sub.inbox = sub.inbox[LENGTH.size + n:]
+
+    def _ws_handshake(self, sub):
+        if b'\r\n\r\n' not in sub.inbox:
+            return
+        head, _, sub.inbox = sub.inbox.partition(b'\r\n\r\n')
+        key = None
+        for line in head.split(b'\r\n')[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'sec-websocket-key':
+                key = value.strip()
+        if key is None:
+            self._drop(sub)
+            return
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest())
+        sub.queue.append(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                         b'Connection: Upgrade\r\nSec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        sub.handshake_done = True
+        self._flush(sub)
+
+    def _drop(self, sub):
+        if sub in self.subscribers:
+            self.subscribers.remove(sub)
+            self._selector.unregister(sub.sock)
+            sub.sock.close()
+            print(f"➖ Subscriber {sub.name} (đã gửi {sub.sent}, bỏ {sub.dropped} frame)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Giữ cổng UDP của robot, phát lại cho nhiều chương trình")
+    parser.add_argument('--port', type=int, default=4210, help='Cổng robot gửi tới (udpPort)')
+    parser.add_argument('--unix', default=None, help='Đường dẫn Unix socket cho subscriber stream')
+    parser.add_argument('--ws', type=int, default=None, help='Cổng WebSocket (127.0.0.1) cho trình duyệt')
+    parser.add_argument('--queue', type=int, default=QUEUE_LIMIT, help='Frame chờ tối đa mỗi subscriber stream')
+    parser.add_argument('--drop', choices=DROP_POLICIES, default='oldest', help='Khi hàng đợi subscriber đầy')
+    parser.add_argument('--no-multicast', action='store_true')
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    sock.bind(("0.0.0.0", args.port))
+    relay = TelemetryRelay(sock, multicast=None if args.no_multicast else (MCAST_GROUP, MCAST_PORT),
+                           unix_path=args.unix, ws_port=args.ws, queue_limit=args.queue, drop_policy=args.drop)
+    outputs = [] if args.no_multicast else [f"multicast {MCAST_GROUP}:{MCAST_PORT}"]
+    if args.unix:
+        outputs.append(f"unix {args.unix}")
+    if args.ws:
+        outputs.append(f"ws://127.0.0.1:{args.ws}")
+    print(f"📡 Relay :{args.port} → {', '.join(outputs)} | lệnh K ← 127.0.0.1:{COMMAND_PORT}")
+
+    t0 = time.perf_counter()
+    try:
+        relay.run()
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - t0
+    print(f"\n✅ {relay.forwarded} datagram trong {elapsed:.1f}s | {relay.commands} lệnh K")
+    for sub in relay.subscribers:
+        print(f"   {sub.name}: gửi {sub.sent}, bỏ {sub.dropped}")
+
+
+if __name__ == "__main__":
+    main()
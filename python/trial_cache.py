@@ -0,0 +1,130 @@
+"""
+💾 TRIAL CACHE — Lưu kết quả các lần thử bộ K xuống đĩa
+=========================================================
+Khóa = (robot, phiên bản firmware, bộ K đã lượng tử hóa theo QUANTUM):
+2 bộ K khác nhau ít hơn 1 bước lượng tử coi là 1 (robot không phân biệt được
+trong sai số đo), robot khác / firmware khác thì đo lại từ đầu.
+
+- get(): kết quả còn mới (chưa quá max_age giây) → trả lời ngay, khỏi đo lại;
+  mục của lần thử dừng sớm (stats['stopped'], điểm ngoại suy) bị bỏ qua
+- put(): ghi score + tóm tắt số liệu thô + thời điểm; quá max_entries thì bỏ
+  mục lâu không dùng nhất (LRU)
+- history(): các kết quả còn mới của 1 robot → warm-start optimizer (tối đa
+  HISTORY_LIMIT mục: GP của optimizer Bayes tốn O(n³) mỗi lần đề xuất)
+
+File JSON ghi nguyên tử (file tạm + os.replace) → tắt ngang không hỏng cache.
+
+    cache = TrialCache()
+    hit = cache.get(k, robot, firmware)
+    if hit is None:
+        cache.put(k, robot, firmware, score, stats={'mean_abs': ...})
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trial_cache.json')
+
+# Bước lượng tử K1, K2, K3, K4 (firmware nhận K với 2 chữ số thập phân)
+QUANTUM = (0.5, 0.2, 0.01, 0.01)
+
+# Kết quả cũ hơn bao nhiêu giây thì đo lại (pin yếu, cơ khí mòn...)
+MAX_AGE = 7 * 24 * 3600
+
+MAX_ENTRIES = 5000
+
+# Số mục tối đa history() trả về: nửa điểm cao nhất + phần còn lại mới nhất
+HISTORY_LIMIT = 150
+
+
+class TrialCache:
+    """Cache LRU các lần thử, lưu trong 1 file JSON"""
+
+    def __init__(self, path=CACHE_FILE, quantum=QUANTUM, max_age=MAX_AGE,
+                 max_entries=MAX_ENTRIES, autosave=True):
+        self.path = path
+        self.quantum = quantum
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.autosave = autosave
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # cũ nhất (ít dùng nhất) → mới nhất
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, k, robot, firmware):
+        """Khóa chuỗi; thiếu K4 (AutoTune chỉ gửi K1..K3) → 'x'"""
+        steps = [str(int(round(v / q))) for v, q in zip(k, self.quantum)]
+        steps += ['x'] * (len(self.quantum) - len(steps))
+        return f"{robot}|{firmware}|{','.join(steps)}"
+
+    def get(self, k, robot, firmware, now=None):
+        """Mục cache còn mới của bộ K này, hoặc None (chưa đo / đã cũ → đo lại)"""
+        key = self.key(k, robot, firmware)
+        entry = self._entries.get(key)
+        now = time.time() if now is None else now
+        if entry is None or not self._usable(entry, now):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _usable(self, entry, now):
+        """Còn mới và là điểm đo đủ (không phải ngoại suy từ lần thử dừng sớm)"""
+        return now - entry['time'] <= self.max_age and not entry.get('stats', {}).get('stopped')
+
+    def put(self, k, robot, firmware, score, stats=None, now=None):
+        """Ghi kết quả 1 lần thử (đè kết quả cũ cùng khóa)"""
+        key = self.key(k, robot, firmware)
+        self._entries[key] = {
+            'k': [float(v) for v in k],
+            'robot': robot,
+            'firmware': firmware,
+            'score': float(score),
+            'stats': stats or {},
+            'time': time.time() if now is None else now,
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.autosave:
+            self.save()
+
+    def history(self, robot, firmware, limit=HISTORY_LIMIT, now=None):
+        """
+        Kết quả còn mới (chưa quá max_age) của robot + firmware này, cũ → mới; nhiều hơn
+        `limit` mục → giữ limit // 2 mục điểm cao nhất + các mục mới nhất (limit=None: tất cả)
+        """
+        now = time.time() if now is None else now
+        entries = [e for e in self._entries.values() if e['robot'] == robot and e['firmware'] == firmware
+                   and self._usable(e, now)]
+        if limit is not None and len(entries) > limit:
+            best = sorted(entries, key=lambda e: e['score'], reverse=True)[:limit // 2]
+            kept = {id(e) for e in best}
+            fresh = [e for e in sorted(entries, key=lambda e: e['time'], reverse=True) if id(e) not in kept]
+            entries = best + fresh[:limit - len(best)]
+        return sorted(entries, key=lambda e: e['time'])
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Không đọc được cache {self.path}: {e} — bắt đầu cache mới")
+            return
+        for e in entries:
+            self._entries[self.key(e['k'], e['robot'], e['firmware'])] = e
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(list(self._entries.values()), f, ensure_ascii=False)
+        os.replace(tmp, self.path)
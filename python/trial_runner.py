@@ -0,0 +1,228 @@
+"""
+🧪 TRIAL RUNNER — 1 lần thử bộ K trên 1 robot của telemetry_hub
+=================================================================
+Kịch bản (dùng chung cho AutoTune_PID.py và fleet_tune.py):
+1. gửi K qua gain_channel.GainChannel, đợi KACK của ĐÚNG lệnh đó (seq, gửi lại nếu quá hạn);
+   ramp='pc' / 'firmware': chuyển dần từ bộ K đang chạy sang bộ K mới trong ramp_time
+   giây thay vì nhảy bậc (ít giật / ít ngã khi optimizer nhảy xa, ổn định nhanh hơn)
+2. robot còn nằm từ lần thử trước → chờ người dựng lại (không giới hạn thời gian, cú ngã
+   cũ không bị tính cho bộ K mới), rồi đợi robot ổn định (settle.SettleDetector)
+3. chấm điểm cửa sổ [start_index, start_index + expected) sample trong ring của
+   robot bằng trial_scoring.TrialScorer, dừng sớm khi ngã / chắc chắn kém hơn best
+
+Robot im lặng quá DROPOUT_TIMEOUT giây (mất Wi-Fi, hết pin) → run() bỏ lần thử,
+`dropped` = True. cancel() (hoặc active() trả về False) dừng giữa chừng.
+"""
+
+import threading
+import time
+import numpy as np
+from gain_channel import ACK_RETRIES, ACK_TIMEOUT, RAMP_STEP, GainChannel
+from settle import SettleDetector
+from telemetry_codec import format_command
+from trial_scoring import FALL_THRESHOLD, TrialScorer
+
+TRIAL_DURATION = 4.0    # giây đo mỗi bộ K
+POLL = 0.05             # giây, chu kỳ đọc ring / chấm điểm
+DROPOUT_TIMEOUT = 2.0   # giây thật không có gói nào → robot rớt mạng
+
+# Đổi bộ K: 'off' = nhảy bậc, 'pc' = PC gửi chuỗi bộ K trung gian,
+# 'firmware' = 1 lệnh ",R=ms", firmware tự nội suy (firmware cũ: như 'off')
+RAMP_MODES = ('off', 'pc', 'firmware')
+RAMP_TIME = 0.5         # giây (giờ robot) chuyển từ bộ K cũ sang bộ K mới
+
+
+class TrialRunner:
+    """Chạy lần thử trên 1 RobotLink; mỗi robot 1 runner, mỗi runner chỉ 1 thread gọi run()"""
+
+    def __init__(self, robot, speed=1.0, trial_duration=TRIAL_DURATION, fall_threshold=FALL_THRESHOLD,
+                 early_abort=True, poll=POLL, ack_timeout=ACK_TIMEOUT, ack_retries=ACK_RETRIES,
+                 dropout_timeout=DROPOUT_TIMEOUT, ramp='off', ramp_time=RAMP_TIME, active=None,
+                 verbose=True, prefix=''):
+        """
+        speed : robot ảo chạy nhanh gấp `speed` lần (chia mọi thời gian chờ theo giờ robot)
+        ramp  : 1 trong RAMP_MODES — cách chuyển sang bộ K của lần thử
+        active: hàm không tham số, trả về False khi cần dừng (vd cờ tuning_active của GUI)
+        """
+        self.robot = robot
+        self.speed = speed
+        self.trial_duration = trial_duration
+        self.fall_threshold = fall_threshold
+        self.early_abort = early_abort
+        self.poll = poll
+        self.ack_timeout = ack_timeout
+        self.ack_retries = ack_retries
+        self.dropout_timeout = dropout_timeout
+        if ramp not in RAMP_MODES:
+            raise ValueError(f"ramp phải là 1 trong {RAMP_MODES}, không phải {ramp!r}")
+        self.ramp = ramp
+        self.ramp_time = ramp_time
+        self.verbose = verbose
+        self.prefix = prefix
+        self.channel = GainChannel(robot.send, ack_timeout=ack_timeout, retries=ack_retries)
+        self.lost_samples = 0    # sample bị ghi đè trước khi kịp chấm (phải luôn = 0)
+        self.pickups = 0         # số lần phải chờ dựng robot lại trước khi chờ ổn định
+        self.dropped = False
+        self._active = active
+        self._cancel = threading.Event()
+        robot.on_ack = self.on_ack
+
+    @property
+    def last_ack(self):
+        """Bộ K trong KACK gần nhất ('legacy' nếu firmware cũ chỉ gửi "KACK")"""
+        return self.channel.last_ack
+
+    @property
+    def firmware_build(self):
+        """Mã build firmware trong KACK ("B=..", None nếu firmware chưa báo)"""
+        return self.channel.last_build
+
+    @property
+    def active(self):
+        if self._cancel.is_set() or self.dropped:
+            return False
+        return self._active is None or self._active()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def sleep(self, seconds):
+        """time.sleep() theo thời gian robot"""
+        time.sleep(seconds / self.speed)
+
+    def on_ack(self, text, addr):
+        self.channel.on_ack(text)
+
+    def send_gains(self, k):
+        """Gửi K1..K3 qua kênh lệnh (gửi lại khi ai đó poll() / wait()) → seq"""
+        seq = self.channel.send(k[:3])
+        if self.verbose:
+            print(f"{self.prefix}📤 Gửi: {format_command(k[:3], seq)}")
+        return seq
+
+    def send_gains_acked(self, k):
+        """send_gains() rồi đợi KACK của ĐÚNG lệnh này (gửi lại nếu quá hạn) → True nếu đã xác nhận"""
+        return self.channel.wait(self.send_gains(k), active=lambda: self.active) is True
+
+    def ramp_gains_acked(self, k):
+        """
+        Chuyển sang bộ K theo self.ramp rồi đợi KACK của lệnh cuối → True nếu đã xác nhận.
+        Chưa biết bộ K đang chạy (chưa có KACK kèm bộ K) → gửi thẳng như send_gains_acked().
+        Trả về khi robot ĐÃ chạy bộ K mới (ramp firmware: đợi hết ramp_time).
+        """
+        current = self.channel.last_ack
+        if self.ramp == 'off' or not isinstance(current, tuple):
+            return self.send_gains_acked(k)
+        if self.verbose:
+            print(f"{self.prefix}📈 Ramp {self.ramp} {self.ramp_time:.2f}s → "
+                  f"K=({k[0]:.1f}, {k[1]:.1f}, {k[2]:.2f})")
+        if self.ramp == 'pc':
+            seq = self.channel.ramp(current[:3], k[:3], self.ramp_time, step=RAMP_STEP,
+                                    sleep=self.sleep, active=lambda: self.active)
+            return self.channel.wait(seq, active=lambda: self.active) is True
+        t0 = time.perf_counter()
+        seq = self.channel.send(k[:3], ramp_ms=self.ramp_time * 1000.0)
+        acked = self.channel.wait(seq, active=lambda: self.active) is True
+        # Firmware nội suy theo giờ robot kể từ lúc nhận lệnh
+        remaining = self.ramp_time / self.speed - (time.perf_counter() - t0)
+        if acked and remaining > 0 and self.active:
+            time.sleep(remaining)
+        return acked
+
+    def _check_dropout(self):
+        if time.time() - self.robot.last_seen > self.dropout_timeout:
+            self.dropped = True
+            print(f"{self.prefix}📴 Mất kết nối {self.robot.name} (im lặng > {self.dropout_timeout:.0f}s)")
+        return self.dropped
+
+    def read_samples(self, cursor, end=None):
+        """
+        Sample [cursor, end) trong ring (view, không copy, không khoá thread nhận)
+        → (view, con trỏ mới). Sample đã bị ghi đè được cộng vào lost_samples.
+        """
+        batch, lost = self.robot.ring.read(cursor, end)
+        if lost:
+            self.lost_samples += lost
+            print(f"{self.prefix}⚠️ Mất {lost} sample (ring đầy) — tăng ring_capacity")
+        return batch, cursor + lost + len(batch)
+
+    def wait_upright(self):
+        """
+        Robot đang nằm (ngã ở lần thử trước) → chờ tới khi có sample dưới fall_threshold,
+        không giới hạn thời gian (DỪNG / robot rớt mạng vẫn thoát). → True nếu đã phải chờ.
+        """
+        latest = self.robot.ring.latest(1)
+        if not len(latest) or abs(latest['angle'][-1]) < self.fall_threshold:
+            return False
+        self.pickups += 1
+        if self.verbose:
+            print(f"{self.prefix}🤚 Robot đang nằm — chờ dựng lại...")
+        cursor = self.robot.ring.count
+        while self.active and not self._check_dropout():
+            self.sleep(self.poll)
+            batch, cursor = self.read_samples(cursor)
+            if len(batch) and abs(batch['angle'][-1]) < self.fall_threshold:
+                break
+        return True
+
+    def wait_settled(self):
+        """
+        Chờ robot được dựng lại (nếu đang nằm) rồi đợi robot ổn định với bộ K mới (SettleDetector);
+        giờ chờ ổn định tính từ lúc robot đứng lên
+        → (detector, chỉ số sample đầu tiên sau khi ổn định = đầu cửa sổ chấm điểm)
+        """
+        self.wait_upright()
+        detector = SettleDetector(fall_threshold=self.fall_threshold)
+        cursor = self.robot.ring.count
+        start = time.perf_counter()
+        start_wall = time.time()
+        last = 0.0
+        while self.active and not detector.done and not self._check_dropout():
+            self.sleep(self.poll)
+            now = (time.perf_counter() - start) * self.speed
+            batch, cursor = self.read_samples(cursor)
+            if self.speed == 1.0:
+                times = batch['t'] - start_wall
+            else:
+                # Robot ảo chạy nhanh: timestamp là giờ robot → rải đều giữa 2 lần đọc
+                times = np.linspace(last, now, len(batch) + 1)[1:]
+            detector.add(times, batch['angle'], now)
+            last = now
+        return detector, cursor
+
+    def run(self, k, best_score=None):
+        """
+        Gửi bộ K (ramp nếu bật), đợi KACK đúng bộ đó, đợi ổn định, rồi chấm điểm từng loạt sample
+        trong tối đa trial_duration giây.
+        → (TrialScorer, SettleDetector, acked); scorer = None nếu bị dừng / robot rớt mạng.
+        scorer.window = (start_index, end_index) — đoạn sample trong ring đã chấm.
+        """
+        k = [float(v) for v in k]
+        acked = self.ramp_gains_acked(k)
+        settle, start_index = self.wait_settled()
+        # Tốc độ sample đo được lúc chờ → cửa sổ chấm điểm = đúng `expected` sample
+        # [start_index, start_index + expected), không phụ thuộc sample tới theo loạt
+        expected = int(settle.rate * self.trial_duration) or None
+        end_index = start_index + expected if expected else None
+
+        # Chưa có best → chỉ dừng sớm khi ngã
+        scorer = TrialScorer(best_score if best_score is not None and best_score > 0 else None,
+                             self.fall_threshold, early_abort=self.early_abort, expected=expected)
+        cursor = start_index
+        start = time.perf_counter()
+        while self.active and not self._check_dropout():
+            self.sleep(self.poll)
+            elapsed = (time.perf_counter() - start) * self.speed / self.trial_duration
+            batch, cursor = self.read_samples(cursor, end_index)
+            if end_index is None:
+                fraction = min(elapsed, 1.0)
+            else:
+                # Robot gửi thưa hơn lúc chờ → hết 2 lần trial_duration thì chấm phần đã có
+                fraction = 1.0 if elapsed >= 2.0 else (cursor - start_index) / expected
+            if scorer.add(batch['angle'], fraction) or fraction >= 1.0:
+                break
+
+        scorer.window = (start_index, cursor)
+        if not self.active:
+            return None, settle, acked
+        return scorer, settle, acked
@@ -0,0 +1,193 @@
+"""
+🏅 TRIAL SCORING — Chấm điểm 1 lần thử bộ K (dùng chung cho AutoTune và mô phỏng)
+=================================================================================
+- evaluate_trial(): chấm 1 danh sách góc (giống hệt bản gốc trong AutoTune_PID.py)
+- TrialStats: cộng dồn |góc| / max / số sample đứng cho n làn cùng lúc,
+  không cần giữ lại mẫu → score() cho ra đúng điểm của evaluate_trial()
+- TrialScorer: chấm 1 lần thử theo từng sample khi dữ liệu tới, báo dừng sớm khi
+  robot ngã hoặc chắc chắn không vượt được best_score
+"""
+
+import numpy as np
+
+# Ngã = angle > bao nhiêu độ
+FALL_THRESHOLD = 12.0
+
+# Ít hơn số sample này → không đủ dữ liệu, điểm 0
+MIN_SAMPLES = 10
+
+
+def evaluate_trial(trial_angles, fall_threshold=FALL_THRESHOLD):
+    """
+    Tính điểm cho 1 bộ K dựa trên:
+    - Góc trung bình nhỏ → tốt
+    - Thời gian đứng dài → tốt
+    - Không ngã → bonus
+    """
+    if len(trial_angles) < MIN_SAMPLES:
+        return 0.0
+
+    abs_angles = [abs(a) for a in trial_angles]
+    avg_angle = sum(abs_angles) / len(abs_angles)
+    max_angle = max(abs_angles)
+
+    # Đếm bao nhiêu sample đứng được (|angle| < fall_threshold)
+    standing = sum(1 for a in abs_angles if a < fall_threshold)
+    standing_ratio = standing / len(trial_angles)
+
+    # Nếu ngã (>50% thời gian angle lớn) → điểm rất thấp
+    if standing_ratio < 0.5:
+        return standing_ratio * 10
+
+    # Score = (thời gian đứng) / (góc trung bình + 1)
+    # Angle nhỏ + đứng lâu = score cao
+    score = (standing_ratio * 100) / (avg_angle + 0.5)
+
+    # Bonus nếu max_angle nhỏ (dao động ít)
+    if max_angle < 5:
+        score *= 1.5
+    elif max_angle < 8:
+        score *= 1.2
+
+    return round(score, 2)
+
+
+class TrialStats:
+    """Bộ cộng dồn cho n làn; add() mỗi sample, score() → mảng điểm shape (n,)"""
+
+    def __init__(self, n=1, fall_threshold=FALL_THRESHOLD):
+        self.fall_threshold = fall_threshold
+        self.count = 0
+        self.sum_abs = np.zeros(n)
+        self.max_abs = np.zeros(n)
+        self.standing = np.zeros(n, dtype=np.int64)
+
+    def add(self, angles):
+        """angles: 1 sample cho mỗi làn, shape (n,)"""
+        a = np.abs(angles)
+        self.count += 1
+        self.sum_abs += a
+        np.maximum(self.max_abs, a, out=self.max_abs)
+        self.standing += a < self.fall_threshold
+
+    @property
+    def mean_abs(self):
+        return self.sum_abs / max(self.count, 1)
+
+    @property
+    def standing_ratio(self):
+        return self.standing / max(self.count, 1)
+
+    def score(self):
+        """Điểm giống evaluate_trial() cho từng làn"""
+        n = len(self.sum_abs)
+        if self.count < MIN_SAMPLES:
+            return np.zeros(n)
+        ratio = self.standing_ratio
+        score = (ratio * 100) / (self.mean_abs + 0.5)
+        score *= np.where(self.max_abs < 5, 1.5, np.where(self.max_abs < 8, 1.2, 1.0))
+        return np.where(ratio < 0.5, ratio * 10, np.round(score, 2))
+
+
+def _final_score(count, sum_abs, max_abs, standing):
+    """Công thức của evaluate_trial() từ các tổng đã cộng dồn (1 làn)"""
+    if count < MIN_SAMPLES:
+        return 0.0
+    ratio = standing / count
+    if ratio < 0.5:
+        return ratio * 10
+    score = (ratio * 100) / (sum_abs / count + 0.5)
+    if max_abs < 5:
+        score *= 1.5
+    elif max_abs < 8:
+        score *= 1.2
+    return round(score, 2)
+
+
+class TrialScorer:
+    """
+    Chấm 1 lần thử ngay khi sample tới (thay cho sleep(TRIAL_DURATION) + evaluate_trial).
+    add() trả về lý do dừng sớm (hoặc None):
+    - 'fall' : |góc| vượt fall_threshold — firmware đã tắt motor từ 10°, robot nằm luôn
+    - 'worse': kể cả phần còn lại hoàn hảo (góc 0, đứng hết) cũng không vượt best_score
+    - 'trend': kiểm định tuần tự — đã qua MIN_FRACTION cửa sổ, và ngay cả khi phần còn lại
+               có |góc| trung bình bằng cận dưới tin cậy (Z sigma, tính trên trung bình
+               từng khối BLOCK sample để bớt tự tương quan) vẫn không vượt best_score
+    score() khi dừng sớm = điểm cả cửa sổ ước lượng: 'fall' coi phần còn lại nằm ở
+    fall_threshold; 'worse' / 'trend' coi phần còn lại giống phần đã đo.
+    expected: số sample của cả cửa sổ nếu biết trước (vd đo tốc độ gửi lúc chờ ổn định);
+    None → ước lượng = count / fraction (kém chính xác lúc đầu vì sample tới theo loạt).
+    """
+
+    BLOCK = 20
+    Z = 2.33            # ~1% một phía
+    MIN_FRACTION = 0.4
+
+    def __init__(self, best_score=None, fall_threshold=FALL_THRESHOLD, early_abort=True, expected=None):
+        self.best_score = best_score
+        self.fall_threshold = fall_threshold
+        self.early_abort = early_abort
+        self.count = 0
+        self.sum_abs = 0.0
+        self.max_abs = 0.0
+        self.standing = 0
+        self.expected_hint = expected
+        self.expected = expected or 0
+        self.fraction = 0.0
+        self.stopped = None
+        self._block_sum = 0.0
+        self._block_n = 0
+        self._block_means = []
+
+    def add(self, angles, fraction):
+        """angles: các sample mới; fraction: phần cửa sổ thời gian đã trôi qua (0..1]"""
+        for a in np.abs(np.asarray(angles, dtype=np.float64)).tolist():
+            self.count += 1
+            self.sum_abs += a
+            if a > self.max_abs:
+                self.max_abs = a
+            if a < self.fall_threshold:
+                self.standing += 1
+            self._block_sum += a
+            self._block_n += 1
+            if self._block_n == self.BLOCK:
+                self._block_means.append(self._block_sum / self.BLOCK)
+                self._block_sum = 0.0
+                self._block_n = 0
+
+        self.fraction = fraction
+        if self.expected_hint:
+            self.expected = max(self.count, self.expected_hint)
+        elif self.count and fraction > 0:
+            self.expected = max(self.count, int(round(self.count / min(fraction, 1.0))))
+        if not self.early_abort or self.stopped or self.count < MIN_SAMPLES:
+            return self.stopped
+
+        if self.max_abs >= self.fall_threshold:
+            self.stopped = 'fall'
+        elif self.best_score is not None and fraction < 1.0:
+            remaining = self.expected - self.count
+            best_case = _final_score(self.expected, self.sum_abs, self.max_abs, self.standing + remaining)
+            if best_case <= self.best_score:
+                self.stopped = 'worse'
+            elif fraction >= self.MIN_FRACTION and len(self._block_means) >= 3:
+                means = np.array(self._block_means)
+                low = max(0.0, means.mean() - self.Z * means.std(ddof=1) / np.sqrt(len(means)))
+                likely_best = _final_score(self.expected, self.sum_abs + remaining * low,
+                                           self.max_abs, self.standing + remaining)
+                if likely_best <= self.best_score:
+                    self.stopped = 'trend'
+        return self.stopped
+
+    def score(self):
+        """Điểm giống evaluate_trial() (đủ cửa sổ), hoặc điểm ước lượng nếu đã dừng sớm"""
+        if self.stopped is None:
+            return _final_score(self.count, self.sum_abs, self.max_abs, self.standing)
+        remaining = max(self.expected - self.count, 0)
+        if self.stopped == 'fall':
+            return _final_score(self.count + remaining, self.sum_abs + remaining * self.fall_threshold,
+                                max(self.max_abs, self.fall_threshold), self.standing)
+        mean = self.sum_abs / self.count
+        ratio = self.standing / self.count
+        return _final_score(self.count + remaining, self.sum_abs + remaining * mean,
+                            self.max_abs, self.standing + remaining * ratio)